@@ -15,11 +15,13 @@ class AgentResponse(Model):
     confidence: float
     reasoning: str
     strategy_name: str
+    request_id: Optional[str] = None  # Echoed from the AnalysisRequest
 
 class AnalysisRequest(Model):
     asset_id: str
     current_data: Dict[str, Any]
     historical_data: Optional[List[Dict[str, Any]]] = None
+    request_id: Optional[str] = None  # Lets the sender correlate the response
 
 class BaseStrategyAgent:
     """Base class for all strategy agents"""
@@ -66,7 +68,8 @@ class BaseStrategyAgent:
                         prediction=prediction,
                         confidence=confidence,
                         reasoning=reasoning,
-                        strategy_name=self.strategy_name
+                        strategy_name=self.strategy_name,
+                        request_id=msg.request_id
                     )
                 )
                 
@@ -83,7 +86,8 @@ class BaseStrategyAgent:
                         prediction={"error": str(e), "action": "hold"},
                         confidence=0.0,
                         reasoning=f"Error occurred: {str(e)}",
-                        strategy_name=self.strategy_name
+                        strategy_name=self.strategy_name,
+                        request_id=msg.request_id
                     )
                 )
     
@@ -0,0 +1,123 @@
+"""
+Shared bounded executor for blocking outbound data fetches (yfinance, HTTP)
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Optional
+
+# Fetches running at once, fetches admitted (running or queued), and the
+# default seconds a caller waits for one
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+FETCH_MAX_PENDING = int(os.getenv("FETCH_MAX_PENDING", "32"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "15"))
+
+
+class FetchExecutor:
+    """Runs blocking fetches on a bounded thread pool so the event loop keeps serving.
+
+    At most `max_pending` fetches are admitted at a time; further callers
+    wait for a slot in arrival order, and that wait counts towards their
+    timeout. A caller that times out or is cancelled is released at once.
+    A fetch that has not started yet is dropped. One that is already
+    running cannot be interrupted, so it finishes in the background, its
+    result is discarded, and it keeps its slot until then.
+    """
+
+    def __init__(self, max_workers: int = 8, max_pending: int = 32, timeout: float = 15.0):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self._lock = threading.Lock()
+        self._free = max_pending
+        # Callers waiting for a slot; worker threads hand freed slots to them
+        # on their own event loop
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.running = 0
+        self.timeouts = 0
+
+    async def _acquire(self):
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            if not queued and waiter.done() and not waiter.cancelled():
+                # Given a slot just as the caller gave up
+                self._release_slot()
+            raise
+
+    def _release_slot(self):
+        """Hand a slot to the longest waiting caller, or free it (any thread)"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                loop = waiter.get_loop()
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self._grant, waiter)
+                    return
+            self._free += 1
+
+    def _grant(self, waiter: asyncio.Future):
+        if waiter.done():
+            # Its caller gave up after the slot was handed over; pass it on
+            self._release_slot()
+        else:
+            waiter.set_result(None)
+
+    def _release(self, _future: Future):
+        with self._lock:
+            self.running -= 1
+        self._release_slot()
+
+    async def _submit(self, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        await self._acquire()
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._release_slot()
+            raise
+        with self._lock:
+            self.running += 1
+        future.add_done_callback(self._release)
+        # Cancelling the awaited future also cancels a fetch still queued
+        return await asyncio.wrap_future(future)
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Call func(*args, **kwargs) on a worker thread and await its result.
+
+        Raises asyncio.TimeoutError once `timeout` (default: the executor's)
+        passes, counting the wait for a slot.
+        """
+        try:
+            return await asyncio.wait_for(self._submit(func, args, kwargs), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared by every agent in the process (and by the API)
+fetch_executor = FetchExecutor(
+    max_workers=FETCH_WORKERS,
+    max_pending=FETCH_MAX_PENDING,
+    timeout=FETCH_TIMEOUT
+)
+
+async def run_fetch(func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """Run a blocking fetch on the shared executor"""
+    return await fetch_executor.run(func, *args, timeout=timeout, **kwargs)
@@ -0,0 +1,246 @@
+"""
+Shared outbound client for upstream market data (yfinance and HTTP quote sources)
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Upstream requests per second across the process, and how many may go out back to back
+DATA_RATE_LIMIT = float(os.getenv("DATA_RATE_LIMIT", "5"))
+DATA_BURST = int(os.getenv("DATA_BURST", "10"))
+
+# Retries for throttled or failed requests, with exponential backoff and full jitter
+DATA_MAX_RETRIES = int(os.getenv("DATA_MAX_RETRIES", "3"))
+DATA_BACKOFF = float(os.getenv("DATA_BACKOFF", "0.5"))
+DATA_BACKOFF_MAX = float(os.getenv("DATA_BACKOFF_MAX", "8"))
+
+# Consecutive failed requests that open the circuit, and seconds it stays open
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+# Upstream requests in flight at once, and so keep-alive connections in use
+# (curl_cffi keeps a connection per calling thread; requests pools them)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit is open"""
+
+
+class RetryableResponse(Exception):
+    """An HTTP response with a status worth retrying"""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available (no limit if rate <= 0)"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds, then lets one probe through to decide
+    whether to close again"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opens = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+def _make_session(pool_size: int):
+    try:
+        # Recent yfinance only accepts curl_cffi sessions. The sync session keeps
+        # one keep-alive curl handle per thread and takes no pool size; the
+        # client's request slots bound how many are in use at once
+        from curl_cffi import requests as curl_requests
+        return curl_requests.Session(impersonate="chrome")
+    except ImportError:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+
+def _retry_status(error: Exception) -> Optional[int]:
+    """Status to retry on, 0 for a retryable error without one, None if not retryable"""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return status if status in RETRY_STATUSES else None
+    if type(error).__name__ == "YFRateLimitError":
+        return 429
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return 0
+    return None
+
+
+def _retry_after(error: Exception) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class DataClient:
+    """One keep-alive session for all upstream data, behind a shared rate limit,
+    retries with jittered backoff and a circuit breaker.
+
+    At most `pool_size` calls reach upstream at once, however many threads
+    share the client. Calls block, so they belong on the fetch executor
+    (run_fetch).
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 10, max_retries: int = 3,
+                 backoff: float = 0.5, backoff_max: float = 8.0, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, pool_size: int = 16, timeout: float = 10.0):
+        self.session = _make_session(pool_size)
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, pool_size))
+        self._lock = threading.Lock()
+        self.stats = dict.fromkeys(("requests", "retries", "throttled", "failures", "rejected"), 0)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run an upstream call (e.g. a yfinance method using self.session) under
+        the rate limit, retrying throttling and connection errors"""
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError("Upstream market data circuit is open")
+
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self._count("requests")
+            try:
+                # Held only for the call itself, not for backoff sleeps
+                with self._slots:
+                    result = func(*args, **kwargs)
+            except Exception as e:
+                status = _retry_status(e)
+                if status is None:
+                    # Upstream answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                if status == 429:
+                    self._count("throttled")
+                if attempt == self.max_retries:
+                    self._count("failures")
+                    self.breaker.record_failure()
+                    raise
+                self._count("retries")
+                delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+                time.sleep(max(delay, min(_retry_after(e), self.backoff_max)))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def request(self, method: str, url: str, **kwargs):
+        """HTTP request through the shared session. After the last retry a
+        throttled or failed response is returned as is for raise_for_status."""
+        kwargs.setdefault("timeout", self.timeout)
+
+        def send():
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code in RETRY_STATUSES:
+                raise RetryableResponse(response)
+            return response
+
+        try:
+            return self.call(send)
+        except RetryableResponse as e:
+            return e.response
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+# Shared by every agent in the process (and by the API)
+data_client = DataClient(
+    rate=DATA_RATE_LIMIT,
+    burst=DATA_BURST,
+    max_retries=DATA_MAX_RETRIES,
+    backoff=DATA_BACKOFF,
+    backoff_max=DATA_BACKOFF_MAX,
+    failure_threshold=BREAKER_THRESHOLD,
+    reset_timeout=BREAKER_RESET,
+    pool_size=HTTP_POOL_SIZE,
+    timeout=HTTP_TIMEOUT
+)
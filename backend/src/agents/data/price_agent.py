@@ -1,11 +1,23 @@
+# Add path to parent directory
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..')))
+
+import asyncio
+import time
+from typing import Dict, List, Optional
 from uagents import Agent, Context, Model
-import yfinance as yf
-from datetime import datetime, timezone
 from uagents.setup import fund_agent_if_low
 
+from src.agents.data.fetch_executor import run_fetch
+from src.agents.data.providers import get_provider
+from src.agents.data.quote_cache import CachedQuote, QuoteCache
+from src.agents.data.subscriptions import QuoteSubscriptions
+
 
 class PriceRequest(Model):
     ticker: str
+    cycle_id: Optional[str] = None  # Echoed back so the requester can join results
 
 
 class PriceResponse(Model):
@@ -14,6 +26,55 @@ class PriceResponse(Model):
     current_price: float
     currency: str
     volume: int
+    cycle_id: Optional[str] = None
+
+
+class BatchPriceRequest(Model):
+    tickers: List[str]
+    cycle_ids: Dict[str, str] = {}  # Ticker -> cycle ID, echoed back on each quote
+
+
+class BatchPriceResponse(Model):
+    quotes: List[PriceResponse]
+    missing: List[str] = []  # Tickers the quote source had no price for
+
+
+class QuoteSubscription(Model):
+    tickers: List[str]  # Replaces the sender's previous subscription; empty unsubscribes
+
+
+class QuoteUpdate(Model):
+    quotes: List[PriceResponse]  # Subscribed quotes that changed since the last update
+
+
+class QuoteCacheStats(Model):
+    stats: Dict[str, int]
+    entries: int
+    subscriptions: Dict[str, int] = {}
+
+
+# Quotes younger than QUOTE_CACHE_TTL seconds are served from memory; older
+# ones up to QUOTE_MAX_STALE seconds are served while a refresh runs
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "5"))
+QUOTE_MAX_STALE = float(os.getenv("QUOTE_MAX_STALE", "60"))
+
+# Live yfinance quotes by default, or a recorded session (MARKET_DATA_PROVIDER=replay)
+provider = get_provider()
+
+# Every request goes through the cache; upstream fetches are batched and run off the event loop
+quote_cache = QuoteCache(
+    lambda tickers: run_fetch(provider.fetch_quotes, tickers),
+    ttl=QUOTE_CACHE_TTL,
+    max_stale=QUOTE_MAX_STALE
+)
+
+# Subscribed tickers are fetched every QUOTE_PUSH_INTERVAL seconds in one batched
+# fetch and pushed only when they change; a subscription not renewed within
+# SUBSCRIPTION_LEASE seconds is dropped
+QUOTE_PUSH_INTERVAL = float(os.getenv("QUOTE_PUSH_INTERVAL", str(QUOTE_CACHE_TTL)))
+SUBSCRIPTION_LEASE = float(os.getenv("SUBSCRIPTION_LEASE", "90"))
+subscriptions = QuoteSubscriptions(lease=SUBSCRIPTION_LEASE)
+push_stats = dict.fromkeys(("updates_sent", "quotes_pushed", "push_errors"), 0)
 
 
 # Initialize the price agent
@@ -38,35 +99,26 @@ async def handle_request(ctx: Context, sender: str, msg: PriceRequest):
     ctx.logger.info(f"Received price request for ticker: {msg.ticker} from {sender}")
     
     try:
-        # Get stock data
-        ctx.logger.info(f"Fetching data for {msg.ticker} using yfinance...")
-        stock = yf.Ticker(msg.ticker)
-        
-        # Get more comprehensive market data
-        current_price = stock.info.get('currentPrice')
-        if current_price == 0:  # Sometimes yfinance returns currentPrice as 0
-            current_price = stock.info.get('regularMarketPrice', 0)
-            ctx.logger.info(f"Using regularMarketPrice: {current_price}")
-        else:
-            ctx.logger.info(f"Using currentPrice: {current_price}")
-            
-        currency = stock.info.get('currency', 'USD')
-        volume = stock.info.get('volume', 0)
-        
-        # timestamp = datetime.now().isoformat()    # 1. generate a single, UTC, second‐precision timestamp
-        ts = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
-
-
+        # Get stock data (cached, or fetched off the event loop)
+        cached = await quote_cache.get(msg.ticker)
+        if cached is None:
+            ctx.logger.error(f"No quote available for {msg.ticker}")
+            return
         
+        current_price = cached.quote["price"]
+        currency = cached.quote["currency"]
+        volume = cached.quote["volume"]
         ctx.logger.info(f"Data fetched successfully: {current_price} {currency}, volume: {volume}")
         
-        # Prepare response
+        # Prepare response; the timestamp is the quote's (or when it was
+        # fetched), so a quote served twice maps to the same market_data row
         response = PriceResponse(
             ticker=msg.ticker,
-            timestamp=ts,
+            timestamp=cached.timestamp,
             current_price=float(current_price),
             currency=currency,
-            volume=volume
+            volume=volume,
+            cycle_id=msg.cycle_id
         )
         
         ctx.logger.info(f"Sending response back to {sender}")
@@ -78,11 +130,119 @@ async def handle_request(ctx: Context, sender: str, msg: PriceRequest):
         )
         ctx.logger.info(f"Response sent successfully for {msg.ticker}")
         
+    except asyncio.TimeoutError:
+        ctx.logger.error(f"Timed out fetching price for {msg.ticker}")
     except Exception as e:
         ctx.logger.error(f"Error fetching price: {str(e)}")
         import traceback
         ctx.logger.error(traceback.format_exc())
 
 
+@price_agent.on_message(BatchPriceRequest)
+async def handle_batch_request(ctx: Context, sender: str, msg: BatchPriceRequest):
+    ctx.logger.info(f"Received batch price request for {len(msg.tickers)} tickers from {sender}")
+    
+    try:
+        # Cached quotes, plus one batched fetch for the tickers that need fetching
+        quotes = await quote_cache.get_many(msg.tickers)
+        
+        response = BatchPriceResponse(
+            quotes=[
+                PriceResponse(
+                    ticker=ticker,
+                    timestamp=cached.timestamp,
+                    current_price=cached.quote["price"],
+                    currency=cached.quote["currency"],
+                    volume=cached.quote["volume"],
+                    cycle_id=msg.cycle_ids.get(ticker)
+                )
+                for ticker, cached in quotes.items()
+            ],
+            missing=[ticker for ticker in msg.tickers if ticker not in quotes]
+        )
+        ctx.logger.info(f"Fetched {len(response.quotes)} quotes, {len(response.missing)} missing")
+        
+        await ctx.send(sender, response)
+        
+    except asyncio.TimeoutError:
+        ctx.logger.error(f"Timed out fetching prices for {len(msg.tickers)} tickers")
+    except Exception as e:
+        ctx.logger.error(f"Error fetching batch prices: {str(e)}")
+        import traceback
+        ctx.logger.error(traceback.format_exc())
+
+
+def to_response(ticker: str, cached: CachedQuote) -> PriceResponse:
+    return PriceResponse(
+        ticker=ticker,
+        timestamp=cached.timestamp,
+        current_price=cached.quote["price"],
+        currency=cached.quote["currency"],
+        volume=cached.quote["volume"]
+    )
+
+
+async def push_quotes(ctx: Context, subscriber: str, tickers: List[str], quotes: Dict[str, CachedQuote]):
+    """Send one subscriber its changed quotes in a single message"""
+    update = QuoteUpdate(quotes=[to_response(ticker, quotes[ticker]) for ticker in tickers if ticker in quotes])
+    if not update.quotes:
+        return
+    await ctx.send(subscriber, update)
+    push_stats["updates_sent"] += 1
+    push_stats["quotes_pushed"] += len(update.quotes)
+
+
+@price_agent.on_message(QuoteSubscription)
+async def handle_subscription(ctx: Context, sender: str, msg: QuoteSubscription):
+    added = subscriptions.subscribe(sender, msg.tickers, time.monotonic())
+    ctx.logger.info(f"{sender} subscribed to {len(msg.tickers)} tickers ({len(added)} new)")
+    if not added:
+        return
+    
+    # New tickers start with their current quote; after that only changes are pushed
+    try:
+        quotes = await quote_cache.get_many(added)
+        await push_quotes(ctx, sender, sorted(added), quotes)
+        subscriptions.seed({ticker: cached.quote for ticker, cached in quotes.items()})
+    except asyncio.TimeoutError:
+        ctx.logger.error(f"Timed out fetching initial quotes for {len(added)} tickers")
+
+
+@price_agent.on_interval(period=QUOTE_PUSH_INTERVAL)
+async def publish_quotes(ctx: Context):
+    """Fetch every subscribed ticker once and push what changed to each subscriber"""
+    for subscriber in subscriptions.expire(time.monotonic()):
+        ctx.logger.info(f"Subscription of {subscriber} expired")
+    tickers = subscriptions.tickers()
+    if not tickers:
+        return
+    
+    try:
+        # Merged with any poll request fetching the same tickers
+        quotes = await quote_cache.get_many(tickers, max_age=QUOTE_PUSH_INTERVAL)
+    except asyncio.TimeoutError:
+        push_stats["push_errors"] += 1
+        ctx.logger.error(f"Timed out fetching {len(tickers)} subscribed quotes")
+        return
+    
+    changes = subscriptions.changes({ticker: cached.quote for ticker, cached in quotes.items()})
+    for subscriber, changed in changes.items():
+        try:
+            await push_quotes(ctx, subscriber, changed, quotes)
+        except Exception as e:
+            push_stats["push_errors"] += 1
+            ctx.logger.error(f"Error pushing quotes to {subscriber}: {str(e)}")
+
+
+@price_agent.on_rest_get("/cache-stats", QuoteCacheStats)
+async def get_cache_stats(ctx: Context) -> QuoteCacheStats:
+    """Quote cache hit, miss and refresh counters, and subscription push counters"""
+    return QuoteCacheStats(
+        stats=dict(quote_cache.stats),
+        entries=len(quote_cache),
+        subscriptions=dict(push_stats, subscribers=len(subscriptions), tickers=len(subscriptions.tickers()))
+    )
+
+
 if __name__ == "__main__":
     price_agent.run() 
\ No newline at end of file
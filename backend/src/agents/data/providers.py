@@ -0,0 +1,195 @@
+"""
+Market data providers behind the price and sentiment agents
+"""
+
+import os
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.agents.data.http_client import data_client
+from src.agents.data.quotes import fetch_history, fetch_quotes
+
+
+class MarketDataProvider(ABC):
+    """Source of quotes and news. Methods are blocking; agents call them through run_fetch.
+
+    Quotes and news are required; a provider without them cannot be created.
+    History is optional and only needed for backfills.
+    """
+
+    @abstractmethod
+    def fetch_quotes(self, tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+        """{ticker: {"price", "currency", "volume"[, "timestamp"]}} for tickers with a price"""
+
+    @abstractmethod
+    def fetch_news(self, ticker: str) -> List[Dict[str, Any]]:
+        """Recent news items, newest first, shaped like yfinance's Ticker.news"""
+
+    def fetch_history(self, tickers: List[str], period: str = "2y",
+                      interval: str = "1d") -> Dict[str, List[Tuple[datetime, float, int, str]]]:
+        """{ticker: [(timestamp (UTC), close, volume, currency), ...]} in time order, for backfills"""
+        raise NotImplementedError(f"{type(self).__name__} does not provide history")
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from yfinance (or QUOTE_SOURCE_URL for quotes)"""
+
+    def fetch_quotes(self, tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+        return fetch_quotes(tickers)
+
+    def fetch_news(self, ticker: str) -> List[Dict[str, Any]]:
+        import yfinance as yf
+        stock = yf.Ticker(ticker, session=data_client.session)
+        return data_client.call(lambda: stock.news) or []
+
+    def fetch_history(self, tickers: List[str], period: str = "2y",
+                      interval: str = "1d") -> Dict[str, List[Tuple[datetime, float, int, str]]]:
+        return fetch_history(tickers, period, interval)
+
+
+class ReplayClock:
+    """Maps wall time to recorded time, starting at `start` and running `speed` times faster"""
+
+    def __init__(self, start: float, end: float, speed: float = 1.0, loop: bool = False):
+        self.start = start
+        self.span = max(end - start, 1.0)
+        self.speed = speed
+        self.loop = loop
+        self._started = time.monotonic()
+
+    def now(self) -> float:
+        elapsed = (time.monotonic() - self._started) * self.speed
+        if self.loop:
+            elapsed %= self.span
+        return self.start + elapsed
+
+
+def _read_table(path: str):
+    import pandas as pd
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)  # Needs pyarrow or fastparquet
+    return pd.read_csv(path)
+
+def _epochs(column) -> np.ndarray:
+    import pandas as pd
+    # Seconds since the epoch, whatever resolution pandas parsed the column at
+    elapsed = pd.to_datetime(column, utc=True) - pd.Timestamp(0, tz="UTC")
+    return (elapsed / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64)
+
+
+class ReplayProvider(MarketDataProvider):
+    """Recorded quotes and news played back from CSV or Parquet files.
+
+    Quotes need columns timestamp, ticker, price and optionally volume and
+    currency; news needs timestamp, ticker, title and optionally summary.
+    Each call returns what had been recorded by the replay clock's current
+    time, so a higher speed replays the same session faster.
+    """
+
+    def __init__(self, quotes_path: str, news_path: Optional[str] = None,
+                 speed: float = 1.0, loop: bool = False, news_limit: int = 50):
+        self.news_limit = news_limit
+        self._quotes = self._load_quotes(quotes_path)
+        self._news = self._load_news(news_path) if news_path else {}
+
+        starts = [series["time"][0] for series in (*self._quotes.values(), *self._news.values())]
+        ends = [series["time"][-1] for series in (*self._quotes.values(), *self._news.values())]
+        if not starts:
+            raise ValueError(f"No recorded data in {quotes_path}")
+        self.clock = ReplayClock(min(starts), max(ends), speed, loop)
+
+    @staticmethod
+    def _load_quotes(path: str) -> Dict[str, Dict[str, np.ndarray]]:
+        frame = _read_table(path)
+        frame = frame.assign(_time=_epochs(frame["timestamp"])).sort_values("_time", kind="stable")
+        series = {}
+        for ticker, rows in frame.groupby("ticker", sort=False):
+            series[str(ticker)] = {
+                "time": rows["_time"].to_numpy(),
+                "price": rows["price"].to_numpy(dtype=np.float64),
+                "volume": (rows["volume"].fillna(0).to_numpy(dtype=np.int64)
+                           if "volume" in rows else np.zeros(len(rows), dtype=np.int64)),
+                "currency": (rows["currency"].fillna("USD").to_numpy()
+                             if "currency" in rows else np.full(len(rows), "USD")),
+            }
+        return series
+
+    @staticmethod
+    def _load_news(path: str) -> Dict[str, Dict[str, np.ndarray]]:
+        frame = _read_table(path)
+        frame = frame.assign(_time=_epochs(frame["timestamp"])).sort_values("_time", kind="stable")
+        series = {}
+        for ticker, rows in frame.groupby("ticker", sort=False):
+            series[str(ticker)] = {
+                "time": rows["_time"].to_numpy(),
+                "title": rows["title"].fillna("").to_numpy(),
+                "summary": (rows["summary"].fillna("").to_numpy()
+                            if "summary" in rows else np.full(len(rows), "")),
+            }
+        return series
+
+    def fetch_quotes(self, tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+        now = self.clock.now()
+        quotes = {}
+        for ticker in tickers:
+            series = self._quotes.get(ticker)
+            if series is None:
+                continue
+            index = np.searchsorted(series["time"], now, side="right") - 1
+            if index < 0:
+                continue
+            quotes[ticker] = {
+                "price": float(series["price"][index]),
+                "currency": str(series["currency"][index]),
+                "volume": int(series["volume"][index]),
+                "timestamp": datetime.fromtimestamp(series["time"][index], tz=timezone.utc).isoformat()
+            }
+        return quotes
+
+    def fetch_news(self, ticker: str) -> List[Dict[str, Any]]:
+        series = self._news.get(ticker)
+        if series is None:
+            return []
+        end = np.searchsorted(series["time"], self.clock.now(), side="right")
+        start = max(0, end - self.news_limit)
+        return [
+            {
+                "id": f"{ticker}-{index}",
+                "content": {
+                    "title": str(series["title"][index]),
+                    "summary": str(series["summary"][index]),
+                    "pubDate": datetime.fromtimestamp(series["time"][index], tz=timezone.utc).isoformat()
+                }
+            }
+            for index in range(end - 1, start - 1, -1)
+        ]
+
+
+def provider_from_env() -> MarketDataProvider:
+    """MARKET_DATA_PROVIDER=yfinance (default) or replay, with REPLAY_QUOTES,
+    REPLAY_NEWS, REPLAY_SPEED and REPLAY_LOOP for the replay source"""
+    name = os.getenv("MARKET_DATA_PROVIDER", "yfinance").lower()
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "replay":
+        return ReplayProvider(
+            os.environ["REPLAY_QUOTES"],
+            os.getenv("REPLAY_NEWS") or None,
+            speed=float(os.getenv("REPLAY_SPEED", "1.0")),
+            loop=os.getenv("REPLAY_LOOP", "false").lower() in ("1", "true", "yes")
+        )
+    raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {name}")
+
+
+_provider: Optional[MarketDataProvider] = None
+
+def get_provider() -> MarketDataProvider:
+    """Provider shared by the agents in this process"""
+    global _provider
+    if _provider is None:
+        _provider = provider_from_env()
+    return _provider
@@ -0,0 +1,125 @@
+"""
+Per-ticker quote cache for the price agent
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+
+class CachedQuote(NamedTuple):
+    quote: Dict[str, Any]  # {"price", "currency", "volume"}
+    timestamp: str         # UTC; the quote's own time if the source gives one, else when it was fetched
+    fetched_at: float      # time.monotonic() when it was fetched
+
+
+class QuoteCache:
+    """Quotes kept for `ttl` seconds and served stale for up to `max_stale` seconds.
+
+    A stale quote is returned right away and refreshed in the background.
+    Tickers that are missing or too old are fetched before returning. All
+    upstream fetches go through one bulk loader, and a ticker that is
+    already being fetched is waited on rather than fetched again.
+    """
+
+    def __init__(self, fetch: Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]],
+                 ttl: float = 5.0, max_stale: float = 60.0):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries: Dict[str, CachedQuote] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._refreshing: Set[str] = set()  # Refreshes queued but not fetching yet
+        self.stats = dict.fromkeys(("hits", "stale_hits", "misses", "refreshes", "merged", "errors"), 0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, ticker: str) -> Optional[CachedQuote]:
+        return (await self.get_many([ticker])).get(ticker)
+
+    async def get_many(self, tickers: Iterable[str], max_age: Optional[float] = None) -> Dict[str, CachedQuote]:
+        """Quotes for every ticker the source has a price for.
+
+        With `max_age`, quotes older than that are fetched before returning
+        instead of being served stale.
+        """
+        now = time.monotonic()
+        max_stale = self.max_stale if max_age is None else min(max_age, self.max_stale)
+        result, stale, missing = {}, [], []
+        for ticker in dict.fromkeys(tickers):
+            entry = self._entries.get(ticker)
+            age = now - entry.fetched_at if entry else None
+            if entry and age <= min(self.ttl, max_stale):
+                self.stats["hits"] += 1
+                result[ticker] = entry
+            elif entry and age <= max_stale:
+                self.stats["stale_hits"] += 1
+                result[ticker] = entry
+                stale.append(ticker)
+            else:
+                self.stats["misses"] += 1
+                missing.append(ticker)
+
+        if stale:
+            self._refresh(stale)
+        if missing:
+            result.update(await self._load(missing))
+        return result
+
+    def _refresh(self, tickers: List[str]):
+        tickers = [ticker for ticker in tickers
+                   if ticker not in self._inflight and ticker not in self._refreshing]
+        if not tickers:
+            return
+        self.stats["refreshes"] += len(tickers)
+        self._refreshing.update(tickers)
+        task = asyncio.create_task(self._load(tickers))
+        self._background.add(task)
+
+        def _done(t: asyncio.Task):
+            self._background.discard(t)
+            self._refreshing.difference_update(tickers)
+            if not t.cancelled() and t.exception() is not None:
+                self.stats["errors"] += 1
+
+        task.add_done_callback(_done)
+
+    async def _load(self, tickers: List[str]) -> Dict[str, CachedQuote]:
+        """Fetch the tickers nobody is fetching yet in one call and wait for the others"""
+        waiting = {ticker: self._inflight[ticker] for ticker in tickers if ticker in self._inflight}
+        self.stats["merged"] += len(waiting)
+        own = [ticker for ticker in tickers if ticker not in waiting]
+
+        result = {}
+        if own:
+            loop = asyncio.get_running_loop()
+            futures = {ticker: loop.create_future() for ticker in own}
+            self._inflight.update(futures)
+            try:
+                quotes = await self._fetch(own)
+                timestamp = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+                fetched_at = time.monotonic()
+                for ticker in own:
+                    if ticker in quotes:
+                        quote = quotes[ticker]
+                        entry = self._entries[ticker] = CachedQuote(
+                            quote, quote.get("timestamp") or timestamp, fetched_at
+                        )
+                        result[ticker] = entry
+                        futures[ticker].set_result(entry)
+            finally:
+                # Waiters on a failed or cancelled fetch get no quote rather than hanging
+                for ticker, future in futures.items():
+                    if not future.done():
+                        future.set_result(None)
+                    if self._inflight.get(ticker) is future:
+                        del self._inflight[ticker]
+
+        for ticker, future in waiting.items():
+            entry = await asyncio.shield(future)
+            if entry is not None:
+                result[ticker] = entry
+        return result
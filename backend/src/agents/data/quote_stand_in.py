@@ -0,0 +1,105 @@
+"""
+Local stand-in for the HTTP quote source, for offline throughput benchmarks
+
+Serves Yahoo-style /v7/finance/quote?symbols=A,B,C responses with a random
+walk per symbol, optionally answering a share of requests with 429. Point
+the price agent at it with:
+
+    python src/agents/data/quote_stand_in.py --port 8765 --latency 0.05 --throttle 0.2
+    QUOTE_SOURCE_URL=http://localhost:8765/v7/finance/quote python src/agents/data/price_agent.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+
+class QuoteStandIn(ThreadingHTTPServer):
+    """Quote server with a fixed latency per request, a share `throttle` of
+    requests answered with 429, and request counters"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 8765, latency: float = 0.0, throttle: float = 0.0,
+                 retry_after: float = 0.0):
+        super().__init__(("localhost", port), _QuoteHandler)
+        self.latency = latency
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self._prices: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://localhost:{self.server_address[1]}/v7/finance/quote"
+
+    def quote(self, symbol: str) -> Dict:
+        with self._lock:
+            price = self._prices.get(symbol) or random.Random(symbol).uniform(20.0, 500.0)
+            price = max(0.01, price * (1 + random.gauss(0, 0.001)))
+            self._prices[symbol] = price
+        return {
+            "symbol": symbol,
+            "regularMarketPrice": round(price, 4),
+            "currency": "USD",
+            "regularMarketVolume": random.randint(10_000, 5_000_000),
+            "regularMarketTime": int(time.time())
+        }
+
+    def start(self) -> "QuoteStandIn":
+        """Serve from a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _QuoteHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/v7/finance/quote":
+            self.send_error(404)
+            return
+
+        self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.throttle and random.random() < self.server.throttle:
+            self.server.throttled += 1
+            self.send_response(429)
+            if self.server.retry_after:
+                self.send_header("Retry-After", str(self.server.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        symbols = [s for s in parse_qs(url.query).get("symbols", [""])[0].split(",") if s]
+        body = json.dumps({
+            "quoteResponse": {"result": [self.server.quote(s) for s in symbols], "error": None}
+        }).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the quote source")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--throttle", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After seconds sent with a 429")
+    args = parser.parse_args()
+
+    server = QuoteStandIn(args.port, args.latency, args.throttle, args.retry_after)
+    print(f"Serving quotes at {server.url}")
+    server.serve_forever()
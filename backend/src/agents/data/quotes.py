@@ -0,0 +1,153 @@
+"""
+Batched quote and history fetching for the price agent and the backfill job
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFTickerMissingError
+
+from src.agents.data.http_client import data_client
+
+# Optional HTTP quote source answering Yahoo-style /v7/finance/quote requests
+# (e.g. the local stand-in in quote_stand_in.py); yfinance charts are used otherwise
+QUOTE_SOURCE_URL = os.getenv("QUOTE_SOURCE_URL", "")
+QUOTE_TIMEOUT = float(os.getenv("QUOTE_TIMEOUT", "10"))
+
+# yfinance chart requests in flight at once within one batch; each still
+# takes its own token from the shared rate limit
+YFINANCE_WORKERS = int(os.getenv("YFINANCE_WORKERS", "4"))
+_chart_pool = ThreadPoolExecutor(max_workers=YFINANCE_WORKERS, thread_name_prefix="yf-chart")
+
+
+def fetch_quotes(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch price, currency and volume for many tickers in one batch.
+
+    A quote source (QUOTE_SOURCE_URL) answers the whole batch in one
+    request; yfinance takes one chart request per ticker. Returns
+    {ticker: {"price", "currency", "volume", "timestamp"}}, timestamped
+    with the market time of the quote (UTC, ISO format) so a quote fetched
+    again unchanged maps to the same market_data row; tickers without a
+    usable quote are left out.
+    """
+    if not tickers:
+        return {}
+    if QUOTE_SOURCE_URL:
+        return _fetch_from_source(tickers)
+    return _fetch_from_yfinance(tickers)
+
+
+def _fetch_from_source(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+    response = data_client.get(
+        QUOTE_SOURCE_URL, params={"symbols": ",".join(tickers)}, timeout=QUOTE_TIMEOUT
+    )
+    response.raise_for_status()
+
+    quotes = {}
+    for item in response.json()["quoteResponse"]["result"]:
+        price = item.get("regularMarketPrice")
+        if price:
+            quotes[item["symbol"]] = {
+                "price": float(price),
+                "currency": item.get("currency") or "USD",
+                "volume": int(item.get("regularMarketVolume") or 0)
+            }
+            if item.get("regularMarketTime"):
+                quotes[item["symbol"]]["timestamp"] = _market_time(item["regularMarketTime"])
+    return quotes
+
+
+def _fetch_from_yfinance(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+    # Today's daily bar: its close is the latest trade while the market is open
+    quotes = {}
+    for ticker, (frame, meta) in _charts(tickers, period="1d", interval="1d").items():
+        last = frame.iloc[-1]
+        volume = last.get("Volume", 0)
+        # Time of the last trade; it stays put while the market is closed
+        market_time = meta.get("regularMarketTime")
+        quotes[ticker] = {
+            "price": float(last["Close"]),
+            "currency": _currency(meta),
+            "volume": 0 if volume != volume else int(volume),  # NaN when no trades yet
+            "timestamp": (_market_time(market_time) if market_time
+                          else _utc(frame.index[-1:])[0].isoformat())
+        }
+    return quotes
+
+
+def _market_time(epoch) -> str:
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).isoformat()
+
+
+def _utc(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    # Daily bars come without a timezone, intraday bars in the exchange's
+    return index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+
+
+def _currency(meta: Dict[str, Any]) -> str:
+    return meta.get("currency") or "USD"
+
+
+def _chart(ticker: str, period: str, interval: str):
+    """(rows with a close, chart metadata) from one chart request under the shared client"""
+    stock = yf.Ticker(ticker, session=data_client.session)
+    try:
+        frame = data_client.call(
+            stock.history, period=period, interval=interval, auto_adjust=False, raise_errors=True
+        )
+    except YFTickerMissingError:
+        # Delisted, unknown or no bars in the period: no data rather than a failure
+        return pd.DataFrame(), {}
+    # Currency and market time come with the chart, so they cost no extra request
+    meta = stock.get_history_metadata() or {}
+    return frame.dropna(subset=["Close"]) if "Close" in frame else frame.iloc[0:0], meta
+
+
+def _charts(tickers: List[str], period: str, interval: str,
+            partial: bool = True) -> Dict[str, Tuple[Any, Dict[str, Any]]]:
+    """Chart and chart metadata per ticker; tickers without data are left out.
+
+    Raises the first failed request, or with `partial` only when no ticker
+    could be fetched at all.
+    """
+    def fetch(ticker: str):
+        try:
+            return ticker, _chart(ticker, period, interval), None
+        except Exception as e:
+            return ticker, None, e
+
+    charts, errors = {}, []
+    for ticker, chart, error in _chart_pool.map(fetch, tickers):
+        if error is not None:
+            errors.append(error)
+        elif not chart[0].empty:
+            charts[ticker] = chart
+    if errors and (not partial or not charts):
+        raise errors[0]
+    return charts
+
+
+def fetch_history(tickers: List[str], period: str = "2y",
+                  interval: str = "1d") -> Dict[str, List[Tuple[datetime, float, int, str]]]:
+    """Download bars for many tickers, one chart request per ticker.
+
+    Returns {ticker: [(timestamp (UTC), close, volume, currency), ...]} in
+    time order; tickers without data are left out.
+    """
+    if not tickers:
+        return {}
+
+    history = {}
+    # A failed request fails the whole batch, so the caller can retry it
+    for ticker, (frame, meta) in _charts(tickers, period=period, interval=interval, partial=False).items():
+        history[ticker] = list(zip(
+            _utc(frame.index).to_pydatetime(),
+            frame["Close"].astype(float).tolist(),
+            frame["Volume"].fillna(0).astype("int64").tolist() if "Volume" in frame else [0] * len(frame),
+            [_currency(meta)] * len(frame)
+        ))
+    return history
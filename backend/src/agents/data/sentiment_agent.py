@@ -1,10 +1,19 @@
-from typing import Dict, List
+# Add path to parent directory
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..')))
+
+import asyncio
+from typing import Dict, List, Optional
 from uagents import Agent, Context, Model
-import yfinance as yf
 from datetime import datetime
 import requests
 import numpy as np
-import random
+
+from src.agents.data.fetch_executor import run_fetch
+from src.agents.data.providers import get_provider
+from src.agents.data.sentiment_batcher import NEGATIVE, POSITIVE, SentimentBatcher
+from src.agents.data.sentiment_cache import SentimentCache, text_key
 
 
 try:
@@ -18,12 +27,21 @@ except ImportError:
 class SentimentRequest(Model):
     ticker: str
     timestamp: str           # trying this shit
+    cycle_id: Optional[str] = None  # Echoed back so the requester can join results
 
 class SentimentResponse(Model):
     ticker: str
     timestamp: str
     sentiment_score: float
     sentiment_magnitude: float
+    cycle_id: Optional[str] = None
+
+class BatchSentimentRequest(Model):
+    requests: List[SentimentRequest]
+
+class BatchSentimentResponse(Model):
+    results: List[SentimentResponse]
+    failed: List[str] = []  # Tickers whose news could not be fetched or scored
 
 # Initialize the sentiment agent
 sentiment_agent = Agent(
@@ -42,32 +60,34 @@ print(f"Data agent: Sentiment Analyzer")
 print(f"Address: {sentiment_agent.address}")
 print(f"Endpoint: http://localhost:8001/submit")
 
+# Headlines from concurrent requests are pooled into FinBERT batches of
+# FINBERT_BATCH_SIZE; a pool is scored once SENTIMENT_BATCH_TEXTS headlines
+# are waiting or the first has waited SENTIMENT_BATCH_WAIT seconds
+FINBERT_BATCH_SIZE = int(os.getenv("FINBERT_BATCH_SIZE", "16"))
+SENTIMENT_BATCH_TEXTS = int(os.getenv("SENTIMENT_BATCH_TEXTS", "256"))
+SENTIMENT_BATCH_WAIT = float(os.getenv("SENTIMENT_BATCH_WAIT", "0.05"))
+
+# FinBERT probabilities of every headline scored, kept on disk so repeated
+# news is never scored twice; an empty SENTIMENT_CACHE_PATH turns it off
+SENTIMENT_CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", "sentiment_cache.sqlite3")
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "100000"))
+
+# Most recent news items scored per ticker
+NEWS_ITEMS_PER_TICKER = int(os.getenv("NEWS_ITEMS_PER_TICKER", "30"))
+
+SENTIMENT_MODEL = "ProsusAI/finbert"
+
 # Initialize FinBERT model and tokenizer if available
 if FINBERT_AVAILABLE:
-    tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-    model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
-
-def get_sentiment_finbert(text: str) -> Dict[str, float]:
-    """Get sentiment using FinBERT with continuous scores"""
-    if not FINBERT_AVAILABLE:
-        return {"positive": 0.5, "negative": 0.0, "neutral": 0.5}
-        
-    if not text.strip():
-        return {"positive": 0.0, "negative": 0.0, "neutral": 1.0}
-        
-    inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=512)
-    outputs = model(**inputs)
-    predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
-    
-    # Convert to numpy array and get probabilities
-    probs = predictions.detach().numpy()[0]
-    
-    # Return dictionary with sentiment probabilities
-    return {
-        "positive": float(probs[0]),
-        "negative": float(probs[1]),
-        "neutral": float(probs[2])
-    }
+    tokenizer = AutoTokenizer.from_pretrained(SENTIMENT_MODEL)
+    model = AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL)
+    batcher = SentimentBatcher(
+        tokenizer, model,
+        batch_size=FINBERT_BATCH_SIZE,
+        max_texts=SENTIMENT_BATCH_TEXTS,
+        max_wait=SENTIMENT_BATCH_WAIT
+    )
+    sentiment_cache = SentimentCache(SENTIMENT_CACHE_PATH, SENTIMENT_CACHE_SIZE) if SENTIMENT_CACHE_PATH else None
 
 def get_basic_sentiment(text: str) -> Dict[str, float]:
     """Fallback function for basic sentiment analysis"""
@@ -99,59 +119,100 @@ def get_overall_sentiment(sentiment_scores: dict) -> float:
     """Calculate overall sentiment score from -1 (very negative) to 1 (very positive)"""
     return sentiment_scores["positive"] - sentiment_scores["negative"]
 
-def analyze_news_sentiment(ticker: str) -> Dict:
-    """Analyze sentiment for a ticker's news"""
-    # Get company info from yfinance
-    stock = yf.Ticker(ticker)
-    
-    # Get recent news
-    news = stock.news
+def _published(item: Dict) -> float:
+    """Publication time of a news item in epoch seconds (0 if unknown)"""
+    content = item.get('content') or {}
+    published = content.get('pubDate') or content.get('displayTime')
+    if published:
+        try:
+            return datetime.fromisoformat(published.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return float(item.get('providerPublishTime') or 0)
+
+def fetch_news_texts(ticker: str) -> List[str]:
+    """Headline and summary of a ticker's most recent news items"""
+    # Get recent news from the market data provider (yfinance unless replaying)
+    news = get_provider().fetch_news(ticker)
     
-    # Process each news item
-    sentiment_scores = []
-    if len(news) > 30:
-        sampled_news = random.sample(news, 30)
-    else:
-        sampled_news = news
-    for item in sampled_news:  # Get top 15 news items
+    # Newest first, so the same news gives the same selection and score every cycle
+    texts = []
+    for item in sorted(news, key=lambda item: (-_published(item), str(item.get('id', ''))))[:NEWS_ITEMS_PER_TICKER]:
         try:
-            summary = item.get('content','').get('title', '')
-            if 'summary' in item:
-                summary += " " + item.get('content').get('summary', '')
-                
-            # Analyze sentiment
-            if FINBERT_AVAILABLE:
-                sentiment = get_sentiment_finbert(summary)
-            else:
-                sentiment = get_basic_sentiment(summary)
-                
-            score = get_overall_sentiment(sentiment)
-            sentiment_scores.append(score)
+            content = item.get('content') or item
+            summary = content.get('title', '')
+            if content.get('summary'):
+                summary += " " + content['summary']
+            texts.append(summary)
         except Exception as e:
             print(f"Error processing news item: {e}")
-    
-    # Calculate average sentiment and magnitude
+    return texts
+
+def summarize_sentiment(sentiment_scores: List[float]) -> Dict:
+    """Average sentiment and magnitude of a ticker's news item scores"""
     if sentiment_scores:
         avg_sentiment = sum(sentiment_scores) / len(sentiment_scores)
         sentiment_magnitude = sum(abs(score) for score in sentiment_scores) / len(sentiment_scores)
-        # news_count = len(sentiment_scores)
     else:
         avg_sentiment = 0.0
         sentiment_magnitude = 0.0
-        # news_count = 0
     
     return {
         "sentiment_score": avg_sentiment,
         "sentiment_magnitude": sentiment_magnitude
     }
 
+async def score_headlines(texts: List[str]) -> np.ndarray:
+    """FinBERT probabilities for each text; only texts missing from the cache reach the model"""
+    if sentiment_cache is None:
+        return await batcher.score(texts)
+    
+    keys = [text_key(SENTIMENT_MODEL, text) for text in texts]
+    cached = await asyncio.to_thread(sentiment_cache.get_many, keys)
+    new = {key: text for key, text in zip(keys, texts) if key not in cached}
+    if new:
+        scored = await batcher.score(list(new.values()))
+        fresh = dict(zip(new, scored))
+        await asyncio.to_thread(sentiment_cache.put_many, fresh)
+        cached.update(fresh)
+    return np.array([cached[key] for key in keys]).reshape(len(keys), 3)
+
+async def analyze_tickers(tickers: List[str]) -> Dict[str, Dict]:
+    """Sentiment for many tickers: news is fetched concurrently, and all their
+    headlines are scored together with any other request's in shared batches.
+
+    Tickers whose news could not be fetched map to the exception instead.
+    """
+    news = await asyncio.gather(*(run_fetch(fetch_news_texts, ticker) for ticker in tickers),
+                                return_exceptions=True)
+    texts = [text for ticker_texts in news if not isinstance(ticker_texts, BaseException)
+             for text in ticker_texts]
+    
+    if FINBERT_AVAILABLE:
+        probs = await score_headlines(texts)
+        scores = (probs[:, POSITIVE] - probs[:, NEGATIVE]).tolist()
+    else:
+        scores = [get_overall_sentiment(get_basic_sentiment(text)) for text in texts]
+    
+    # Split the scores back out per ticker, in the order their texts went in
+    results, offset = {}, 0
+    for ticker, ticker_texts in zip(tickers, news):
+        if isinstance(ticker_texts, BaseException):
+            results[ticker] = ticker_texts
+            continue
+        results[ticker] = summarize_sentiment(scores[offset:offset + len(ticker_texts)])
+        offset += len(ticker_texts)
+    return results
+
 @sentiment_agent.on_message(SentimentRequest)
 async def handle_request(ctx: Context, sender: str, msg: SentimentRequest):
     ctx.logger.info(f"Received sentiment request for ticker: {msg.ticker}")
     
     try:
-        # Get news sentiment analysis
-        sentiment_data = analyze_news_sentiment(msg.ticker)
+        # News is fetched off the event loop and scored with other requests' headlines
+        sentiment_data = (await analyze_tickers([msg.ticker]))[msg.ticker]
+        if isinstance(sentiment_data, BaseException):
+            raise sentiment_data
         timestamp = msg.timestamp
         
         # Send response back
@@ -162,13 +223,43 @@ async def handle_request(ctx: Context, sender: str, msg: SentimentRequest):
                 timestamp=timestamp,
                 sentiment_score=float(sentiment_data["sentiment_score"]),
                 sentiment_magnitude=float(sentiment_data["sentiment_magnitude"]),
+                cycle_id=msg.cycle_id,
                 # news_count=sentiment_data["news_count"]
             )
         )
         ctx.logger.info(f"Sent sentiment data for {msg.ticker}: {sentiment_data}")
         
+    except asyncio.TimeoutError:
+        ctx.logger.error(f"Timed out analyzing sentiment for {msg.ticker}")
     except Exception as e:
         ctx.logger.error(f"Error processing sentiment request: {str(e)}")
 
+@sentiment_agent.on_message(BatchSentimentRequest)
+async def handle_batch_request(ctx: Context, sender: str, msg: BatchSentimentRequest):
+    ctx.logger.info(f"Received batch sentiment request for {len(msg.requests)} tickers from {sender}")
+    
+    try:
+        analyzed = await analyze_tickers(list(dict.fromkeys(request.ticker for request in msg.requests)))
+        
+        results, failed = [], []
+        for request in msg.requests:
+            sentiment_data = analyzed[request.ticker]
+            if isinstance(sentiment_data, BaseException):
+                failed.append(request.ticker)
+                continue
+            results.append(SentimentResponse(
+                ticker=request.ticker,
+                timestamp=request.timestamp,
+                sentiment_score=float(sentiment_data["sentiment_score"]),
+                sentiment_magnitude=float(sentiment_data["sentiment_magnitude"]),
+                cycle_id=request.cycle_id
+            ))
+        
+        await ctx.send(sender, BatchSentimentResponse(results=results, failed=failed))
+        ctx.logger.info(f"Sent sentiment for {len(results)} tickers, {len(failed)} failed")
+        
+    except Exception as e:
+        ctx.logger.error(f"Error processing batch sentiment request: {str(e)}")
+
 if __name__ == "__main__":
     sentiment_agent.run() 
\ No newline at end of file
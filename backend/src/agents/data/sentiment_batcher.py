@@ -0,0 +1,118 @@
+"""
+Cross-ticker batching of FinBERT inference for the sentiment agent
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+# FinBERT label order: positive, negative, neutral
+POSITIVE, NEGATIVE, NEUTRAL = 0, 1, 2
+
+
+def score_texts(tokenizer, model, texts: List[str], batch_size: int = 16,
+                max_length: int = 512) -> np.ndarray:
+    """Class probabilities (positive, negative, neutral) for each text, shape (len(texts), 3).
+
+    Texts are sorted by token length so every batch pads to about the same
+    length, and the results are returned in the original order. Blank texts
+    are neutral without going through the model.
+    """
+    import torch
+
+    probs = np.zeros((len(texts), 3))
+    probs[:, NEUTRAL] = 1.0
+    index = [i for i, text in enumerate(texts) if text.strip()]
+    if not index:
+        return probs
+
+    encoded = tokenizer([texts[i] for i in index], truncation=True, max_length=max_length)
+    order = sorted(range(len(index)), key=lambda j: len(encoded["input_ids"][j]))
+    with torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            inputs = tokenizer.pad(
+                {key: [encoded[key][j] for j in batch] for key in encoded.keys()},
+                return_tensors="pt"
+            )
+            logits = model(**inputs).logits
+            probs[[index[j] for j in batch]] = torch.softmax(logits, dim=-1).numpy()
+    return probs
+
+
+class SentimentBatcher:
+    """Pools texts from concurrent requests and scores them together.
+
+    Texts wait until `max_texts` are queued or the first has waited
+    `max_wait` seconds. They are then scored in padded batches of
+    `batch_size` on a single inference thread, and every caller gets back
+    the rows for its own texts.
+    """
+
+    def __init__(self, tokenizer, model, batch_size: int = 16, max_texts: int = 256,
+                 max_wait: float = 0.05, max_length: int = 512):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.batch_size = batch_size
+        self.max_texts = max_texts
+        self.max_wait = max_wait
+        self.max_length = max_length
+        self._pending: List[Tuple[List[str], asyncio.Future]] = []
+        self._pending_texts = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+        # One model call at a time; torch already uses every core within a call
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="finbert")
+        self.stats = dict.fromkeys(("requests", "texts", "flushes", "errors"), 0)
+
+    async def score(self, texts: List[str]) -> np.ndarray:
+        """Probabilities for `texts`, scored together with whatever else is queued"""
+        if not texts:
+            return np.zeros((0, 3))
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((list(texts), future))
+        self._pending_texts += len(texts)
+        self.stats["requests"] += 1
+
+        if self._pending_texts >= self.max_texts:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._pending_texts = self._pending, [], 0
+        if not pending:
+            return
+        task = asyncio.ensure_future(self._run(pending))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, pending: List[Tuple[List[str], asyncio.Future]]):
+        texts = [text for request, _ in pending for text in request]
+        self.stats["flushes"] += 1
+        self.stats["texts"] += len(texts)
+        try:
+            probs = await asyncio.get_running_loop().run_in_executor(
+                self._executor, score_texts, self.tokenizer, self.model,
+                texts, self.batch_size, self.max_length
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for request, future in pending:
+            # Callers that gave up (timed out or cancelled) are skipped
+            if not future.done():
+                future.set_result(probs[offset:offset + len(request)])
+            offset += len(request)
@@ -0,0 +1,104 @@
+"""
+Disk-backed cache of headline sentiment for the sentiment agent
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable
+
+import numpy as np
+
+# SQLite limits the number of parameters in one statement
+_CHUNK = 500
+
+
+def text_key(model_name: str, text: str) -> str:
+    """Cache key of a scored text; the model is part of it so a new model starts cold"""
+    return hashlib.blake2b(f"{model_name}\n{text}".encode(), digest_size=16).hexdigest()
+
+
+class SentimentCache:
+    """Class probabilities per text hash in SQLite, evicting the least recently used.
+
+    Holds at most `max_entries` rows. Reads and writes are short and
+    serialized, so the cache can be shared by threads.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self.stats = dict.fromkeys(("hits", "misses", "evicted"), 0)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS headline_sentiment (
+                    key TEXT PRIMARY KEY,
+                    positive REAL NOT NULL,
+                    negative REAL NOT NULL,
+                    neutral REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_headline_sentiment_last_used ON headline_sentiment (last_used)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM headline_sentiment").fetchone()[0]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Probabilities (positive, negative, neutral) for the keys that are cached"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _CHUNK):
+                chunk = keys[start:start + _CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                for key, positive, negative, neutral in self._conn.execute(
+                    f"SELECT key, positive, negative, neutral FROM headline_sentiment WHERE key IN ({placeholders})",
+                    chunk
+                ):
+                    found[key] = np.array((positive, negative, neutral))
+                if found:
+                    self._conn.execute(
+                        f"UPDATE headline_sentiment SET last_used = ? WHERE key IN ({placeholders})",
+                        [now, *chunk]
+                    )
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[str, np.ndarray]):
+        """Store probabilities and evict the least recently used rows over max_entries"""
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO headline_sentiment VALUES (?, ?, ?, ?, ?)",
+                    [(key, float(p[0]), float(p[1]), float(p[2]), now) for key, p in entries.items()]
+                )
+                excess = self._conn.execute("SELECT COUNT(*) FROM headline_sentiment").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self._conn.execute("""
+                        DELETE FROM headline_sentiment WHERE key IN (
+                            SELECT key FROM headline_sentiment ORDER BY last_used LIMIT ?
+                        )
+                    """, (excess,))
+                    self.stats["evicted"] += excess
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
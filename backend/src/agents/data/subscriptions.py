@@ -0,0 +1,74 @@
+"""
+Quote subscriptions held by the price agent
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class QuoteSubscriptions:
+    """Which subscriber wants which tickers, and the last quote pushed per ticker.
+
+    A subscription is the full ticker set of one subscriber and lasts `lease`
+    seconds unless renewed, so a subscriber that goes away stops receiving
+    updates without unsubscribing.
+    """
+
+    def __init__(self, lease: float = 90.0):
+        self.lease = lease
+        self._tickers: Dict[str, Set[str]] = {}
+        self._expires: Dict[str, float] = {}
+        self._pushed: Dict[str, Tuple[float, int]] = {}  # Ticker -> (price, volume) last pushed
+
+    def __len__(self) -> int:
+        return len(self._tickers)
+
+    def subscribe(self, subscriber: str, tickers: Iterable[str], now: float) -> Set[str]:
+        """Replace a subscriber's tickers (none unsubscribes); returns the newly added ones"""
+        tickers = set(tickers)
+        previous = self._tickers.pop(subscriber, set())
+        self._expires.pop(subscriber, None)
+        if tickers:
+            self._tickers[subscriber] = tickers
+            self._expires[subscriber] = now + self.lease
+        self._prune()
+        return tickers - previous
+
+    def expire(self, now: float) -> List[str]:
+        """Drop subscriptions whose lease ran out; returns their subscribers"""
+        expired = [subscriber for subscriber, expires in self._expires.items() if expires <= now]
+        for subscriber in expired:
+            del self._tickers[subscriber]
+            del self._expires[subscriber]
+        if expired:
+            self._prune()
+        return expired
+
+    def tickers(self) -> Set[str]:
+        """Every ticker at least one subscriber wants"""
+        return set().union(*self._tickers.values()) if self._tickers else set()
+
+    def changes(self, quotes: Dict[str, Dict]) -> Dict[str, List[str]]:
+        """Tickers whose price or volume moved since they were last pushed, per subscriber.
+
+        Takes {ticker: {"price", "volume", ...}} and records them as pushed.
+        """
+        changed = set()
+        for ticker, quote in quotes.items():
+            key = (quote["price"], quote["volume"])
+            if self._pushed.get(ticker) != key:
+                self._pushed[ticker] = key
+                changed.add(ticker)
+        if not changed:
+            return {}
+        return {subscriber: sorted(tickers & changed)
+                for subscriber, tickers in self._tickers.items() if tickers & changed}
+
+    def seed(self, quotes: Dict[str, Dict]):
+        """Record initial quotes sent to a new subscriber for tickers nobody had been sent yet"""
+        for ticker, quote in quotes.items():
+            self._pushed.setdefault(ticker, (quote["price"], quote["volume"]))
+
+    def _prune(self):
+        wanted = self.tickers()
+        for ticker in [ticker for ticker in self._pushed if ticker not in wanted]:
+            del self._pushed[ticker]
@@ -1,5 +1,7 @@
 # src/api/main.py
+import asyncio
 import random
+import sys
 from fastapi import FastAPI, HTTPException, Path
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -11,6 +13,13 @@ from dotenv import load_dotenv
 # import requests
 import yfinance as yf
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.agents.data.fetch_executor import run_fetch
+from src.agents.data.http_client import CircuitOpenError, data_client
+from src.orchestrator.backfill import (
+    BACKFILL_INTERVAL, BACKFILL_PERIOD, BackfillProgress, default_job_id, run_backfill
+)
+
 # Load environment variables
 load_dotenv()
 
@@ -94,6 +103,13 @@ class StrategyWeight(BaseModel):
     weight: float
     performance_score: Optional[float] = None
 
+class BackfillRequest(BaseModel):
+    tickers: Optional[List[str]] = None  # Every registered asset if omitted
+    period: str = BACKFILL_PERIOD
+    interval: str = BACKFILL_INTERVAL
+    job_id: Optional[str] = None
+    restart: bool = False
+
 class Performance(BaseModel):
     asset_id: str
     strategy_name: str
@@ -105,6 +121,36 @@ class Performance(BaseModel):
 
 
 
+# Backfill the history of every asset created through the API
+BACKFILL_NEW_ASSETS = os.getenv("BACKFILL_NEW_ASSETS", "true").lower() in ("1", "true", "yes")
+
+# Backfill jobs started by this process, and their tasks
+backfill_jobs: Dict[str, BackfillProgress] = {}
+_backfill_tasks = set()
+
+def start_backfill(request: BackfillRequest) -> BackfillProgress:
+    """Run a backfill job in the background; raises 409 if it is already running here"""
+    job_id = request.job_id or default_job_id(request.period, request.interval)
+    running = backfill_jobs.get(job_id)
+    if running is not None and running.status == "running":
+        raise HTTPException(status_code=409, detail=f"Backfill job '{job_id}' is already running")
+
+    progress = backfill_jobs[job_id] = BackfillProgress(job_id, 0)
+    task = asyncio.create_task(run_backfill(
+        request.tickers, request.period, request.interval, job_id,
+        restart=request.restart, progress=progress
+    ))
+    _backfill_tasks.add(task)
+
+    def _done(t: asyncio.Task):
+        _backfill_tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            print(f"Backfill job '{job_id}' failed: {t.exception()!r}")
+
+    task.add_done_callback(_done)
+    return progress
+
+
 @app.post("/assets")
 async def create_asset(asset: Asset):
     conn = get_db_connection()
@@ -112,7 +158,7 @@ async def create_asset(asset: Asset):
         with conn.cursor() as cur:
             # 🛠 If no name provided, auto-fetch it
             if not asset.name or asset.name.strip() == "":
-                asset.name = fetch_company_name(asset.ticker)
+                asset.name = await fetch_company_name_async(asset.ticker)
 
             cur.execute("""
                 INSERT INTO assets (ticker, name, asset_type)
@@ -122,6 +168,9 @@ async def create_asset(asset: Asset):
             
             result = cur.fetchone()
             conn.commit()
+            if BACKFILL_NEW_ASSETS:
+                # Strategies need a full window of history before they can answer
+                start_backfill(BackfillRequest(tickers=[result[0]], job_id=f"asset-{result[0]}"))
             return {"ticker": result[0], "name": result[1], "asset_type": result[2]}
     except psycopg2.IntegrityError:
         raise HTTPException(status_code=400, detail="Asset already exists")
@@ -166,7 +215,9 @@ async def delete_asset(ticker: str):
                 )
             """, (ticker, ticker))
             
-            # Step 2: Delete market data
+            # Step 2: Delete evaluation watermark and market data
+            cur.execute("DELETE FROM evaluation_watermarks WHERE asset_id = %s", (ticker,))
+            cur.execute("DELETE FROM backfill_progress WHERE asset_id = %s", (ticker,))
             cur.execute("DELETE FROM market_data WHERE asset_id = %s", (ticker,))
             
             # Step 3: Delete predictions
@@ -273,12 +324,14 @@ async def get_sentiment_data(asset_id: str, limit: int = 30):
 async def get_historical_data(asset_id: str):
     conn = get_db_connection()
     try:
-        # Your code to fetch data
-        import yfinance as yf
-        
-        stock = yf.Ticker(asset_id)
-        
-        hist = stock.history(period="1mo")
+        # Fetch on the shared executor so other requests keep being served
+        stock = yf.Ticker(asset_id, session=data_client.session)
+        try:
+            hist = await run_fetch(data_client.call, stock.history, period="1mo")
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"Timed out fetching history for {asset_id}")
+        except CircuitOpenError as e:
+            raise HTTPException(status_code=503, detail=str(e))
         
         # Convert to JSON-compatible format
         hist = hist.reset_index()
@@ -294,6 +347,38 @@ async def get_historical_data(asset_id: str):
     finally:
         conn.close()
 
+@app.post("/backfill")
+async def create_backfill(request: BackfillRequest):
+    """Start a backfill job; rerunning a job ID only loads the assets it has not finished"""
+    progress = start_backfill(request)
+    return {"job_id": progress.job_id, "status": progress.status}
+
+@app.get("/backfill/{job_id}")
+async def get_backfill(job_id: str):
+    """Progress of a backfill job: live counters if it ran here, otherwise what it has stored"""
+    if job_id in backfill_jobs:
+        return backfill_jobs[job_id].as_dict()
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(*), COUNT(completed_at), COALESCE(SUM(rows_loaded), 0)
+                FROM backfill_progress WHERE job_id = %s
+            """, (job_id,))
+            total, done, rows = cur.fetchone()
+            if not total:
+                raise HTTPException(status_code=404, detail="Backfill job not found")
+            return {
+                "job_id": job_id,
+                "status": "finished" if done == total else "incomplete",
+                "assets_total": total,
+                "assets_done": done,
+                "rows": rows
+            }
+    finally:
+        conn.close()
+
 @app.post("/predictions")
 async def create_prediction(prediction: Prediction):
     conn = get_db_connection()
@@ -519,8 +604,10 @@ def fetch_company_name(ticker: str) -> str:
     Raises HTTPException(400) if the ticker is invalid or name not found.
     """
     try:
-        tk = yf.Ticker(ticker)
-        info = tk.info  # pulls the "quoteSummary" data for you
+        tk = yf.Ticker(ticker, session=data_client.session)
+        info = data_client.call(lambda: tk.info)  # pulls the "quoteSummary" data for you
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Failed to fetch data for {ticker}: {e}")
 
@@ -530,4 +617,11 @@ def fetch_company_name(ticker: str) -> str:
             status_code=400,
             detail=f"No company name found for ticker '{ticker}'"
         )
-    return name
\ No newline at end of file
+    return name
+
+async def fetch_company_name_async(ticker: str) -> str:
+    """fetch_company_name on the shared fetch executor, with its timeout"""
+    try:
+        return await run_fetch(fetch_company_name, ticker)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Timed out fetching data for {ticker}")
@@ -0,0 +1,221 @@
+"""
+Parallel historical backfill of market_data
+
+Downloads bars for many assets in chunks, runs the downloads in parallel and
+bulk-loads each chunk with COPY into a staging table followed by an upsert.
+Progress is kept per asset in backfill_progress, committed with the chunk's
+rows, so rerunning a job only does the assets it has not finished:
+
+    python src/orchestrator/backfill.py --period 2y --interval 1d
+    python src/orchestrator/backfill.py AAPL MSFT --period 5d --interval 5m --job intraday
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import argparse
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.agents.data.fetch_executor import run_fetch
+from src.agents.data.providers import get_provider
+from src.orchestrator.db import DatabasePool
+from src.orchestrator.metrics import metrics
+
+# Assets per download, downloads running at once, and seconds one download may take
+BACKFILL_CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", "25"))
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+BACKFILL_FETCH_TIMEOUT = float(os.getenv("BACKFILL_FETCH_TIMEOUT", "120"))
+
+# Default history to load, as yfinance period and interval strings
+BACKFILL_PERIOD = os.getenv("BACKFILL_PERIOD", "2y")
+BACKFILL_INTERVAL = os.getenv("BACKFILL_INTERVAL", "1d")
+
+
+def default_job_id(period: str, interval: str) -> str:
+    """Same period and interval resume the same job unless a job ID is given"""
+    return f"{period}-{interval}"
+
+
+class BackfillProgress:
+    """Counters for one backfill run"""
+
+    def __init__(self, job_id: str, total: int):
+        self.job_id = job_id
+        self.total = total
+        self.done = 0
+        self.skipped = 0  # Finished by an earlier run of the job
+        self.failed = 0
+        self.rows = 0
+        self.status = "running"
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "assets_total": self.total,
+            "assets_done": self.done,
+            "assets_skipped": self.skipped,
+            "assets_failed": self.failed,
+            "rows": self.rows,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "rows_per_second": round(self.rows_per_second, 1)
+        }
+
+    def __str__(self) -> str:
+        return (f"[{self.job_id}] {self.done + self.skipped}/{self.total} assets "
+                f"({self.skipped} already done, {self.failed} failed), {self.rows} rows, "
+                f"{self.rows_per_second:.0f} rows/s")
+
+
+async def _pending_assets(pool: DatabasePool, job_id: str, tickers: Optional[Iterable[str]]) -> Tuple[List[str], int]:
+    """Register the job's assets and return the unfinished ones and how many were finished"""
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            # Only registered assets: market_data references assets(ticker)
+            await cur.execute("""
+                INSERT INTO backfill_progress (job_id, asset_id)
+                SELECT %(job_id)s, ticker FROM assets
+                WHERE %(tickers)s::text[] IS NULL OR ticker = ANY(%(tickers)s::text[])
+                ON CONFLICT (job_id, asset_id) DO NOTHING
+            """, {"job_id": job_id, "tickers": list(tickers) if tickers is not None else None})
+            await cur.execute("""
+                SELECT asset_id, completed_at IS NOT NULL FROM backfill_progress
+                WHERE job_id = %(job_id)s
+                AND (%(tickers)s::text[] IS NULL OR asset_id = ANY(%(tickers)s::text[]))
+                ORDER BY asset_id
+            """, {"job_id": job_id, "tickers": list(tickers) if tickers is not None else None})
+            rows = await cur.fetchall()
+        await conn.commit()
+    return [asset_id for asset_id, done in rows if not done], sum(done for _, done in rows)
+
+
+async def _load_chunk(pool: DatabasePool, job_id: str, chunk: List[str], history: Dict) -> int:
+    """COPY one chunk's bars into staging, upsert them and mark its assets done, in one transaction"""
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                CREATE TEMP TABLE backfill_staging (
+                    asset_id TEXT, timestamp TIMESTAMPTZ, price DECIMAL(20,8), volume BIGINT,
+                    currency VARCHAR(10)
+                ) ON COMMIT DROP
+            """)
+            async with cur.copy(
+                "COPY backfill_staging (asset_id, timestamp, price, volume, currency) FROM STDIN"
+            ) as copy:
+                for asset_id in chunk:
+                    for bar in history.get(asset_id, ()):
+                        await copy.write_row((asset_id, *bar))
+
+            # Rerunning a job overwrites its bars with the new download; sentiment is left alone
+            await cur.execute("""
+                INSERT INTO market_data (asset_id, timestamp, price, volume, currency, source)
+                SELECT DISTINCT ON (asset_id, timestamp) asset_id, timestamp, price, volume, currency, 'backfill'
+                FROM backfill_staging
+                ORDER BY asset_id, timestamp
+                ON CONFLICT (asset_id, timestamp) DO UPDATE SET
+                    price = EXCLUDED.price,
+                    volume = EXCLUDED.volume,
+                    currency = COALESCE(EXCLUDED.currency, market_data.currency)
+            """)
+            rows = cur.rowcount
+
+            await cur.executemany("""
+                UPDATE backfill_progress SET rows_loaded = %s, completed_at = CURRENT_TIMESTAMP
+                WHERE job_id = %s AND asset_id = %s
+            """, [(len(history.get(asset_id, ())), job_id, asset_id) for asset_id in chunk])
+        await conn.commit()
+    return rows
+
+
+async def run_backfill(tickers: Optional[List[str]] = None, period: str = BACKFILL_PERIOD,
+                       interval: str = BACKFILL_INTERVAL,
+                       job_id: Optional[str] = None, chunk_size: int = BACKFILL_CHUNK_SIZE,
+                       workers: int = BACKFILL_WORKERS, restart: bool = False,
+                       progress: Optional[BackfillProgress] = None,
+                       on_progress: Optional[Callable[[BackfillProgress], None]] = None) -> BackfillProgress:
+    """Backfill `tickers` (every registered asset by default); returns the run's progress.
+
+    A chunk that fails is left unfinished and retried by the next run of the job.
+    """
+    job_id = job_id or default_job_id(period, interval)
+    provider = get_provider()
+    pool = DatabasePool(min_size=1, max_size=workers)
+    await pool.open()
+    try:
+        if restart:
+            async with pool.connection() as conn:
+                await conn.execute("DELETE FROM backfill_progress WHERE job_id = %s", (job_id,))
+                await conn.commit()
+
+        pending, finished = await _pending_assets(pool, job_id, tickers)
+        progress = progress or BackfillProgress(job_id, 0)
+        progress.total = len(pending) + finished
+        progress.skipped = finished
+        if tickers is not None and progress.total < len(set(tickers)):
+            print(f"[{job_id}] Skipping {len(set(tickers)) - progress.total} tickers that are not registered assets")
+
+        semaphore = asyncio.Semaphore(workers)
+
+        async def backfill_chunk(chunk: List[str]):
+            async with semaphore:
+                try:
+                    history = await run_fetch(
+                        provider.fetch_history, chunk, period, interval, timeout=BACKFILL_FETCH_TIMEOUT
+                    )
+                    rows = await _load_chunk(pool, job_id, chunk, history)
+                except Exception as e:
+                    progress.failed += len(chunk)
+                    metrics.incr("backfill_chunk_errors")
+                    print(f"[{job_id}] Chunk {chunk[0]}..{chunk[-1]} failed: {e!r}")
+                    return
+                progress.done += len(chunk)
+                progress.rows += rows
+                metrics.incr("backfill_rows", rows)
+                if on_progress:
+                    on_progress(progress)
+
+        chunks = [pending[start:start + chunk_size] for start in range(0, len(pending), chunk_size)]
+        await asyncio.gather(*(backfill_chunk(chunk) for chunk in chunks))
+        progress.status = "failed" if progress.failed else "finished"
+    except Exception:
+        if progress is not None:
+            progress.status = "failed"
+        raise
+    finally:
+        if progress is not None:
+            progress.finished = time.monotonic()
+        await pool.close()
+    return progress
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill market_data with historical bars")
+    parser.add_argument("tickers", nargs="*", help="Assets to backfill (default: every registered asset)")
+    parser.add_argument("--period", default=BACKFILL_PERIOD, help="How far back, as yfinance periods (5d, 1mo, 2y, max)")
+    parser.add_argument("--interval", default=BACKFILL_INTERVAL, help="Bar size, as yfinance intervals (1m, 5m, 1h, 1d)")
+    parser.add_argument("--job", help="Job ID to resume (default: <period>-<interval>)")
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    parser.add_argument("--restart", action="store_true", help="Forget the job's progress and start over")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_backfill(
+        args.tickers or None, args.period, args.interval, args.job,
+        chunk_size=args.chunk_size, workers=args.workers, restart=args.restart,
+        on_progress=print
+    ))
+    print(f"Backfill {result.status}: {result}")
+    sys.exit(1 if result.failed else 0)
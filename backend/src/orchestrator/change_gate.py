@@ -0,0 +1,67 @@
+"""
+Change detection for analysis inputs
+"""
+
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+
+class InputFingerprint(NamedTuple):
+    """What an analysis depends on: latest price, latest sentiment and history watermark"""
+    price: float
+    sentiment_score: Optional[float]
+    history_end: Optional[datetime]  # Newest history row; moves on every append, also once the window is full
+
+
+class ChangeGate:
+    """Skips re-analysis of an asset whose inputs have not moved since its last decision.
+
+    Prices are compared relatively and sentiment absolutely. Each new
+    fingerprint is compared with the one from the last analysis that ran,
+    so slow drift still triggers a new analysis once it adds up.
+    """
+
+    def __init__(self, price_epsilon: float = 1e-4, sentiment_epsilon: float = 1e-3):
+        self.price_epsilon = price_epsilon
+        self.sentiment_epsilon = sentiment_epsilon
+        self._analyzed: Dict[str, InputFingerprint] = {}
+        self._decisions: Dict[str, Any] = {}
+
+    @staticmethod
+    def fingerprint(current_data: Dict[str, Any], history_end: Optional[datetime]) -> InputFingerprint:
+        return InputFingerprint(
+            float(current_data["price"]),
+            current_data.get("sentiment_score"),
+            history_end
+        )
+
+    def unchanged(self, asset_id: str, fingerprint: InputFingerprint) -> bool:
+        previous = self._analyzed.get(asset_id)
+        if previous is None or previous.history_end != fingerprint.history_end:
+            return False
+
+        if previous.price == 0:
+            if fingerprint.price != 0:
+                return False
+        elif abs(fingerprint.price - previous.price) / abs(previous.price) > self.price_epsilon:
+            return False
+
+        if (previous.sentiment_score is None) != (fingerprint.sentiment_score is None):
+            return False
+        if (previous.sentiment_score is not None
+                and abs(fingerprint.sentiment_score - previous.sentiment_score) > self.sentiment_epsilon):
+            return False
+        return True
+
+    def record(self, asset_id: str, fingerprint: InputFingerprint, decision: Any):
+        """Remember the inputs and decision of an analysis that ran"""
+        self._analyzed[asset_id] = fingerprint
+        self._decisions[asset_id] = decision
+
+    def forget(self, asset_id: str):
+        """Force the next analysis of this asset to run"""
+        self._analyzed.pop(asset_id, None)
+        self._decisions.pop(asset_id, None)
+
+    def last_decision(self, asset_id: str) -> Optional[Any]:
+        return self._decisions.get(asset_id)
@@ -0,0 +1,38 @@
+"""
+Request/response correlation for messages exchanged with strategy agents
+"""
+
+import asyncio
+import uuid
+from typing import Any, Dict, Tuple
+
+
+class ResponseCorrelator:
+    """Matches incoming responses to the requests that produced them by request ID"""
+
+    def __init__(self):
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def register(self) -> Tuple[str, asyncio.Future]:
+        """Create a new request ID and the future its response will resolve"""
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        return request_id, future
+
+    def resolve(self, request_id: str, response: Any) -> bool:
+        """Deliver a response; returns False for unknown or already expired requests"""
+        future = self._pending.pop(request_id, None)
+        if future is None or future.done():
+            return False
+        future.set_result(response)
+        return True
+
+    def discard(self, request_id: str):
+        """Forget a request, e.g. after its deadline has passed"""
+        future = self._pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.cancel()
+
+    def __len__(self) -> int:
+        return len(self._pending)
@@ -0,0 +1,90 @@
+"""
+Database access for the orchestrator
+"""
+
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.types.numeric import FloatLoader
+from psycopg_pool import AsyncConnectionPool
+
+from src.orchestrator.metrics import metrics
+
+
+def get_conninfo() -> str:
+    """Build the connection string from the environment"""
+    return make_conninfo(
+        dbname=os.getenv("DB_NAME", "myquant"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", ""),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432")
+    )
+
+def register_dec2float(conn):
+    """Return DECIMAL columns as Python floats"""
+    conn.adapters.register_loader("numeric", FloatLoader)
+
+def get_db_connection() -> psycopg.Connection:
+    """Open a standalone synchronous connection (schema setup and scripts)"""
+    conn = psycopg.connect(get_conninfo())
+    register_dec2float(conn)
+    return conn
+
+
+class DatabasePool:
+    """Shared async connection pool used by the meta agent's handlers"""
+
+    def __init__(self, min_size: int = 2, max_size: int = 10, timeout: float = 30.0):
+        self.timeout = timeout
+        self._pool = AsyncConnectionPool(
+            get_conninfo(),
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            configure=self._configure,
+            open=False
+        )
+        self._in_use = 0
+
+    @staticmethod
+    async def _configure(conn: psycopg.AsyncConnection):
+        # Runs once per physical connection instead of once per query
+        register_dec2float(conn)
+
+    async def open(self):
+        """Open the pool and wait for min_size connections"""
+        await self._pool.open(wait=True)
+
+    async def close(self):
+        await self._pool.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection; commits on success and rolls back on error"""
+        start = time.perf_counter()
+        async with self._pool.connection() as conn:
+            metrics.observe("db_pool_wait_seconds", time.perf_counter() - start)
+            self._in_use += 1
+            metrics.set_gauge("db_pool_in_use", self._in_use)
+            try:
+                yield conn
+            finally:
+                self._in_use -= 1
+                metrics.set_gauge("db_pool_in_use", self._in_use)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool usage as reported by psycopg_pool"""
+        return {**self._pool.get_stats(), "connections_in_use": self._in_use}
+
+
+# Shared pool for the orchestrator process
+db_pool = DatabasePool(
+    min_size=int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+    max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", "30"))
+)
@@ -0,0 +1,112 @@
+"""
+Vectorized meta-decision rules across many assets
+
+decide() applies the same rules as a per-asset weighted vote and produces
+exactly the same floats: weighted confidences are accumulated strategy by
+strategy in column order, the way the per-asset sums add them up.
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.orchestrator.scoring import BUY, HOLD, SELL
+
+# Decision rules
+CONFIDENCE_THRESHOLD = 0.4  # Minimum normalized score to buy or sell
+MIN_HOLD_CONFIDENCE = 0.5   # Holds are reported with at least this confidence
+
+# Action code for missing predictions and actions outside buy/sell/hold;
+# they take part in no vote
+NO_ACTION = -1
+
+ACTION_NAMES = {BUY: "buy", SELL: "sell", HOLD: "hold"}
+_ACTION_CODES = {name: code for code, name in ACTION_NAMES.items()}
+
+
+def encode_decision_actions(actions: Iterable[str]) -> np.ndarray:
+    """Map action names to BUY/SELL/HOLD codes and anything else to NO_ACTION"""
+    return np.fromiter((_ACTION_CODES.get(action, NO_ACTION) for action in actions), dtype=np.int8)
+
+
+class PredictionMatrix(NamedTuple):
+    """Predictions of every strategy for every asset, one row per asset"""
+    asset_ids: List[str]
+    strategy_names: List[str]
+    actions: np.ndarray      # (assets, strategies) action codes
+    confidences: np.ndarray  # (assets, strategies)
+    responded: np.ndarray    # (assets, strategies); False cells get weight 0
+    sources: Optional[List[List[Dict[str, Any]]]] = None  # Prediction dicts per asset, if built from them
+
+    @classmethod
+    def from_predictions(cls, predictions_by_asset: Dict[str, List[Dict[str, Any]]],
+                         strategy_names: Optional[Sequence[str]] = None) -> "PredictionMatrix":
+        """Build the matrix from per-asset prediction dicts as collected by the meta agent.
+
+        Columns follow `strategy_names`, or the order strategies first appear.
+        """
+        if strategy_names is None:
+            strategy_names = list(dict.fromkeys(
+                pred["strategy"] for predictions in predictions_by_asset.values() for pred in predictions
+            ))
+        columns = {name: column for column, name in enumerate(strategy_names)}
+
+        asset_ids = list(predictions_by_asset)
+        shape = (len(asset_ids), len(strategy_names))
+        actions = np.full(shape, NO_ACTION, dtype=np.int8)
+        confidences = np.zeros(shape)
+        responded = np.zeros(shape, dtype=bool)
+        for row, asset_id in enumerate(asset_ids):
+            for pred in predictions_by_asset[asset_id]:
+                column = columns[pred["strategy"]]
+                actions[row, column] = _ACTION_CODES.get(pred["prediction"]["action"], NO_ACTION)
+                confidences[row, column] = pred["confidence"]
+                responded[row, column] = pred.get("responded", True)
+
+        return cls(asset_ids, list(strategy_names), actions, confidences, responded,
+                   [predictions_by_asset[asset_id] for asset_id in asset_ids])
+
+
+def decide(actions: np.ndarray, confidences: np.ndarray, weights: np.ndarray,
+           responded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Weighted buy/sell/hold vote for every asset at once.
+
+    Args:
+        actions: (assets, strategies) action codes
+        confidences: (assets, strategies) prediction confidences
+        weights: (strategies,) strategy weights, or one row per asset
+        responded: Optional (assets, strategies) mask; other cells get weight 0
+
+    Returns:
+        tuple: (weighted, scores, decisions, decision_confidences) where
+        weighted is the (assets, strategies) weighted confidence, scores the
+        (assets, 3) normalized buy/sell/hold scores (zero when no strategy
+        voted with any weight) and decisions the chosen action codes
+    """
+    actions = np.asarray(actions)
+    confidences = np.asarray(confidences, dtype=np.float64)
+    weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), confidences.shape)
+    if responded is not None:
+        weights = np.where(responded, weights, 0.0)
+    weighted = confidences * weights
+
+    votes = np.zeros((len(actions), 3))
+    for column in range(actions.shape[1]):
+        for code in (BUY, SELL, HOLD):
+            votes[:, code] += np.where(actions[:, column] == code, weighted[:, column], 0.0)
+
+    total = votes[:, BUY] + votes[:, SELL] + votes[:, HOLD]
+    has_votes = total != 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(has_votes[:, None], votes / total[:, None], 0.0)
+    buy, sell, hold = scores[:, BUY], scores[:, SELL], scores[:, HOLD]
+
+    is_buy = has_votes & (buy > CONFIDENCE_THRESHOLD) & (buy > sell) & (buy > hold)
+    is_sell = has_votes & ~is_buy & (sell > CONFIDENCE_THRESHOLD) & (sell > buy) & (sell > hold)
+    decisions = np.select([is_buy, is_sell], [BUY, SELL], HOLD).astype(np.int8)
+    decision_confidences = np.select(
+        [is_buy, is_sell, has_votes],
+        [buy, sell, np.maximum(hold, MIN_HOLD_CONFIDENCE)],
+        MIN_HOLD_CONFIDENCE
+    )
+    return weighted, scores, decisions, decision_confidences
@@ -0,0 +1,240 @@
+"""
+In-memory rolling market data for the orchestrator
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Column layout of the ring buffer
+PRICE, VOLUME, SENTIMENT_SCORE, SENTIMENT_MAGNITUDE, TIMESTAMP = range(5)
+FIELDS = 5
+
+
+def _to_epoch(timestamp: datetime) -> float:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+def _optional(value: Optional[float]) -> float:
+    return np.nan if value is None else float(value)
+
+def _value(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+class AssetHistory:
+    """Fixed-size ring buffer of the most recent market data rows for one asset"""
+
+    def __init__(self, capacity: int = 90):
+        self.capacity = capacity
+        self.currency: Optional[str] = None
+        self._rows = np.full((capacity, FIELDS), np.nan)
+        self._head = 0  # Next slot to write
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def export(self) -> Tuple[np.ndarray, int, int]:
+        """Raw ring state: (rows, head, size)"""
+        return self._rows, self._head, self._size
+
+    @classmethod
+    def restore(cls, rows: np.ndarray, head: int, size: int,
+                currency: Optional[str] = None) -> "AssetHistory":
+        """Rebuild a history from exported ring state (the rows are copied)"""
+        history = cls(len(rows))
+        history._rows[:] = rows
+        history._head = head
+        history._size = size
+        history.currency = currency
+        return history
+
+    def copy(self) -> "AssetHistory":
+        return self.restore(self._rows, self._head, self._size, self.currency)
+
+    def _slot(self, age: int) -> int:
+        """Slot of the row `age` steps back from the newest (0 = newest)"""
+        return (self._head - 1 - age) % self.capacity
+
+    def _find(self, epoch: float) -> Optional[int]:
+        for age in range(self._size):
+            slot = self._slot(age)
+            if self._rows[slot, TIMESTAMP] == epoch:
+                return slot
+            if self._rows[slot, TIMESTAMP] < epoch:
+                break
+        return None
+
+    @property
+    def last_timestamp(self) -> Optional[datetime]:
+        if not self._size:
+            return None
+        return datetime.fromtimestamp(self._rows[self._slot(0), TIMESTAMP], tz=timezone.utc)
+
+    def append(self, timestamp: datetime, price: Optional[float], volume: Optional[float] = None,
+               sentiment_score: Optional[float] = None, sentiment_magnitude: Optional[float] = None,
+               currency: Optional[str] = None):
+        """Add a row, or update it in place if a row with the same timestamp exists"""
+        epoch = _to_epoch(timestamp)
+        if currency:
+            self.currency = currency
+
+        slot = self._find(epoch)
+        if slot is not None:
+            row = self._rows[slot]
+            for column, value in ((PRICE, price), (VOLUME, volume),
+                                  (SENTIMENT_SCORE, sentiment_score),
+                                  (SENTIMENT_MAGNITUDE, sentiment_magnitude)):
+                if value is not None:
+                    row[column] = float(value)
+            return
+
+        if self._size and epoch < self._rows[self._slot(0), TIMESTAMP]:
+            # Out-of-order rows are only kept in the database
+            return
+
+        self._rows[self._head] = (
+            _optional(price), _optional(volume),
+            _optional(sentiment_score), _optional(sentiment_magnitude), epoch
+        )
+        self._head = (self._head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def update_sentiment(self, timestamp: datetime, sentiment_score: float, sentiment_magnitude: float):
+        """Attach sentiment to the row with this timestamp (or add a sentiment-only row)"""
+        self.append(timestamp, None, sentiment_score=sentiment_score,
+                    sentiment_magnitude=sentiment_magnitude)
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Most recent row with a price, as the current_data dict sent to strategies"""
+        for row in self._iter_rows():
+            if not np.isnan(row[PRICE]):
+                data = self._to_dict(row)
+                data["currency"] = self.currency
+                return data
+        return None
+
+    def history(self) -> List[Dict[str, Any]]:
+        """Rows with a price, newest first"""
+        return [self._to_dict(row) for row in self._iter_rows() if not np.isnan(row[PRICE])]
+
+    def prices(self) -> np.ndarray:
+        """Prices oldest to newest, skipping rows without a price"""
+        ordered = np.roll(self._rows, -self._head, axis=0)[self.capacity - self._size:]
+        prices = ordered[:, PRICE]
+        return prices[~np.isnan(prices)]
+
+    def _iter_rows(self) -> Iterator[np.ndarray]:
+        for age in range(self._size):
+            yield self._rows[self._slot(age)]
+
+    @staticmethod
+    def _to_dict(row: np.ndarray) -> Dict[str, Any]:
+        volume = _value(row[VOLUME])
+        return {
+            "price": float(row[PRICE]),
+            "volume": int(volume) if volume is not None else None,
+            "sentiment_score": _value(row[SENTIMENT_SCORE]),
+            "sentiment_magnitude": _value(row[SENTIMENT_MAGNITUDE]),
+            "timestamp": datetime.fromtimestamp(row[TIMESTAMP], tz=timezone.utc).isoformat()
+        }
+
+
+class MarketDataBuffers:
+    """Per-asset ring buffers, filled from price/sentiment messages and loaded once from Postgres"""
+
+    def __init__(self, capacity: int = 90):
+        self.capacity = capacity
+        self._assets: Dict[str, AssetHistory] = {}
+
+    def get(self, asset_id: str) -> Optional[AssetHistory]:
+        return self._assets.get(asset_id)
+
+    def get_or_create(self, asset_id: str) -> AssetHistory:
+        history = self._assets.get(asset_id)
+        if history is None:
+            history = self._assets[asset_id] = AssetHistory(self.capacity)
+        return history
+
+    def __contains__(self, asset_id: str) -> bool:
+        return asset_id in self._assets
+
+    def items(self):
+        return self._assets.items()
+
+    def discard(self, asset_id: str):
+        self._assets.pop(asset_id, None)
+
+    def restore(self, histories: Dict[str, AssetHistory]):
+        """Install histories from a snapshot, skipping any with a different capacity"""
+        for asset_id, history in histories.items():
+            if history.capacity == self.capacity:
+                self._assets[asset_id] = history
+
+    async def catch_up(self, pool, asset_ids: Iterable[str]) -> int:
+        """Bring restored buffers up to date with rows written since their newest one.
+
+        The newest buffered row is read again, in case sentiment was attached
+        to it later. Returns rows loaded.
+        """
+        since = {asset_id: self._assets[asset_id].last_timestamp
+                 for asset_id in asset_ids if asset_id in self._assets}
+        since = {asset_id: timestamp for asset_id, timestamp in since.items() if timestamp is not None}
+        if not since:
+            return 0
+
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT asset_id, timestamp, price, volume, sentiment_score,
+                           sentiment_magnitude, currency
+                    FROM (
+                        SELECT md.*, ROW_NUMBER() OVER (
+                            PARTITION BY md.asset_id ORDER BY md.timestamp DESC
+                        ) AS rn
+                        FROM market_data md
+                        JOIN unnest(%s::text[], %s::timestamptz[]) AS since(asset_id, last_timestamp)
+                        ON md.asset_id = since.asset_id AND md.timestamp >= since.last_timestamp
+                    ) recent
+                    WHERE rn <= %s
+                    ORDER BY asset_id, timestamp
+                """, (list(since), list(since.values()), self.capacity))
+                rows = await cur.fetchall()
+
+        for asset_id, timestamp, price, volume, score, magnitude, currency in rows:
+            self._assets[asset_id].append(timestamp, price, volume, score, magnitude, currency)
+        return len(rows)
+
+    async def load(self, pool, asset_ids: Optional[Iterable[str]] = None) -> int:
+        """Fill buffers with the newest `capacity` rows per asset; returns rows loaded.
+
+        With `asset_ids`, only those assets are loaded and their buffers start from scratch.
+        """
+        if asset_ids is not None:
+            asset_ids = list(asset_ids)
+            for asset_id in asset_ids:
+                self.discard(asset_id)
+
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT asset_id, timestamp, price, volume, sentiment_score,
+                           sentiment_magnitude, currency
+                    FROM (
+                        SELECT *, ROW_NUMBER() OVER (
+                            PARTITION BY asset_id ORDER BY timestamp DESC
+                        ) AS rn
+                        FROM market_data
+                        WHERE %(asset_ids)s::text[] IS NULL OR asset_id = ANY(%(asset_ids)s::text[])
+                    ) recent
+                    WHERE rn <= %(capacity)s
+                    ORDER BY asset_id, timestamp
+                """, {"asset_ids": asset_ids, "capacity": self.capacity})
+                rows = await cur.fetchall()
+
+        for asset_id, timestamp, price, volume, score, magnitude, currency in rows:
+            self.get_or_create(asset_id).append(timestamp, price, volume, score, magnitude, currency)
+        return len(rows)
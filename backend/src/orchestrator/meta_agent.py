@@ -1,36 +1,46 @@
 # Add path to parent directory
 import os
+import socket
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from uagents import Agent, Context, Model
 from uagents.setup import fund_agent_if_low
-import psycopg2
 from datetime import datetime, timedelta
 import json
 import uuid
+import time
 import asyncio
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Set, Tuple
 import numpy as np
 
-# Import message models from data agents
-from src.agents.data.price_agent import PriceRequest, PriceResponse
-from src.agents.data.sentiment_agent import SentimentRequest, SentimentResponse
+# Import message models from data and strategy agents
+from src.agents.data.price_agent import (
+    BatchPriceRequest, BatchPriceResponse, PriceResponse, QuoteSubscription, QuoteUpdate
+)
+from src.agents.data.sentiment_agent import (
+    BatchSentimentRequest, BatchSentimentResponse, SentimentRequest, SentimentResponse
+)
+from src.agents.base_agent import AnalysisRequest, AgentResponse
+from src.orchestrator.change_gate import ChangeGate
+from src.orchestrator.correlation import ResponseCorrelator
+from src.orchestrator.db import db_pool, get_db_connection
+from src.orchestrator.decision import ACTION_NAMES, NO_ACTION, PredictionMatrix, decide
+from src.orchestrator.market_buffer import MarketDataBuffers
+from src.orchestrator.pipeline import AssetCycle, AssetPipeline
+from src.orchestrator.sharding import ShardCoordinator, evaluation_lock_key
+from src.orchestrator.snapshot import Snapshot, read_snapshot, take_snapshot, write_snapshot
+from src.orchestrator.scheduler import AssetScheduler, TradingCalendar, realized_volatility
+from src.orchestrator.weight_cache import WEIGHTS_CHANNEL, StrategyWeightCache
+from src.orchestrator.write_buffer import WriteBehindBuffer
+from src.orchestrator.metrics import metrics
+from src.orchestrator.scoring import (
+    encode_actions,
+    fold_strategy_weights,
+    score_predictions,
+)
 
 # Define message models
-class AnalysisRequest(Model):
-    asset_id: str
-    timestamp: str
-    current_data: Dict[str, Any]
-    
-class StrategyResponse(Model):
-    asset_id: str
-    timestamp: str
-    prediction: Dict[str, Any]
-    confidence: float
-    reasoning: str
-    strategy_name: str
-
 class MetaDecision(Model):
     asset_id: str
     timestamp: str
@@ -40,12 +50,20 @@ class MetaDecision(Model):
     predictions: List[Dict[str, Any]]
     weighted_predictions: List[Dict[str, Any]]
 
+class MetricsResponse(Model):
+    metrics: Dict[str, Any]
+    db_pool: Dict[str, Any]
+
+# Several meta agents can share one database; each needs its own instance ID and port
+META_INSTANCE_ID = os.getenv("META_INSTANCE_ID", "")
+META_AGENT_PORT = int(os.getenv("META_AGENT_PORT", "8000"))
+
 # Initialize the meta agent with stable seed
 meta_agent = Agent(
     name="investment_meta_agent",
-    port=8000,
-    endpoint=["http://localhost:8000/submit"],
-    seed="meta_agent_seed_phrase",
+    port=META_AGENT_PORT,
+    endpoint=[f"http://localhost:{META_AGENT_PORT}/submit"],
+    seed="meta_agent_seed_phrase" + (f"_{META_INSTANCE_ID}" if META_INSTANCE_ID else ""),
 )
 
 # Fund the agent if needed
@@ -54,7 +72,7 @@ fund_agent_if_low(meta_agent.wallet.address())
 # Print agent information
 print(f"Meta agent: Investment Orchestrator")
 print(f"Address: {meta_agent.address}")
-print(f"Endpoint: http://localhost:8000/submit")
+print(f"Endpoint: http://localhost:{META_AGENT_PORT}/submit")
 
 # Run each agent separately and get their addresses by running:
 # - python src/agents/data/price_agent.py
@@ -81,32 +99,147 @@ STRATEGY_AGENTS = {
 
 PENDING_REGISTRATIONS = []
 
-# Run the agents and update the addresses before starting the meta agent
+# Seconds between an asset's analysis cycles while its market is open;
+# the scheduler widens this for quiet assets and outside exchange hours
+ANALYSIS_PERIOD = float(os.getenv("ANALYSIS_PERIOD", "18.0"))
+CLOSED_MARKET_PERIOD = float(os.getenv("CLOSED_MARKET_PERIOD", "3600"))
 
-# Database connection
-def get_db_connection():
-    conn =  psycopg2.connect(
-        dbname=os.getenv("DB_NAME", "myquant"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", ""),
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", "5432")
-    )
-    DEC2FLOAT = psycopg2.extensions.new_type(
-        psycopg2.extensions.DECIMAL.values,
-        'DEC2FLOAT',
-        lambda value, curs: float(value) if value is not None else None
-    )
-    psycopg2.extensions.register_type(DEC2FLOAT)
+# Per-sample volatility at which an asset runs exactly every ANALYSIS_PERIOD
+REFERENCE_VOLATILITY = float(os.getenv("REFERENCE_VOLATILITY", "0.002"))
+
+# How often the scheduler checks for due assets, and reloads the asset list
+SCHEDULER_TICK = float(os.getenv("SCHEDULER_TICK", "1.0"))
+ASSET_REFRESH_INTERVAL = float(os.getenv("ASSET_REFRESH_INTERVAL", "60"))
+
+# Maximum number of assets analyzed at the same time within one cycle
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "16"))
+
+# Maximum number of asset cycles outstanding (requested but not yet analyzed)
+MAX_IN_FLIGHT_ASSETS = int(os.getenv("MAX_IN_FLIGHT_ASSETS", "500"))
+
+# Largest number of tickers in one BatchPriceRequest; a tick's due assets
+# are normally requested together in a single message
+PRICE_BATCH_SIZE = int(os.getenv("PRICE_BATCH_SIZE", "500"))
+
+# Largest number of tickers in one BatchSentimentRequest; the sentiment agent
+# fetches their news concurrently and scores all headlines in shared batches
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "50"))
+
+# Subscribe to this instance's tickers instead of requesting prices every cycle:
+# the price agent pushes a quote when it changes, which also brings the asset's
+# next analysis forward. The subscription is renewed every SUBSCRIPTION_RENEW_INTERVAL seconds
+PRICE_SUBSCRIPTION = os.getenv("PRICE_SUBSCRIPTION", "false").lower() in ("1", "true", "yes")
+SUBSCRIPTION_RENEW_INTERVAL = float(os.getenv("SUBSCRIPTION_RENEW_INTERVAL", "30"))
+
+# Latest pushed quote per subscribed asset
+pushed_quotes: Dict[str, PriceResponse] = {}
+
+# Assets ordered by their next due time
+scheduler = AssetScheduler(
+    TradingCalendar(),
+    base_interval=ANALYSIS_PERIOD,
+    closed_interval=CLOSED_MARKET_PERIOD,
+    min_interval=ANALYSIS_PERIOD / 4,
+    max_interval=ANALYSIS_PERIOD * 4,
+    reference_volatility=REFERENCE_VOLATILITY
+)
+assets_refreshed_at = float("-inf")
+
+# Backfills finished within this many seconds are picked up on the next asset
+# refresh; assets already reloaded for a backfill map to its completion time
+BACKFILL_RELOAD_WINDOW = ASSET_REFRESH_INTERVAL + 600
+backfills_reloaded: Dict[str, datetime] = {}
+
+# Every asset in the database (ticker -> asset_type); this instance analyzes its shard of it
+asset_universe: Dict[str, Optional[str]] = {}
+
+# Instances heartbeat every SHARD_HEARTBEAT_INTERVAL seconds and are considered
+# dead (their assets move to the others) after SHARD_LEASE_TIMEOUT seconds
+SHARD_HEARTBEAT_INTERVAL = float(os.getenv("SHARD_HEARTBEAT_INTERVAL", "5.0"))
+SHARD_LEASE_TIMEOUT = float(os.getenv("SHARD_LEASE_TIMEOUT", "15.0"))
+shards = ShardCoordinator(
+    META_INSTANCE_ID or f"{socket.gethostname()}:{META_AGENT_PORT}",
+    lease_timeout=SHARD_LEASE_TIMEOUT
+)
+
+# Seconds to wait for each strategy before it is left out of the decision
+STRATEGY_TIMEOUT = float(os.getenv("STRATEGY_TIMEOUT", "5.0"))
+
+# Rows of market data kept in memory per asset (the longest strategy window)
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "90"))
+
+# Recent market data per asset, filled from price and sentiment messages
+market_buffers = MarketDataBuffers(capacity=HISTORY_WINDOW)
+
+# Inserts are batched and written once enough rows are pending or the
+# oldest pending row is WRITE_FLUSH_INTERVAL seconds old
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "1000"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "5.0"))
+
+# Failed flushes a buffered row survives before it is dropped; rows the database
+# rejects (such as rows of a deleted asset) are dropped on the first failure
+WRITE_MAX_RETRIES = int(os.getenv("WRITE_MAX_RETRIES", "5"))
+write_buffer = WriteBehindBuffer(
+    db_pool, max_rows=WRITE_BATCH_SIZE, max_delay=WRITE_FLUSH_INTERVAL, max_retries=WRITE_MAX_RETRIES
+)
+
+# Inputs that moved less than this (relative price, absolute sentiment) since the
+# asset's last analysis reuse that analysis instead of querying the strategies
+PRICE_CHANGE_EPSILON = float(os.getenv("PRICE_CHANGE_EPSILON", "0.0001"))
+SENTIMENT_CHANGE_EPSILON = float(os.getenv("SENTIMENT_CHANGE_EPSILON", "0.001"))
+change_gate = ChangeGate(price_epsilon=PRICE_CHANGE_EPSILON, sentiment_epsilon=SENTIMENT_CHANGE_EPSILON)
+
+# Seconds from requesting a cycle's price and sentiment to analyzing with what arrived
+PIPELINE_DEADLINE = float(os.getenv("PIPELINE_DEADLINE", "10.0"))
+
+# Active price/sentiment cycle per asset
+pipeline = AssetPipeline()
+
+# Outstanding analysis requests, keyed by request ID
+strategy_responses = ResponseCorrelator()
+
+# Strategy weights used by every decision; written through on local updates
+# and refreshed by notification when they change anywhere else
+weight_cache = StrategyWeightCache()
+weight_listener: Optional[asyncio.Task] = None
+
+# Warm-restart snapshot of the in-memory state, written every SNAPSHOT_INTERVAL
+# seconds and on shutdown; an empty SNAPSHOT_PATH turns snapshots off
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", f"meta_agent_{META_AGENT_PORT}.snapshot")
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "60"))
+
+# Assets whose buffers came from the snapshot and only need a catch-up once leased
+restored_assets: Set[str] = set()
+
+# Keep references to background tasks so they are not garbage collected
+_background_tasks = set()
+
+def spawn(ctx: Context, coro, description: str):
+    """Run a coroutine in the background and log any error it raises"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+
+    def _done(t: asyncio.Task):
+        _background_tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            ctx.logger.error(f"Error in {description}: {str(t.exception())}")
+
+    task.add_done_callback(_done)
+    return task
+
+# Run the agents and update the addresses before starting the meta agent
 
-    return conn
-    
 # Initialize the database
 def init_db():
     """Create tables if they don't exist"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
+            # Instances starting together set the schema up one at a time: the
+            # first-run checks below and the trigger swap are not safe to race.
+            # The lock is released when this transaction commits
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('meta_agent.init_db'))")
+            
             # Create assets table
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS assets (
@@ -189,6 +322,84 @@ def init_db():
                 )
             """)
             
+            # Create evaluation_watermarks table (last evaluated prediction per asset)
+            cur.execute("SELECT to_regclass('evaluation_watermarks') IS NULL")
+            first_watermarks = cur.fetchone()[0]
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS evaluation_watermarks (
+                    asset_id VARCHAR(20) PRIMARY KEY REFERENCES assets(ticker),
+                    last_prediction_id INTEGER NOT NULL DEFAULT 0,
+                    last_evaluated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            if first_watermarks:
+                # One-off backfill: start each asset right before its oldest
+                # unevaluated prediction so nothing is evaluated twice
+                cur.execute("""
+                    INSERT INTO evaluation_watermarks (asset_id, last_prediction_id)
+                    SELECT p.asset_id,
+                           COALESCE(MIN(p.id) FILTER (WHERE ph.id IS NULL) - 1, MAX(p.id))
+                    FROM predictions p
+                    LEFT JOIN performance_history ph ON p.id = ph.prediction_id
+                    GROUP BY p.asset_id
+                """)
+            
+            # Create orchestrator_instances table (live meta agents sharing the asset universe)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS orchestrator_instances (
+                    instance_id VARCHAR(100) PRIMARY KEY,
+                    started_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    heartbeat_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Create backfill_progress table (assets each backfill job has loaded)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS backfill_progress (
+                    job_id VARCHAR(100) NOT NULL,
+                    asset_id VARCHAR(20) NOT NULL,
+                    rows_loaded INTEGER NOT NULL DEFAULT 0,
+                    completed_at TIMESTAMP WITH TIME ZONE,
+                    PRIMARY KEY (job_id, asset_id)
+                )
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_backfill_progress_completed_at
+                ON backfill_progress (completed_at)
+            """)
+            
+            # Publish every strategy_weights change to the orchestrators' weight caches
+            cur.execute(f"""
+                CREATE OR REPLACE FUNCTION notify_strategy_weights() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        PERFORM pg_notify('{WEIGHTS_CHANNEL}', json_build_object(
+                            'strategy_name', OLD.strategy_name, 'weight', NULL)::text);
+                    ELSE
+                        PERFORM pg_notify('{WEIGHTS_CHANNEL}', json_build_object(
+                            'strategy_name', NEW.strategy_name, 'weight', NEW.weight)::text);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """)
+            cur.execute("DROP TRIGGER IF EXISTS strategy_weights_notify ON strategy_weights")
+            cur.execute("""
+                CREATE TRIGGER strategy_weights_notify
+                AFTER INSERT OR UPDATE OR DELETE ON strategy_weights
+                FOR EACH ROW EXECUTE FUNCTION notify_strategy_weights()
+            """)
+            
+            # Indexes used by incremental performance evaluation
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_predictions_asset_id_id
+                ON predictions (asset_id, id)
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_performance_history_prediction_id
+                ON performance_history (prediction_id)
+            """)
+            
             # Initialize strategy weights if not exists
             for strategy in STRATEGY_AGENTS.keys():
                 cur.execute("""
@@ -204,456 +415,736 @@ def init_db():
 # Initialize DB on startup
 init_db()
 
-@meta_agent.on_interval(period=18.0)  # Run every 30 seconds
+@meta_agent.on_interval(period=SCHEDULER_TICK)
 async def analyze_investments(ctx: Context):
-    """Main analysis loop that runs periodically"""
-    # Get list of assets to analyze from database
-    conn = get_db_connection()
+    """Main analysis loop: start a cycle for every asset the scheduler says is due"""
+    cycle_start = time.perf_counter()
+    now = time.time()
+
+    await refresh_schedule(now)
+    due = scheduler.pop_due(now)
+    if not due:
+        return
+    
+    admitted = admit_assets(ctx, due, now)
+    
+    # Queue every due asset's next run, including the ones skipped this time
+    for asset_id, _ in due:
+        history = market_buffers.get(asset_id)
+        volatility = realized_volatility(history.prices()) if history else None
+        scheduler.reschedule(asset_id, now, volatility)
+    
+    # Analyze every asset as its own task, bounded by the concurrency limit
+    semaphore = asyncio.Semaphore(ANALYSIS_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(analyze_asset(ctx, asset_id, semaphore))
+        for asset_id in admitted
+    ]
+    cycles = [cycle for cycle in await asyncio.gather(*tasks) if cycle is not None]
+
+    # Prices and sentiment for every started cycle come from bulk requests
+    await request_prices(ctx, cycles)
+    await request_sentiment(ctx, cycles)
+    
+    # Analysis starts when both results are joined, or at the deadline, which
+    # counts from now so a long tick does not use it up before the requests go out
+    for cycle in cycles:
+        spawn(ctx, expire_cycle(ctx, cycle.asset_id, cycle.cycle_id), f"deadline of {cycle.asset_id}")
+
+    processed = len(cycles)
+    skipped = len(due) - processed
+    elapsed = time.perf_counter() - cycle_start
+    metrics.incr("assets_scheduled", len(due))
+    metrics.observe("analysis_cycle_seconds", elapsed)
+    metrics.set_gauge("assets_in_flight", len(pipeline))
+    ctx.logger.info(
+        f"Analysis cycle finished in {elapsed:.2f}s: "
+        f"{processed} assets processed, {skipped} skipped, {len(pipeline)} in flight"
+    )
+
+async def refresh_schedule(now: float):
+    """Reload the asset list every ASSET_REFRESH_INTERVAL seconds and schedule this instance's shard"""
+    global asset_universe, assets_refreshed_at
+    if now - assets_refreshed_at < ASSET_REFRESH_INTERVAL:
+        return
+    async with db_pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT ticker, asset_type FROM assets")
+            asset_universe = {row[0]: row[1] for row in await cur.fetchall()}
+            await cur.execute("""
+                SELECT asset_id, MAX(completed_at) FROM backfill_progress
+                WHERE completed_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 second' AND rows_loaded > 0
+                GROUP BY asset_id
+            """, (BACKFILL_RELOAD_WINDOW,))
+            backfilled = dict(await cur.fetchall())
+    scheduler.sync(owned_assets(), now)
+    assets_refreshed_at = now
+    await reload_backfilled(backfilled)
+
+async def reload_backfilled(backfilled: Dict[str, datetime]):
+    """Reload the buffers of owned assets whose history a backfill just filled in"""
+    for asset_id in [asset_id for asset_id in backfills_reloaded if asset_id not in backfilled]:
+        del backfills_reloaded[asset_id]
+    reload = {asset_id for asset_id, completed_at in backfilled.items()
+              if shards.owns(asset_id) and backfills_reloaded.get(asset_id) != completed_at}
+    if not reload:
+        return
+    # Rows still buffered for writing would be missing from the reload
+    await write_buffer.flush()
+    await market_buffers.load(db_pool, reload)
+    for asset_id in reload:
+        backfills_reloaded[asset_id] = backfilled[asset_id]
+        change_gate.forget(asset_id)
+    metrics.incr("backfilled_assets_reloaded", len(reload))
+
+def still_owned(ctx: Context, asset_id: str, step: str) -> bool:
+    """Whether this instance still leases the asset; once released, its new owner does the work"""
+    if shards.owns(asset_id):
+        return True
+    ctx.logger.info(f"{asset_id} was released to another instance; skipping its {step}")
+    metrics.incr("cycle_steps_skipped_not_owned")
+    return False
+
+def owned_assets() -> Dict[str, Optional[str]]:
+    """The part of the asset universe this instance currently holds leases for"""
+    return {asset_id: asset_type for asset_id, asset_type in asset_universe.items()
+            if shards.owns(asset_id)}
+
+@meta_agent.on_interval(period=SHARD_HEARTBEAT_INTERVAL)
+async def rebalance_shards(ctx: Context):
+    """Heartbeat and take or release asset leases as instances join and leave"""
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT ticker FROM assets")
-            assets = [row[0] for row in cur.fetchall()]
-    finally:
-        conn.close()
+        gained, lost = await shards.rebalance(asset_universe)
+    except Exception as e:
+        # Without the lock session this instance cannot prove it owns anything
+        ctx.logger.error(f"Shard rebalance failed, releasing all assets: {str(e)}")
+        metrics.incr("shard_rebalance_errors")
+        gained, lost = set(), await shards.drop()
+    if gained or lost:
+        await apply_ownership_change(ctx, gained, lost)
+
+async def apply_ownership_change(ctx: Context, gained: set, lost: set):
+    for asset_id in lost:
+        market_buffers.discard(asset_id)
+        change_gate.forget(asset_id)
+        pushed_quotes.pop(asset_id, None)
+    scheduler.sync(owned_assets(), time.time())
+    if PRICE_SUBSCRIPTION:
+        await subscribe_quotes(ctx)
+
+    # Restored buffers only need what was written since the snapshot; for the
+    # rest, another instance kept them current, so start from what it wrote
+    warm = gained & restored_assets
+    restored_assets.difference_update(gained)
+    rows = 0
+    if warm:
+        rows += await market_buffers.catch_up(db_pool, warm)
+    if gained - warm:
+        rows += await market_buffers.load(db_pool, gained - warm)
+    metrics.incr("shard_assets_gained", len(gained))
+    metrics.incr("shard_assets_lost", len(lost))
+    ctx.logger.info(
+        f"Instance {shards.instance_id} gained {len(gained)} and released {len(lost)} assets "
+        f"(now {len(shards.owned)} of {len(asset_universe)} across {len(shards.ring.instances)} "
+        f"instances); loaded {rows} market data rows"
+    )
+
+def admit_assets(ctx: Context, due: List[Tuple[str, float]], now: float) -> List[str]:
+    """Choose which due assets start a new cycle now.
+
+    An asset whose previous cycle is still in flight is skipped, and no new
+    cycles start once MAX_IN_FLIGHT_ASSETS cycles are outstanding.
+    """
+    admitted = []
+    skipped_in_flight = skipped_backpressure = 0
+    max_lag = 0.0
+    for asset_id, due_at in due:
+        if asset_id in pipeline:
+            skipped_in_flight += 1
+            continue
+        if len(pipeline) + len(admitted) >= MAX_IN_FLIGHT_ASSETS:
+            skipped_backpressure += 1
+            continue
+        
+        # Lag: how long after its due time this asset's cycle starts
+        max_lag = max(max_lag, now - due_at)
+        admitted.append(asset_id)
     
-    # For each asset, get market data and analyze
-    for asset_id in assets:
+    metrics.incr("cycles_skipped_in_flight", skipped_in_flight)
+    metrics.incr("cycles_skipped_backpressure", skipped_backpressure)
+    metrics.set_gauge("analysis_lag_seconds", max_lag)
+    if skipped_in_flight or skipped_backpressure:
+        ctx.logger.warning(
+            f"Skipped {skipped_in_flight} assets still in flight and "
+            f"{skipped_backpressure} over the in-flight limit of {MAX_IN_FLIGHT_ASSETS}"
+        )
+    return admitted
+
+async def analyze_asset(ctx: Context, asset_id: str, semaphore: asyncio.Semaphore) -> Optional[AssetCycle]:
+    """Update performance and start a data cycle for a single asset; returns the cycle"""
+    async with semaphore:
         timestamp = datetime.now().isoformat()
+        try:
+            # First, update performance of previous predictions
+            await update_performance(ctx, asset_id)
+
+            # Then, collect new data and make new predictions
+            return await collect_and_analyze(ctx, asset_id, timestamp)
+        except Exception as e:
+            ctx.logger.error(f"Skipping {asset_id} this cycle: {str(e)}")
+            return None
+
+async def request_prices(ctx: Context, cycles: List[AssetCycle]):
+    """Ask the price agent for every cycle's quote in as few messages as possible"""
+    if PRICE_SUBSCRIPTION:
+        # Subscribed assets already have their latest quote; only request the others
+        cycles = [cycle for cycle in cycles if not attach_pushed_price(ctx, cycle)]
+    for start in range(0, len(cycles), PRICE_BATCH_SIZE):
+        batch = cycles[start:start + PRICE_BATCH_SIZE]
+        try:
+            await ctx.send(
+                DATA_AGENTS["price"],
+                BatchPriceRequest(
+                    tickers=[cycle.asset_id for cycle in batch],
+                    cycle_ids={cycle.asset_id: cycle.cycle_id for cycle in batch}
+                )
+            )
+        except Exception as e:
+            # The cycles still run at their deadline with the last known price
+            ctx.logger.error(f"Error requesting prices for {len(batch)} assets: {str(e)}")
+            continue
+        metrics.incr("price_batches_sent")
+        metrics.observe("price_batch_size", len(batch))
+
+def attach_pushed_price(ctx: Context, cycle: AssetCycle) -> bool:
+    """Join the asset's latest pushed quote (already recorded) into a new cycle"""
+    quote = pushed_quotes.get(cycle.asset_id)
+    if quote is None:
+        return False
+    ready = pipeline.add_price(cycle.asset_id, cycle.cycle_id, quote)
+    if ready is not None:
+        spawn(ctx, complete_cycle(ctx, ready, "joined"), f"analysis of {cycle.asset_id}")
+    metrics.incr("price_pushed_joined")
+    return True
+
+async def subscribe_quotes(ctx: Context):
+    """Replace this instance's quote subscription with the assets it owns"""
+    tickers = sorted(owned_assets())
+    try:
+        await ctx.send(DATA_AGENTS["price"], QuoteSubscription(tickers=tickers))
+    except Exception as e:
+        ctx.logger.error(f"Error subscribing to {len(tickers)} quotes: {str(e)}")
+        return
+    metrics.set_gauge("price_subscribed_assets", len(tickers))
+
+@meta_agent.on_interval(period=SUBSCRIPTION_RENEW_INTERVAL)
+async def renew_subscription(ctx: Context):
+    """Renew the quote subscription before the price agent's lease on it runs out"""
+    if PRICE_SUBSCRIPTION and asset_universe:
+        await subscribe_quotes(ctx)
+
+@meta_agent.on_message(QuoteUpdate)
+async def handle_quote_update(ctx: Context, sender: str, msg: QuoteUpdate):
+    """Record pushed quotes and bring the changed assets' analysis forward"""
+    metrics.incr("price_updates_received")
+    metrics.incr("price_quotes_pushed", len(msg.quotes))
+    now = time.time()
+    for quote in msg.quotes:
+        if not shards.owns(quote.ticker):
+            continue
+        pushed_quotes[quote.ticker] = quote
+        record_price(ctx, quote)
         
-        # First, update performance of previous predictions
-        await update_performance(ctx, asset_id)
-        
-        # Then, collect new data and make new predictions
-        await collect_and_analyze(ctx, asset_id, timestamp)
+        # A cycle still waiting on its price takes this one
+        cycle = pipeline.get(quote.ticker)
+        if cycle is not None and cycle.price is None and pipeline.waiting(quote.ticker, cycle.cycle_id):
+            attach_pushed_price(ctx, cycle)
+        else:
+            scheduler.expedite(quote.ticker, now)
 
 # Handle price response
+@meta_agent.on_message(BatchPriceResponse)
+async def handle_batch_price_data(ctx: Context, sender: str, msg: BatchPriceResponse):
+    """Handle the quotes for one batch of assets"""
+    ctx.logger.info(f"Received {len(msg.quotes)} quotes, {len(msg.missing)} missing")
+    metrics.incr("price_quotes_missing", len(msg.missing))
+    for quote in msg.quotes:
+        record_price(ctx, quote)
+
 @meta_agent.on_message(PriceResponse)
 async def handle_price_data(ctx: Context, sender: str, msg: PriceResponse):
     """Handle incoming price data"""
     ctx.logger.info(f"Received price data for {msg.ticker}")
+    record_price(ctx, msg)
+
+def record_price(ctx: Context, msg: PriceResponse):
+    """Buffer a quote and release its cycle for analysis once sentiment is in too"""
+    timestamp = datetime.fromisoformat(msg.timestamp)
     
-    # Store price data in database
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO market_data 
-                (asset_id, timestamp, price, volume, currency)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (asset_id, timestamp) 
-                DO UPDATE SET price = EXCLUDED.price, volume = EXCLUDED.volume
-            """, (
-                msg.ticker,
-                datetime.fromisoformat(msg.timestamp),
-                msg.current_price,
-                msg.volume,
-                msg.currency
-            ))
-            conn.commit()
-    finally:
-        conn.close()
-    
-    # Request sentiment analysis
-    await ctx.send(
-        DATA_AGENTS["sentiment"],
-        SentimentRequest(
-            ticker=msg.ticker,
-            timestamp=msg.timestamp
-        )
+    # Queue price data for the next batched write
+    write_buffer.add_market_data(
+        msg.ticker,
+        timestamp,
+        price=msg.current_price,
+        volume=msg.volume,
+        currency=msg.currency
     )
+    market_buffers.get_or_create(msg.ticker).append(
+        timestamp,
+        msg.current_price,
+        msg.volume,
+        currency=msg.currency
+    )
+    
+    cycle = pipeline.add_price(msg.ticker, msg.cycle_id, msg)
+    if cycle is not None:
+        spawn(ctx, complete_cycle(ctx, cycle, "joined"), f"analysis of {msg.ticker}")
+
+async def request_sentiment(ctx: Context, cycles: List[AssetCycle]):
+    """Ask the sentiment agent for every cycle's sentiment in batches"""
+    for start in range(0, len(cycles), SENTIMENT_BATCH_SIZE):
+        batch = cycles[start:start + SENTIMENT_BATCH_SIZE]
+        try:
+            await ctx.send(
+                DATA_AGENTS["sentiment"],
+                BatchSentimentRequest(requests=[
+                    SentimentRequest(ticker=cycle.asset_id, timestamp=cycle.timestamp, cycle_id=cycle.cycle_id)
+                    for cycle in batch
+                ])
+            )
+        except Exception as e:
+            # The cycles still run at their deadline with the price alone
+            ctx.logger.error(f"Error requesting sentiment for {len(batch)} assets: {str(e)}")
+            continue
+        metrics.incr("sentiment_batches_sent")
+        metrics.observe("sentiment_batch_size", len(batch))
 
 # Handle sentiment response
+@meta_agent.on_message(BatchSentimentResponse)
+async def handle_batch_sentiment_data(ctx: Context, sender: str, msg: BatchSentimentResponse):
+    """Handle the sentiment for one batch of assets"""
+    ctx.logger.info(f"Received sentiment for {len(msg.results)} assets, {len(msg.failed)} failed")
+    metrics.incr("sentiment_failed", len(msg.failed))
+    for result in msg.results:
+        receive_sentiment(ctx, result)
+
 @meta_agent.on_message(SentimentResponse)
 async def handle_sentiment_data(ctx: Context, sender: str, msg: SentimentResponse):
     """Handle incoming sentiment data"""
     ctx.logger.info(f"Received sentiment data for {msg.ticker}")
+    receive_sentiment(ctx, msg)
+
+def receive_sentiment(ctx: Context, msg: SentimentResponse):
+    """Join sentiment into its cycle, or attach it to the newest row if the cycle is gone"""
+    if pipeline.waiting(msg.ticker, msg.cycle_id):
+        # Stored with the price of the same cycle once both are joined
+        cycle = pipeline.add_sentiment(msg.ticker, msg.cycle_id, msg)
+        if cycle is not None:
+            spawn(ctx, complete_cycle(ctx, cycle, "joined"), f"analysis of {msg.ticker}")
+        return
     
-    # Store sentiment data in database
-    conn = get_db_connection()
+    # Late or unsolicited: attach it to the newest market data row
+    history = market_buffers.get(msg.ticker)
+    last_timestamp = history.last_timestamp if history else None
+    record_sentiment(msg, last_timestamp or datetime.fromisoformat(msg.timestamp))
+
+def record_sentiment(msg: SentimentResponse, timestamp: datetime):
+    """Store sentiment on the market_data row with the given timestamp"""
+    # Queue sentiment data for the next batched write
+    write_buffer.add_market_data(
+        msg.ticker,
+        timestamp,
+        sentiment_score=msg.sentiment_score,
+        sentiment_magnitude=msg.sentiment_magnitude
+    )
+    market_buffers.get_or_create(msg.ticker).update_sentiment(
+        timestamp,
+        msg.sentiment_score,
+        msg.sentiment_magnitude
+    )
+
+async def complete_cycle(ctx: Context, cycle: AssetCycle, outcome: str):
+    """Join the cycle's results into market data and run the analysis"""
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO sentiment_data 
-                (asset_id, timestamp, sentiment_score, sentiment_magnitude)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (asset_id, timestamp) 
-                DO UPDATE SET sentiment_score = EXCLUDED.sentiment_score, 
-                              sentiment_magnitude = EXCLUDED.sentiment_magnitude
-            """, (
-                msg.ticker,
-                datetime.fromisoformat(msg.timestamp),
-                msg.sentiment_score,
-                msg.sentiment_magnitude
-            ))
-            conn.commit()
-            
-            # Proceed with analysis after sentiment data is stored
-            await perform_analysis(ctx, msg.ticker, msg.timestamp)
+        if cycle.price is None and cycle.sentiment is None:
+            ctx.logger.warning(f"No price or sentiment for {cycle.asset_id} before the deadline")
+            metrics.incr("pipeline_empty")
+            return
+        if not still_owned(ctx, cycle.asset_id, "analysis"):
+            return
+        
+        if cycle.sentiment is not None:
+            # Sentiment belongs on the market data row of this cycle's price
+            if cycle.price is not None:
+                timestamp = datetime.fromisoformat(cycle.price.timestamp)
+            else:
+                timestamp = datetime.fromisoformat(cycle.sentiment.timestamp)
+            record_sentiment(cycle.sentiment, timestamp)
+        
+        metrics.incr(f"pipeline_{outcome}")
+        metrics.observe("pipeline_join_seconds", cycle.age)
+        
+        # Analysis waits on strategy responses, which are delivered through
+        # this agent's message queue, so it always runs outside the handlers
+        await perform_analysis(ctx, cycle.asset_id, cycle.timestamp)
     finally:
-        conn.close()
+        pipeline.finish(cycle.asset_id, cycle.cycle_id)
+
+async def expire_cycle(ctx: Context, asset_id: str, cycle_id: str):
+    """Release a cycle for analysis once its deadline passes"""
+    await asyncio.sleep(PIPELINE_DEADLINE)
+    cycle = pipeline.expire(asset_id, cycle_id)
+    if cycle is not None:
+        missing = "price" if cycle.price is None else "sentiment"
+        ctx.logger.warning(f"Deadline passed for {asset_id} without {missing}; analyzing with what arrived")
+        await complete_cycle(ctx, cycle, "expired")
+
+# Handle strategy responses
+@meta_agent.on_message(AgentResponse)
+async def handle_strategy_response(ctx: Context, sender: str, msg: AgentResponse):
+    """Hand a strategy response to the analysis waiting for it"""
+    if not msg.request_id or not strategy_responses.resolve(msg.request_id, msg):
+        ctx.logger.warning(
+            f"Discarding late or unknown response from {msg.strategy_name} for {msg.asset_id}"
+        )
 
 async def update_performance(ctx: Context, asset_id: str):
-    """Update performance of previous predictions"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            # Get previous predictions that need performance evaluation
-            cur.execute("""
-                SELECT p.id, p.strategy_name, p.prediction, p.timestamp
-                FROM predictions p
-                LEFT JOIN performance_history ph ON p.id = ph.prediction_id
-                WHERE p.asset_id = %s 
-                AND ph.id IS NULL
+    """Update performance of predictions made since the asset's evaluation watermark.
 
-            """, (asset_id,))
+    Only predictions with an id above the watermark are read, so the cost of a
+    cycle depends on the number of new predictions, not on the table size.
+    """
+    if not still_owned(ctx, asset_id, "evaluation"):
+        return
+    async with db_pool.connection() as conn:
+        async with conn.cursor() as cur:
+            # One evaluation of the asset at a time across instances, taken before
+            # the watermark is read so an old and a new owner never score the same
+            # predictions twice
+            await cur.execute("SELECT pg_advisory_xact_lock(%s)", (evaluation_lock_key(asset_id),))
             
+            # Resolve the price right after each new prediction and the
+            # latest price for the asset in a single as-of query
+            await cur.execute("""
+                WITH watermark AS (
+                    SELECT COALESCE(MAX(last_prediction_id), 0) AS last_prediction_id
+                    FROM evaluation_watermarks
+                    WHERE asset_id = %s
+                ),
+                latest AS (
+                    SELECT price
+                    FROM market_data
+                    WHERE asset_id = %s AND price IS NOT NULL
+                    ORDER BY timestamp DESC
+                    LIMIT 1
+                )
+                SELECT p.id, p.strategy_name, p.prediction, p.timestamp,
+                       COALESCE(before.price, 0), COALESCE(latest.price, 0)
+                FROM predictions p
+                CROSS JOIN watermark w
+                LEFT JOIN LATERAL (
+                    SELECT md.price
+                    FROM market_data md
+                    WHERE md.asset_id = p.asset_id
+                    AND md.timestamp > p.timestamp
+                    AND md.price IS NOT NULL
+                    ORDER BY md.timestamp
+                    LIMIT 1
+                ) before ON TRUE
+                LEFT JOIN latest ON TRUE
+                WHERE p.asset_id = %s 
+                AND p.id > w.last_prediction_id
+                AND NOT EXISTS (
+                    SELECT 1 FROM performance_history ph WHERE ph.prediction_id = p.id
+                )
+                ORDER BY p.id
+            """, (asset_id, asset_id, asset_id))
             
-            predictions = cur.fetchall()
+            predictions = await cur.fetchall()
+            if not predictions:
+                return
             
-            for pred_id, strategy_name, prediction_json, pred_timestamp in predictions:
+            pred_ids, strategy_names, timestamps, actions = [], [], [], []
+            before_prices, current_prices = [], []
+            for pred_id, strategy_name, prediction_json, pred_timestamp, before_price, current_price in predictions:
                 if isinstance(prediction_json, str):
                     prediction = json.loads(prediction_json)
                 else:
                     prediction = prediction_json
-                predicted_action = prediction.get("action", "hold")
-                target_price = prediction.get("target_price")
-                
-                # Get actual price data from after the prediction
-                cur.execute("""
-                    SELECT price
-                    FROM market_data
-                    WHERE asset_id = %s AND timestamp > %s
-                    ORDER BY timestamp
-                    LIMIT 1
-                """, (asset_id, pred_timestamp))
-                
-                before_price_row = cur.fetchone()
-                before_price = before_price_row[0] if before_price_row else 0
-                
-                # Get current price (or most recent)
-                cur.execute("""
-                    SELECT price
-                    FROM market_data
-                    WHERE asset_id = %s
-                    ORDER BY timestamp DESC
-                    LIMIT 1
-                """, (asset_id,))
-                
-                current_price_row = cur.fetchone()
-                current_price = current_price_row[0] if current_price_row else 0
-                
-                # Calculate actual price change
-                price_change_pct = (current_price - before_price) / before_price if before_price > 0 else 0
-                
-                # Calculate performance score based on prediction accuracy
-                performance_score = calculate_performance_score(predicted_action, target_price, before_price, current_price)
-                
-                # Store performance data
-                cur.execute("""
-                    INSERT INTO performance_history
-                    (asset_id, strategy_name, prediction_id, timestamp, predicted_action, actual_outcome, performance_score)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    asset_id,
-                    strategy_name,
-                    pred_id,
-                    pred_timestamp,
-                    predicted_action,
-                    price_change_pct,
-                    performance_score
-                ))
-                
-                # Update strategy weights based on performance
-                await update_strategy_weight(cur, strategy_name, performance_score)
+                pred_ids.append(pred_id)
+                strategy_names.append(strategy_name)
+                timestamps.append(pred_timestamp)
+                actions.append(prediction.get("action", "hold"))
+                before_prices.append(before_price)
+                current_prices.append(current_price)
             
-            conn.commit()
-    finally:
-        conn.close()
-
-def calculate_performance_score(predicted_action, target_price, before_price, current_price):
-    if before_price == 0:
-        return 0.0  # No change
+            # Score every prediction and its actual price change in one vectorized pass
+            scores, outcomes = score_predictions(encode_actions(actions), before_prices, current_prices)
+            performance_rows = list(zip(
+                [asset_id] * len(pred_ids),
+                strategy_names,
+                pred_ids,
+                timestamps,
+                actions,
+                outcomes.tolist(),
+                scores.tolist()
+            ))
+            
+            # Store all performance data in one batch
+            await cur.executemany("""
+                INSERT INTO performance_history
+                (asset_id, strategy_name, prediction_id, timestamp, predicted_action, actual_outcome, performance_score)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, performance_rows)
+            
+            # Update strategy weights based on performance
+            await update_strategy_weights(cur, strategy_names, scores)
+            
+            # Advance the watermark past everything evaluated in this cycle
+            await cur.execute("""
+                INSERT INTO evaluation_watermarks (asset_id, last_prediction_id, last_evaluated)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (asset_id) DO UPDATE SET
+                    last_prediction_id = GREATEST(evaluation_watermarks.last_prediction_id,
+                                                  EXCLUDED.last_prediction_id),
+                    last_evaluated = EXCLUDED.last_evaluated
+            """, (asset_id, predictions[-1][0], datetime.now()))
+            
+        await conn.commit()
 
-    price_change = (current_price - before_price) / before_price
+    ctx.logger.info(f"Evaluated {len(performance_rows)} predictions for {asset_id}")
 
-    if predicted_action == "buy":
-        return min(max(price_change, -0.2), 0.2)  # cap between -0.1 and 0.1
-    elif predicted_action == "sell":
-        return min(max(-price_change, -0.2), 0.2)
-    else:  # hold
-        if abs(price_change) < 0.08:
-            return 0.08  # small reward for stability
-        else:
-            return -0.08  # small penalty for volatility
+async def update_strategy_weights(cursor, strategy_names: List[str], scores: np.ndarray):
+    """Apply the performance scores of each strategy, in order, with one UPDATE per strategy.
 
-async def update_strategy_weight(cursor, strategy_name: str, performance_score: float):
-    """Update the weight of a strategy based on its performance"""
-    # Get current weight
-    cursor.execute("""
-        SELECT weight
+    The weight cache picks the new weights up from the notification sent on commit.
+    """
+    # Lock the rows so concurrent per-asset evaluations do not lose updates
+    await cursor.execute("""
+        SELECT strategy_name, weight
         FROM strategy_weights
-        WHERE strategy_name = %s
-    """, (strategy_name,))
-    
-    current_weight = cursor.fetchone()[0]
-    
-    # Update weight using a learning rate
-    learning_rate = 0.12
-    new_weight = current_weight * (1 + learning_rate * performance_score)
+        WHERE strategy_name = ANY(%s)
+        ORDER BY strategy_name
+        FOR UPDATE
+    """, (sorted(set(strategy_names)),))
+    current_weights = {row[0]: row[1] for row in await cursor.fetchall()}
     
-    # Ensure weight stays within reasonable bounds
-    new_weight = max(0.01, min(4.0, new_weight))
-    
-    # Update the weight
-    cursor.execute("""
+    new_weights = fold_strategy_weights(strategy_names, scores, current_weights)
+    await cursor.executemany("""
         UPDATE strategy_weights
         SET weight = %s, performance_score = %s, last_updated = %s
         WHERE strategy_name = %s
-    """, (new_weight, performance_score, datetime.now(), strategy_name))
-
-async def collect_and_analyze(ctx: Context, asset_id: str, timestamp: str):
-    """Collect fresh market data for an asset"""
-    # First get price data
-    await ctx.send(
-        DATA_AGENTS["price"],
-        PriceRequest(ticker=asset_id)
-    )
-    # Sentiment data will be requested in the price response handler
-    # Analysis will be triggered in the sentiment response handler
+    """, [
+        (weight, last_score, datetime.now(), strategy_name)
+        for strategy_name, (weight, last_score) in new_weights.items()
+    ])
+
+async def collect_and_analyze(ctx: Context, asset_id: str, timestamp: str) -> AssetCycle:
+    """Start a cycle for an asset; its price and sentiment are requested, and its
+    deadline started, with the rest of the tick's assets by analyze_investments"""
+    return pipeline.start(asset_id, timestamp)
 
 async def perform_analysis(ctx: Context, asset_id: str, timestamp: str):
     """Perform analysis on an asset using all strategies"""
-    # Get latest market data
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT price, volume, sentiment_score, sentiment_magnitude, currency, timestamp
-                FROM market_data
-                WHERE asset_id = %s
-                ORDER BY timestamp DESC
-                LIMIT 1
-            """, (asset_id,))
-            latest_data = cur.fetchone()
-            
-            if not latest_data:
-                ctx.logger.warning(f"No market data available for {asset_id}")
-                return
-            
-
+    if not still_owned(ctx, asset_id, "analysis"):
+        return
+    
+    # Read recent market data from the in-memory buffer
+    history = market_buffers.get(asset_id)
+    current_data = history.latest() if history else None
+    if not current_data:
+        ctx.logger.warning(f"No market data available for {asset_id}")
+        return
+    historical_data = history.history()
 
-            
-            price, volume, sentiment_score, sentiment_magnitude, currency, data_timestamp= latest_data
+    ctx.logger.info(
+        f"[DEBUG] Latest market data for {asset_id}: "
+        f"price={current_data['price']!r}, sentiment={current_data['sentiment_score']!r}, "
+        f"ts={current_data['timestamp']!r}"
+    )
 
-            ctx.logger.info(f"[DEBUG] Latest market_data row for {asset_id}: " f"price={price!r}, sentiment={sentiment_score!r}, ts={data_timestamp!r}")
-            
-            # Get historical data
-            cur.execute("""
-                SELECT price, volume, sentiment_score, sentiment_magnitude, timestamp
-                FROM market_data
-                WHERE asset_id = %s
-                ORDER BY timestamp DESC
-                LIMIT 90
-            """, (asset_id,))
-            
-            historical_rows = cur.fetchall()
-            historical_data = [
-                {
-                    "price": row[0],
-                    "volume": row[1],
-                    "sentiment_score": row[2],
-                    "sentiment_magnitude": row[3],
-                    "timestamp": row[4].isoformat() if hasattr(row[4], 'isoformat') else str(row[4])
-                }
-                for row in historical_rows
-            ]
-    finally:
-        conn.close()
-    
-    # Current market data
-    current_data = {
-        "price": price,
-        "volume": volume,
-        "sentiment_score": sentiment_score,
-        "sentiment_magnitude": sentiment_magnitude,
-        "currency": currency,
-        "timestamp": data_timestamp.isoformat() if hasattr(data_timestamp, 'isoformat') else str(data_timestamp)
-    }
+    # Inputs unchanged since the last analysis: its predictions and decision still stand
+    fingerprint = change_gate.fingerprint(current_data, history.last_timestamp)
+    if change_gate.unchanged(asset_id, fingerprint):
+        metrics.incr("analysis_skipped_unchanged")
+        previous = change_gate.last_decision(asset_id)
+        ctx.logger.info(
+            f"Inputs for {asset_id} unchanged; keeping decision {previous.action} "
+            f"(confidence: {previous.confidence})"
+        )
+        return
     
-    # Request analysis from each strategy agent
+    # Request analysis from all strategy agents in parallel
+    responses = await request_strategy_predictions(ctx, asset_id, current_data, historical_data)
+    # The lease may have moved while the strategies answered; the new owner writes then
+    if not still_owned(ctx, asset_id, "decision"):
+        return
+
     predictions = []
-    for strategy_name, agent_address in STRATEGY_AGENTS.items():
-        ctx.logger.info(f"Requesting analysis from {strategy_name} for {asset_id}")
-        
-        try:
-            # Send analysis request to strategy agent
-            request = AnalysisRequest(
-                asset_id=asset_id,
-                timestamp=timestamp,
-                current_data=current_data
-            )
-            
-            # Send the request to the strategy agent
-            await ctx.send(agent_address, request)
-            ctx.logger.info(f"Sent analysis request to {strategy_name}")
-            
-            # NOTE: In a real system, we would await the response
-            # For now, we'll use a simulated response for demonstration
-            response = await simulate_strategy_response(strategy_name, asset_id, timestamp, current_data, historical_data)
-            
-            # Store prediction in database
-            conn = get_db_connection()
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        INSERT INTO predictions 
-                        (asset_id, strategy_name, timestamp, prediction, confidence, reasoning)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (
-                        asset_id,
-                        strategy_name,
-                        datetime.now(),
-                        json.dumps(response.prediction),
-                        response.confidence,
-                        response.reasoning
-                    ))
-                    conn.commit()
-            finally:
-                conn.close()
-            
+    for strategy_name, response in responses.items():
+        if response is None:
+            # Strategy missed its deadline; it gets zero weight in the decision
             predictions.append({
                 "strategy": strategy_name,
-                "prediction": response.prediction,
-                "confidence": response.confidence,
-                "reasoning": response.reasoning
+                "prediction": {"action": "hold", "target_price": None},
+                "confidence": 0.0,
+                "reasoning": "No response before deadline",
+                "responded": False
             })
+            continue
+
+        # Queue prediction for the next batched write
+        write_buffer.add_prediction(
+            asset_id,
+            strategy_name,
+            datetime.now(),
+            response.prediction,
+            response.confidence,
+            response.reasoning
+        )
         
-        except Exception as e:
-            ctx.logger.error(f"Error getting prediction from {strategy_name}: {str(e)}")
+        predictions.append({
+            "strategy": strategy_name,
+            "prediction": response.prediction,
+            "confidence": response.confidence,
+            "reasoning": response.reasoning,
+            "responded": True
+        })
     
     # Make meta-decision based on weighted predictions
     decision = await make_meta_decision(ctx, asset_id, timestamp, predictions)
     
-    # Store decision
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO decisions 
-                (asset_id, timestamp, action, confidence_score, reasoning)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                asset_id,
-                datetime.now(),
-                decision.action,
-                decision.confidence,
-                decision.reasoning
-            ))
-            conn.commit()
-    finally:
-        conn.close()
+    # Queue decision for the next batched write
+    write_buffer.add_decision(
+        asset_id,
+        datetime.now(),
+        decision.action,
+        decision.confidence,
+        decision.reasoning
+    )
+    if len(write_buffer) >= write_buffer.max_rows:
+        await write_buffer.flush()
+
+    # Only a decision from every strategy is worth reusing on unchanged inputs
+    if all(pred["responded"] for pred in predictions):
+        change_gate.record(asset_id, fingerprint, decision)
+    else:
+        change_gate.forget(asset_id)
+    metrics.incr("analysis_runs")
     
     ctx.logger.info(f"Decision for {asset_id}: {decision.action} (confidence: {decision.confidence})")
 
-async def simulate_strategy_response(strategy_name: str, asset_id: str, timestamp: str, 
-                                    current_data: Dict[str, Any], 
-                                    historical_data: List[Dict[str, Any]]) -> StrategyResponse:
-    """Simulate a response from a strategy agent (for demonstration)"""
-    # In a real implementation, you would wait for the actual agent response
-    # This is just a placeholder
-    import random
-    
-    actions = ["buy", "sell", "hold"]
-    confidence = random.uniform(0.5, 0.9)
-    action = random.choice(actions)
-    
-    return StrategyResponse(
-        asset_id=asset_id,
-        timestamp=timestamp,
-        prediction={
-            "action": action,
-            "target_price": current_data["price"] * (1 + random.uniform(-0.1, 0.1))
-        },
-        confidence=confidence,
-        reasoning=f"Simulated {strategy_name} analysis",
-        strategy_name=strategy_name
-    )
+async def request_strategy_predictions(ctx: Context, asset_id: str,
+                                       current_data: Dict[str, Any],
+                                       historical_data: List[Dict[str, Any]]) -> Dict[str, Optional[AgentResponse]]:
+    """Send one AnalysisRequest per strategy and wait for all responses in parallel.
+
+    Strategies that do not answer within STRATEGY_TIMEOUT map to None.
+    """
+    async def ask(strategy_name: str, agent_address: str) -> Optional[AgentResponse]:
+        request_id, future = strategy_responses.register()
+        try:
+            ctx.logger.info(f"Requesting analysis from {strategy_name} for {asset_id}")
+            await ctx.send(
+                agent_address,
+                AnalysisRequest(
+                    asset_id=asset_id,
+                    current_data=current_data,
+                    historical_data=historical_data,
+                    request_id=request_id
+                )
+            )
+            return await asyncio.wait_for(future, timeout=STRATEGY_TIMEOUT)
+        except asyncio.TimeoutError:
+            ctx.logger.warning(
+                f"{strategy_name} did not respond for {asset_id} within {STRATEGY_TIMEOUT}s"
+            )
+            return None
+        except Exception as e:
+            ctx.logger.error(f"Error requesting prediction from {strategy_name}: {str(e)}")
+            return None
+        finally:
+            strategy_responses.discard(request_id)
+
+    strategies = list(STRATEGY_AGENTS.items())
+    responses = await asyncio.gather(*(ask(name, address) for name, address in strategies))
+    return {name: response for (name, _), response in zip(strategies, responses)}
 
 async def make_meta_decision(ctx: Context, asset_id: str, timestamp: str, 
                            predictions: List[Dict[str, Any]]) -> MetaDecision:
     """Make a meta-decision based on weighted predictions from all strategies"""
-    # Get strategy weights
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            strategy_weights = {}
-            cur.execute("SELECT strategy_name, weight FROM strategy_weights")
-            for row in cur.fetchall():
-                strategy_weights[row[0]] = row[1]
-    finally:
-        conn.close()
-    
-    # Calculate weighted predictions
-    weighted_predictions = []
-    for pred in predictions:
-        strategy = pred["strategy"]
-        weight = strategy_weights.get(strategy, 1.0)
-        weighted_predictions.append({
-            "strategy": strategy,
-            "prediction": pred["prediction"],
-            "confidence": pred["confidence"],
-            "weight": weight,
-            "weighted_confidence": pred["confidence"] * weight
-        })
-    
-    # Aggregate predictions
-    buy_confidence = sum(wp["weighted_confidence"] for wp in weighted_predictions 
-                        if wp["prediction"]["action"] == "buy")
-    sell_confidence = sum(wp["weighted_confidence"] for wp in weighted_predictions 
-                         if wp["prediction"]["action"] == "sell")
-    hold_confidence = sum(wp["weighted_confidence"] for wp in weighted_predictions 
-                         if wp["prediction"]["action"] == "hold")
-    
-    total_weighted_confidence = buy_confidence + sell_confidence + hold_confidence
-    
-    if total_weighted_confidence == 0:
-        action = "hold"
-        confidence = 0.5
-        reasoning = "No confident predictions available"
-    else:
-        # Normalize confidence scores
-        buy_score = buy_confidence / total_weighted_confidence
-        sell_score = sell_confidence / total_weighted_confidence
-        hold_score = hold_confidence / total_weighted_confidence
-        
-        # Decision rules
-        confidence_threshold = 0.4  # Minimum confidence to make a decision
-        
-        if buy_score > confidence_threshold and buy_score > sell_score and buy_score > hold_score:
-            action = "buy"
-            confidence = buy_score
-        elif sell_score > confidence_threshold and sell_score > buy_score and sell_score > hold_score:
-            action = "sell"
-            confidence = sell_score
+    matrix = PredictionMatrix.from_predictions({asset_id: predictions})
+    return make_meta_decisions(matrix, timestamp)[asset_id]
+
+def strategy_weight_vector(strategy_names: List[str]) -> np.ndarray:
+    """Cached weight of each strategy, in matrix column order"""
+    return np.array([weight_cache.get(name, 1.0) for name in strategy_names], dtype=np.float64)
+
+def make_meta_decisions(matrix: PredictionMatrix, timestamp: str,
+                        requested: Optional[List[str]] = None,
+                        weights: Optional[np.ndarray] = None) -> Dict[str, MetaDecision]:
+    """Meta-decisions for every asset in the matrix in one vectorized pass.
+
+    MetaDecision objects are only built for the `requested` assets (all by
+    default). Weights default to the cached strategy weights.
+    """
+    if weights is None:
+        weights = strategy_weight_vector(matrix.strategy_names)
+    weighted, scores, actions, confidences = decide(
+        matrix.actions, matrix.confidences, weights, matrix.responded
+    )
+    weights = np.broadcast_to(weights, matrix.confidences.shape)
+    columns = {name: column for column, name in enumerate(matrix.strategy_names)}
+    rows = {asset_id: row for row, asset_id in enumerate(matrix.asset_ids)}
+
+    decisions = {}
+    for asset_id in (matrix.asset_ids if requested is None else requested):
+        row = rows[asset_id]
+        if matrix.sources is not None:
+            predictions = matrix.sources[row]
         else:
-            action = "hold"
-            confidence = max(hold_score, 0.5)  # Default to at least 0.5 confidence for holds
-        
-        # Generate reasoning text
-        reasoning = (
-            f"Buy confidence: {buy_score:.2f}, Sell confidence: {sell_score:.2f}, Hold confidence: {hold_score:.2f}\n"
-            f"Based on {len(predictions)} strategy predictions with relative weights."
+            predictions = [
+                {
+                    "strategy": name,
+                    "prediction": {"action": ACTION_NAMES[int(matrix.actions[row, column])]},
+                    "confidence": float(matrix.confidences[row, column]),
+                    "responded": bool(matrix.responded[row, column])
+                }
+                for column, name in enumerate(matrix.strategy_names)
+                if matrix.actions[row, column] != NO_ACTION
+            ]
+
+        weighted_predictions = []
+        for pred in predictions:
+            column = columns[pred["strategy"]]
+            # Strategies that missed their deadline do not count towards the decision
+            weighted_predictions.append({
+                "strategy": pred["strategy"],
+                "prediction": pred["prediction"],
+                "confidence": pred["confidence"],
+                "weight": float(weights[row, column]) if matrix.responded[row, column] else 0.0,
+                "weighted_confidence": float(weighted[row, column])
+            })
+
+        buy_score, sell_score, hold_score = scores[row].tolist()
+        if not scores[row].any():
+            reasoning = "No confident predictions available"
+        else:
+            reasoning = (
+                f"Buy confidence: {buy_score:.2f}, Sell confidence: {sell_score:.2f}, Hold confidence: {hold_score:.2f}\n"
+                f"Based on {len(predictions)} strategy predictions with relative weights."
+            )
+
+        decisions[asset_id] = MetaDecision(
+            asset_id=asset_id,
+            timestamp=timestamp,
+            action=ACTION_NAMES[int(actions[row])],
+            confidence=float(confidences[row]),
+            reasoning=reasoning,
+            predictions=predictions,
+            weighted_predictions=weighted_predictions
         )
-    
-    return MetaDecision(
-        asset_id=asset_id,
-        timestamp=timestamp,
-        action=action,
-        confidence=confidence,
-        reasoning=reasoning,
-        predictions=predictions,
-        weighted_predictions=weighted_predictions
-    )
+    return decisions
 
 
 @meta_agent.on_event("startup")
@@ -662,6 +1153,126 @@ async def register_agents(ctx: Context):
         ctx.register(address, endpoint)
     ctx.logger.info(f"Registered {len(PENDING_REGISTRATIONS)} strategy agents.")
 
+@meta_agent.on_event("startup")
+async def open_db_pool(ctx: Context):
+    await db_pool.open()
+    ctx.logger.info(f"Database pool ready: {db_pool.stats()}")
+
+    snapshot = restore_snapshot(ctx)
+
+    # Join the ring and lease this instance's shard before the first scheduler tick;
+    # leased assets get their recent history loaded once, then are kept current from messages
+    await shards.open()
+    await refresh_schedule(time.time())
+    await rebalance_shards(ctx)
+
+    if snapshot is not None:
+        scheduler.restore(snapshot.schedule)
+        # Buffers of assets now leased by other instances are not needed
+        for asset_id in restored_assets:
+            market_buffers.discard(asset_id)
+        restored_assets.clear()
+
+def restore_snapshot(ctx: Context) -> Optional[Snapshot]:
+    """Fill buffers and weights from the last snapshot, if there is a usable one"""
+    if not SNAPSHOT_PATH:
+        return None
+    try:
+        snapshot = read_snapshot(SNAPSHOT_PATH)
+    except Exception as e:
+        ctx.logger.warning(f"Ignoring unreadable snapshot {SNAPSHOT_PATH}: {str(e)}")
+        return None
+    if snapshot is None:
+        return None
+
+    market_buffers.restore(snapshot.histories)
+    restored_assets.update(asset_id for asset_id in snapshot.histories if asset_id in market_buffers)
+    weight_cache.seed(snapshot.weights)
+    ctx.logger.info(
+        f"Restored {len(restored_assets)} asset buffers from a snapshot "
+        f"taken {time.time() - snapshot.created:.0f}s ago"
+    )
+    return snapshot
+
+def current_snapshot() -> Snapshot:
+    return take_snapshot(market_buffers, weight_cache.snapshot(), scheduler.queue(), shards.owned)
+
+@meta_agent.on_interval(period=SNAPSHOT_INTERVAL)
+async def save_snapshot(ctx: Context):
+    """Write the warm-restart snapshot off the event loop"""
+    if not SNAPSHOT_PATH:
+        return
+    start = time.perf_counter()
+    try:
+        size = await asyncio.to_thread(write_snapshot, SNAPSHOT_PATH, current_snapshot())
+    except Exception as e:
+        ctx.logger.error(f"Error writing snapshot: {str(e)}")
+        metrics.incr("snapshot_errors")
+        return
+    metrics.incr("snapshots_written")
+    metrics.set_gauge("snapshot_bytes", size)
+    metrics.observe("snapshot_seconds", time.perf_counter() - start)
+
+@meta_agent.on_event("startup")
+async def start_weight_listener(ctx: Context):
+    global weight_listener
+    weight_listener = spawn(ctx, weight_cache.listen(ctx.logger), "strategy weight listener")
+    try:
+        await weight_cache.wait_loaded(timeout=db_pool.timeout)
+        ctx.logger.info(f"Loaded {len(weight_cache)} strategy weights into the cache")
+    except asyncio.TimeoutError:
+        ctx.logger.warning("Strategy weights not loaded yet; decisions use weight 1.0 until they are")
+
+@meta_agent.on_event("shutdown")
+async def close_db_pool(ctx: Context):
+    if weight_listener is not None:
+        weight_listener.cancel()
+    if PRICE_SUBSCRIPTION:
+        # An empty subscription stops the pushes right away rather than at lease expiry
+        try:
+            await ctx.send(DATA_AGENTS["price"], QuoteSubscription(tickers=[]))
+        except Exception as e:
+            ctx.logger.error(f"Error unsubscribing from quotes: {str(e)}")
+    if SNAPSHOT_PATH:
+        try:
+            size = write_snapshot(SNAPSHOT_PATH, current_snapshot())
+            ctx.logger.info(f"Wrote {size} byte snapshot to {SNAPSHOT_PATH}")
+        except Exception as e:
+            ctx.logger.error(f"Error writing snapshot: {str(e)}")
+    # Write anything still buffered before the pool goes away
+    try:
+        rows = await write_buffer.flush()
+        ctx.logger.info(f"Flushed {rows} buffered rows on shutdown")
+    finally:
+        # Release the leases so the other instances pick these assets up right away
+        try:
+            await shards.close()
+        finally:
+            await db_pool.close()
+
+@meta_agent.on_interval(period=1.0)
+async def flush_writes(ctx: Context):
+    """Write buffered rows once the size or time flush policy is met"""
+    dropped = write_buffer.dead_lettered
+    try:
+        rows = await write_buffer.maybe_flush()
+    except Exception as e:
+        ctx.logger.error(f"Error flushing buffered writes: {str(e)}")
+        return
+    if rows:
+        ctx.logger.info(f"Flushed {rows} buffered rows")
+    if write_buffer.dead_lettered > dropped:
+        table, row, error = write_buffer.dead_letters[-1]
+        ctx.logger.warning(
+            f"Dropped {write_buffer.dead_lettered - dropped} buffered rows; "
+            f"last was a {table} row for {row[0]}: {error}"
+        )
+
+@meta_agent.on_rest_get("/metrics", MetricsResponse)
+async def get_metrics(ctx: Context) -> MetricsResponse:
+    """Expose orchestrator metrics, including pool wait time and connection usage"""
+    return MetricsResponse(metrics=metrics.snapshot(), db_pool=db_pool.stats())
+
     
 
 
@@ -0,0 +1,46 @@
+"""
+In-process metrics for the orchestrator
+"""
+
+from collections import defaultdict
+from typing import Any, Dict
+
+
+class Metrics:
+    """Simple registry of counters, gauges and timings"""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1.0):
+        """Increase a counter"""
+        self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        """Record the current value of a gauge"""
+        self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        """Record one duration sample"""
+        timing = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of all metrics"""
+        timings = {
+            name: {**timing, "avg": timing["total"] / timing["count"] if timing["count"] else 0.0}
+            for name, timing in self._timings.items()
+        }
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "timings": timings,
+        }
+
+
+# Shared registry for the orchestrator process
+metrics = Metrics()
@@ -0,0 +1,109 @@
+"""
+Per-asset pipeline that joins price and sentiment results for each analysis cycle
+"""
+
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+# Cycle states
+WAITING = "waiting"      # Requests sent, results outstanding
+ANALYZING = "analyzing"  # Both results joined (or deadline passed); analysis running
+
+
+class AssetCycle:
+    """Price and sentiment results gathered for one asset in one cycle"""
+
+    def __init__(self, asset_id: str, timestamp: str):
+        self.asset_id = asset_id
+        self.cycle_id = uuid.uuid4().hex
+        self.timestamp = timestamp
+        self.started = time.monotonic()
+        self.state = WAITING
+        self.price: Optional[Any] = None
+        self.sentiment: Optional[Any] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.price is not None and self.sentiment is not None
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.started
+
+
+class AssetPipeline:
+    """Tracks the active cycle of every asset and releases it for analysis exactly once.
+
+    A cycle is released as soon as both price and sentiment have arrived, or
+    when its deadline passes with whatever has arrived so far.
+    """
+
+    def __init__(self):
+        self._cycles: Dict[str, AssetCycle] = {}
+
+    def __len__(self) -> int:
+        return len(self._cycles)
+
+    def __contains__(self, asset_id: str) -> bool:
+        return asset_id in self._cycles
+
+    def get(self, asset_id: str) -> Optional[AssetCycle]:
+        return self._cycles.get(asset_id)
+
+    def start(self, asset_id: str, timestamp: str) -> AssetCycle:
+        """Begin a new cycle for an asset, replacing any cycle still waiting"""
+        cycle = AssetCycle(asset_id, timestamp)
+        self._cycles[asset_id] = cycle
+        return cycle
+
+    def _lookup(self, asset_id: str, cycle_id: Optional[str]) -> Optional[AssetCycle]:
+        cycle = self._cycles.get(asset_id)
+        if cycle is None or cycle.cycle_id != cycle_id:
+            return None
+        return cycle
+
+    def waiting(self, asset_id: str, cycle_id: Optional[str]) -> bool:
+        """Whether this cycle is still collecting results"""
+        cycle = self._lookup(asset_id, cycle_id)
+        return cycle is not None and cycle.state == WAITING
+
+    def _claim(self, cycle: AssetCycle) -> Optional[AssetCycle]:
+        if cycle.state != WAITING:
+            return None
+        cycle.state = ANALYZING
+        return cycle
+
+    def add_price(self, asset_id: str, cycle_id: Optional[str], price: Any) -> Optional[AssetCycle]:
+        """Record a price result; returns the cycle if it is now ready for analysis.
+
+        Results for a cycle that was already released are not recorded.
+        """
+        cycle = self._lookup(asset_id, cycle_id)
+        if cycle is None or cycle.state != WAITING:
+            return None
+        cycle.price = price
+        return self._claim(cycle) if cycle.complete else None
+
+    def add_sentiment(self, asset_id: str, cycle_id: Optional[str], sentiment: Any) -> Optional[AssetCycle]:
+        """Record a sentiment result; returns the cycle if it is now ready for analysis.
+
+        Results for a cycle that was already released are not recorded.
+        """
+        cycle = self._lookup(asset_id, cycle_id)
+        if cycle is None or cycle.state != WAITING:
+            return None
+        cycle.sentiment = sentiment
+        return self._claim(cycle) if cycle.complete else None
+
+    def expire(self, asset_id: str, cycle_id: str) -> Optional[AssetCycle]:
+        """Deadline passed; returns the cycle if it had not been released yet"""
+        cycle = self._lookup(asset_id, cycle_id)
+        if cycle is None:
+            return None
+        return self._claim(cycle)
+
+    def finish(self, asset_id: str, cycle_id: str):
+        """Forget a cycle once its analysis is done"""
+        if self._lookup(asset_id, cycle_id) is not None:
+            del self._cycles[asset_id]
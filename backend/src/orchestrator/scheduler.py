@@ -0,0 +1,201 @@
+"""
+Adaptive per-asset analysis scheduling with an offline trading calendar
+"""
+
+import heapq
+import itertools
+from datetime import date, datetime, time as dt_time, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th (1-based) given weekday of a month; n=-1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _easter(year: int) -> date:
+    """Western Easter Sunday (anonymous Gregorian algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+class TradingCalendar:
+    """NYSE regular trading sessions, computed offline from the holiday rules"""
+
+    def __init__(self, timezone: str = "America/New_York",
+                 open_time: dt_time = dt_time(9, 30), close_time: dt_time = dt_time(16, 0)):
+        self.tz = ZoneInfo(timezone)
+        self.open_time = open_time
+        self.close_time = close_time
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def holidays(year: int) -> frozenset:
+        days = {
+            _nth_weekday(year, 1, 0, 3),    # Martin Luther King Jr. Day
+            _nth_weekday(year, 2, 0, 3),    # Washington's Birthday
+            _easter(year) - timedelta(days=2),  # Good Friday
+            _nth_weekday(year, 5, 0, -1),   # Memorial Day
+            _observed(date(year, 7, 4)),    # Independence Day
+            _nth_weekday(year, 9, 0, 1),    # Labor Day
+            _nth_weekday(year, 11, 3, 4),   # Thanksgiving
+            _observed(date(year, 12, 25)),  # Christmas
+        }
+        # New Year's Day on a Saturday is not observed on the prior Friday
+        new_year = date(year, 1, 1)
+        if new_year.weekday() != 5:
+            days.add(_observed(new_year))
+        if year >= 2022:
+            days.add(_observed(date(year, 6, 19)))  # Juneteenth
+        return frozenset(days)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays(day.year)
+
+    def is_open(self, moment: datetime) -> bool:
+        local = moment.astimezone(self.tz)
+        return (self.is_trading_day(local.date())
+                and self.open_time <= local.time() < self.close_time)
+
+    def next_open(self, moment: datetime) -> datetime:
+        """Start of the next regular session at or after `moment`"""
+        local = moment.astimezone(self.tz)
+        day = local.date()
+        if local.time() >= self.open_time:
+            day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return datetime.combine(day, self.open_time, tzinfo=self.tz)
+
+
+def realized_volatility(prices: np.ndarray) -> Optional[float]:
+    """Standard deviation of log returns between consecutive samples"""
+    prices = prices[prices > 0]
+    if len(prices) < 3:
+        return None
+    return float(np.std(np.diff(np.log(prices))))
+
+
+class AssetScheduler:
+    """Priority queue of assets keyed by their next due time (epoch seconds).
+
+    While the market is open an asset is due every `base_interval` seconds,
+    scaled down for volatile assets and up for quiet ones. While it is
+    closed, assets are polled every `closed_interval` seconds at most and
+    are due again when the next session opens.
+    """
+
+    def __init__(self, calendar: TradingCalendar, base_interval: float = 18.0,
+                 closed_interval: float = 3600.0, min_interval: float = 5.0,
+                 max_interval: float = 120.0, reference_volatility: float = 0.002):
+        self.calendar = calendar
+        self.base_interval = base_interval
+        self.closed_interval = closed_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.reference_volatility = reference_volatility
+        self._heap: List[Tuple[float, int, str]] = []
+        self._due: Dict[str, float] = {}
+        self._last_run: Dict[str, float] = {}
+        self._always_open: Set[str] = set()
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, asset_id: str) -> bool:
+        return asset_id in self._due
+
+    def _push(self, asset_id: str, due: float):
+        self._due[asset_id] = due
+        heapq.heappush(self._heap, (due, next(self._counter), asset_id))
+
+    def sync(self, assets: Dict[str, Optional[str]], now: float):
+        """Track exactly these assets (ticker -> asset_type); new ones are due immediately"""
+        for asset_id in list(self._due):
+            if asset_id not in assets:
+                del self._due[asset_id]
+        for asset_id in [asset_id for asset_id in self._last_run if asset_id not in assets]:
+            del self._last_run[asset_id]
+        # Crypto trades around the clock, so it ignores exchange hours
+        self._always_open = {asset_id for asset_id, asset_type in assets.items()
+                             if (asset_type or "").lower() == "crypto"}
+        for asset_id in assets:
+            if asset_id not in self._due:
+                self._push(asset_id, now)
+
+    def pop_due(self, now: float) -> List[Tuple[str, float]]:
+        """Remove and return (asset_id, due_time) for every asset due by `now`"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, _, asset_id = heapq.heappop(self._heap)
+            # Skip entries superseded by a later reschedule or removal
+            if self._due.get(asset_id) != due_at:
+                continue
+            del self._due[asset_id]
+            due.append((asset_id, due_at))
+        return due
+
+    def next_interval(self, asset_id: str, now: float, volatility: Optional[float] = None) -> float:
+        moment = datetime.fromtimestamp(now, tz=self.calendar.tz)
+        if asset_id not in self._always_open and not self.calendar.is_open(moment):
+            until_open = self.calendar.next_open(moment).timestamp() - now
+            return max(self.min_interval, min(self.closed_interval, until_open))
+
+        interval = self.base_interval
+        if volatility:
+            interval *= self.reference_volatility / volatility
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def reschedule(self, asset_id: str, now: float, volatility: Optional[float] = None) -> float:
+        """Queue the asset's next run; returns its due time"""
+        self._last_run[asset_id] = now
+        due = now + self.next_interval(asset_id, now, volatility)
+        self._push(asset_id, due)
+        return due
+
+    def expedite(self, asset_id: str, now: float) -> Optional[float]:
+        """Bring a tracked asset's next run forward to now, but no sooner than
+        `min_interval` after its last run; returns its due time"""
+        due = self._due.get(asset_id)
+        if due is None:
+            return None
+        earliest = max(now, self._last_run.get(asset_id, now) + self.min_interval)
+        if earliest < due:
+            self._push(asset_id, earliest)
+            return earliest
+        return due
+
+    def restore(self, queue: Dict[str, float]):
+        """Reapply saved due times to the assets being tracked"""
+        for asset_id, due in queue.items():
+            if asset_id in self._due:
+                self._push(asset_id, due)
+
+    def queue(self) -> Dict[str, float]:
+        """Due time of every scheduled asset"""
+        return dict(self._due)
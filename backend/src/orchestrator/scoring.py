@@ -0,0 +1,176 @@
+"""
+Performance scoring and strategy weight updates
+
+The per-row functions are the reference behaviour. The array versions
+produce exactly the same floats, so they can replace the per-row loop when
+large numbers of predictions are evaluated at once.
+"""
+
+from itertools import repeat
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Multiplicative weight update parameters
+LEARNING_RATE = 0.12
+MIN_WEIGHT = 0.01
+MAX_WEIGHT = 4.0
+
+# Score caps
+DIRECTIONAL_CAP = 0.2
+HOLD_BAND = 0.08
+HOLD_REWARD = 0.08
+
+BUY, SELL, HOLD = 0, 1, 2
+_ACTION_CODES = {"buy": BUY, "sell": SELL}
+
+# Bounds on the number of weight updates folded per vectorized step
+_MIN_WINDOW = 64
+_MAX_WINDOW = 8192
+# Rows folded one at a time after the weight is clamped: clamps come in
+# clusters, where a cumulative product would restart every few rows
+_SCALAR_RUN = 256
+
+
+def calculate_performance_score(predicted_action, target_price, before_price, current_price):
+    if before_price == 0:
+        return 0.0  # No change
+
+    price_change = (current_price - before_price) / before_price
+
+    if predicted_action == "buy":
+        return min(max(price_change, -DIRECTIONAL_CAP), DIRECTIONAL_CAP)
+    elif predicted_action == "sell":
+        return min(max(-price_change, -DIRECTIONAL_CAP), DIRECTIONAL_CAP)
+    else:  # hold
+        if abs(price_change) < HOLD_BAND:
+            return HOLD_REWARD  # small reward for stability
+        else:
+            return -HOLD_REWARD  # small penalty for volatility
+
+def apply_weight_update(current_weight: float, performance_score: float) -> float:
+    """Return the weight after one performance observation"""
+    # Update weight using a learning rate
+    new_weight = current_weight * (1 + LEARNING_RATE * performance_score)
+
+    # Ensure weight stays within reasonable bounds
+    return max(MIN_WEIGHT, min(MAX_WEIGHT, new_weight))
+
+
+def encode_actions(actions: Iterable[str]) -> np.ndarray:
+    """Map action names to BUY/SELL/HOLD codes; anything else counts as hold"""
+    # The lookups run in C through map; no Python code runs per action
+    return np.fromiter(map(_ACTION_CODES.get, actions, repeat(HOLD)), dtype=np.int8)
+
+def score_predictions(actions: np.ndarray, before_prices: np.ndarray,
+                      current_prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized calculate_performance_score.
+
+    Args:
+        actions: Action codes from encode_actions
+        before_prices: Price right after each prediction (0 when unknown)
+        current_prices: Latest price for each prediction's asset
+
+    Returns:
+        tuple: (performance_scores, actual_outcomes), where the outcome is the
+        relative price change, or 0 when the before price is not positive
+    """
+    before = np.asarray(before_prices, dtype=np.float64)
+    current = np.asarray(current_prices, dtype=np.float64)
+
+    known = before != 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(known, (current - before) / before, 0.0)
+
+    buy = np.minimum(np.maximum(change, -DIRECTIONAL_CAP), DIRECTIONAL_CAP)
+    sell = np.minimum(np.maximum(-change, -DIRECTIONAL_CAP), DIRECTIONAL_CAP)
+    hold = np.where(np.abs(change) < HOLD_BAND, HOLD_REWARD, -HOLD_REWARD)
+
+    scores = np.select([actions == BUY, actions == SELL], [buy, sell], hold)
+    scores = np.where(known, scores, 0.0)
+    outcomes = np.where(before > 0, change, 0.0)
+    return scores, outcomes
+
+def fold_weight(weight: float, scores: np.ndarray) -> float:
+    """Apply apply_weight_update for each score in order, without a Python loop per score.
+
+    Runs between the bounds are folded with a left-to-right cumulative
+    product, which multiplies in the same order as the per-row updates.
+    Wherever the weight is clamped, the next rows are folded one at a time
+    and the fold restarts with a short window that grows again while the
+    weight stays inside the bounds.
+    """
+    factors = 1 + LEARNING_RATE * np.asarray(scores, dtype=np.float64)
+    i, n = 0, len(factors)
+    window = _MIN_WINDOW
+    while i < n:
+        chunk = factors[i:i + window]
+
+        # A clamped weight stays pinned while factors keep pushing it outwards
+        if weight == MAX_WEIGHT or weight == MIN_WEIGHT:
+            moving = chunk < 1.0 if weight == MAX_WEIGHT else chunk > 1.0
+            k = int(moving.argmax())
+            if not moving[k]:
+                i += len(chunk)
+                window = min(window * 2, _MAX_WINDOW)
+                continue
+            i += k
+            chunk = factors[i:i + window]
+
+        path = np.multiply.accumulate(np.concatenate(([weight], chunk)))[1:]
+        outside = (path < MIN_WEIGHT) | (path > MAX_WEIGHT)
+        j = int(outside.argmax())
+        if not outside[j]:
+            weight = float(path[-1])
+            i += len(chunk)
+            window = min(window * 2, _MAX_WINDOW)
+            continue
+
+        weight = MIN_WEIGHT if path[j] < MIN_WEIGHT else MAX_WEIGHT
+        i += j + 1
+        weight = _fold_rows(weight, factors[i:i + _SCALAR_RUN])
+        i += _SCALAR_RUN
+        window = _MIN_WINDOW
+    return weight
+
+def _fold_rows(weight: float, factors: np.ndarray) -> float:
+    """apply_weight_update for each factor in order, one row at a time"""
+    for factor in factors.tolist():
+        weight *= factor
+        if weight < MIN_WEIGHT:
+            weight = MIN_WEIGHT
+        elif weight > MAX_WEIGHT:
+            weight = MAX_WEIGHT
+    return weight
+
+def fold_strategy_weights(strategy_names: Sequence[str], scores: np.ndarray,
+                          current_weights: Dict[str, float]) -> Dict[str, Tuple[float, float]]:
+    """Fold each strategy's scores, in row order, into its current weight.
+
+    Returns:
+        dict: strategy_name -> (new_weight, last_performance_score) for every
+        strategy in current_weights that has at least one score
+    """
+    # Strategy names become integer codes once, so each strategy's rows are
+    # picked out by an integer comparison rather than string comparisons
+    index = {strategy_name: code for code, strategy_name in enumerate(current_weights)}
+    codes = np.fromiter(map(index.get, strategy_names, repeat(-1)), dtype=np.int32)
+    scores = np.asarray(scores, dtype=np.float64)
+
+    results = {}
+    for code, (strategy_name, weight) in enumerate(current_weights.items()):
+        strategy_scores = scores[codes == code]
+        if strategy_scores.size:
+            results[strategy_name] = (fold_weight(weight, strategy_scores), float(strategy_scores[-1]))
+    return results
+
+def evaluate_predictions(actions: List[str], before_prices: Sequence[float],
+                         current_prices: Sequence[float], strategy_names: Sequence[str],
+                         current_weights: Dict[str, float]):
+    """Score a batch of predictions and compute the resulting strategy weights in one pass.
+
+    Returns:
+        tuple: (performance_scores, actual_outcomes, {strategy: (new_weight, last_score)})
+    """
+    scores, outcomes = score_predictions(encode_actions(actions), before_prices, current_prices)
+    return scores, outcomes, fold_strategy_weights(strategy_names, scores, current_weights)
@@ -0,0 +1,161 @@
+"""
+Sharding of the asset universe across meta agent instances
+"""
+
+import bisect
+import hashlib
+from typing import FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import psycopg
+
+from src.orchestrator.db import get_conninfo
+from src.orchestrator.metrics import metrics
+
+# Keeps asset lock keys apart from any other advisory locks on the database
+_LOCK_NAMESPACE = "meta_agent_asset:"
+# Evaluation locks are transaction locks taken from pooled connections, so
+# they need keys of their own: a lease's session lock would block them
+_EVALUATION_NAMESPACE = "meta_agent_evaluation:"
+
+
+def _hash(value: str) -> int:
+    """Stable signed 64-bit hash (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big", signed=True)
+
+def lock_key(asset_id: str) -> int:
+    """Advisory lock key (bigint) guarding an asset"""
+    return _hash(_LOCK_NAMESPACE + asset_id)
+
+def evaluation_lock_key(asset_id: str) -> int:
+    """Advisory lock key (bigint) serializing performance evaluation of an asset"""
+    return _hash(_EVALUATION_NAMESPACE + asset_id)
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to instances via virtual nodes"""
+
+    def __init__(self, instances: Iterable[str] = (), virtual_nodes: int = 64):
+        self.virtual_nodes = virtual_nodes
+        self.instances: FrozenSet[str] = frozenset()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self.rebuild(instances)
+
+    def rebuild(self, instances: Iterable[str]):
+        instances = frozenset(instances)
+        if instances == self.instances and self._points:
+            return
+        ring = sorted(
+            (_hash(f"{instance}#{replica}"), instance)
+            for instance in instances
+            for replica in range(self.virtual_nodes)
+        )
+        self.instances = instances
+        self._points = [point for point, _ in ring]
+        self._owners = [owner for _, owner in ring]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class ShardCoordinator:
+    """Splits assets across live instances and leases each owned asset with an advisory lock.
+
+    Every instance heartbeats into orchestrator_instances; instances seen
+    within `lease_timeout` seconds form the hash ring. Locks are session
+    locks on a dedicated connection, so the database releases them as soon
+    as an instance's connection dies, and once its heartbeat goes stale its
+    assets are rehashed onto the survivors.
+    """
+
+    def __init__(self, instance_id: str, lease_timeout: float = 15.0, virtual_nodes: int = 64):
+        self.instance_id = instance_id
+        self.lease_timeout = lease_timeout
+        self.ring = HashRing(virtual_nodes=virtual_nodes)
+        self._conn: Optional[psycopg.AsyncConnection] = None
+        self._held: Set[str] = set()
+
+    @property
+    def owned(self) -> FrozenSet[str]:
+        return frozenset(self._held)
+
+    def owns(self, asset_id: str) -> bool:
+        return asset_id in self._held
+
+    async def open(self):
+        # Not from the pool: the locks live as long as this session does
+        self._conn = await psycopg.AsyncConnection.connect(get_conninfo(), autocommit=True)
+
+    async def close(self):
+        """Leave the ring and release every lease"""
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(
+                "DELETE FROM orchestrator_instances WHERE instance_id = %s", (self.instance_id,)
+            )
+        finally:
+            await self.drop()
+
+    async def drop(self) -> Set[str]:
+        """Give up all leases by closing the session; returns the assets that were held"""
+        lost, self._held = self._held, set()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await conn.close()
+        metrics.set_gauge("shard_assets_owned", 0)
+        return lost
+
+    async def _heartbeat(self, cur) -> List[str]:
+        """Record this instance as alive and return every live instance"""
+        await cur.execute("""
+            INSERT INTO orchestrator_instances (instance_id, heartbeat_at)
+            VALUES (%s, now())
+            ON CONFLICT (instance_id) DO UPDATE SET heartbeat_at = now()
+        """, (self.instance_id,))
+        await cur.execute("""
+            DELETE FROM orchestrator_instances
+            WHERE heartbeat_at < now() - make_interval(secs => %s)
+        """, (self.lease_timeout,))
+        await cur.execute("SELECT instance_id FROM orchestrator_instances")
+        return [row[0] for row in await cur.fetchall()]
+
+    async def rebalance(self, assets: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+        """Heartbeat, then lease the assets this instance should own and release the rest.
+
+        Returns (gained, lost). An asset still leased by its previous owner is
+        retried on the next call.
+        """
+        if self._conn is None:
+            await self.open()
+
+        async with self._conn.cursor() as cur:
+            live = await self._heartbeat(cur)
+            self.ring.rebuild(live)
+            wanted = {asset_id for asset_id in assets if self.ring.owner(asset_id) == self.instance_id}
+
+            lost = self._held - wanted
+            if lost:
+                await cur.execute(
+                    "SELECT pg_advisory_unlock(key) FROM unnest(%s::bigint[]) AS key",
+                    ([lock_key(asset_id) for asset_id in lost],)
+                )
+                self._held -= lost
+
+            gained = set()
+            candidates = {lock_key(asset_id): asset_id for asset_id in wanted - self._held}
+            if candidates:
+                await cur.execute(
+                    "SELECT key, pg_try_advisory_lock(key) FROM unnest(%s::bigint[]) AS key",
+                    (list(candidates),)
+                )
+                gained = {candidates[key] for key, acquired in await cur.fetchall() if acquired}
+                self._held |= gained
+
+        metrics.set_gauge("shard_instances", len(live))
+        metrics.set_gauge("shard_assets_owned", len(self._held))
+        metrics.set_gauge("shard_assets_pending", len(wanted) - len(wanted & self._held))
+        return gained, lost
@@ -0,0 +1,129 @@
+"""
+Warm-restart snapshots of the orchestrator's in-memory state
+
+File layout (little endian):
+    8 bytes   magic
+    4 bytes   JSON header length
+    N bytes   JSON header (asset list, weights, scheduler queue, blob index)
+    padding   to a 64-byte boundary, where the data section starts
+    blobs     raw numpy arrays, each starting on a 64-byte boundary
+
+Blobs can be mapped straight out of the file with np.frombuffer.
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+from src.orchestrator.market_buffer import FIELDS, AssetHistory
+
+MAGIC = b"MQSNAP\x00\x01"
+ALIGNMENT = 64
+_LENGTH = struct.Struct("<I")
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class Snapshot(NamedTuple):
+    created: float
+    capacity: int
+    histories: Dict[str, AssetHistory]
+    weights: Dict[str, float]
+    schedule: Dict[str, float]  # Asset -> next due time (epoch seconds)
+
+
+def write_snapshot(path: str, snapshot: Snapshot) -> int:
+    """Write a snapshot atomically (temp file, fsync, rename); returns bytes written"""
+    asset_ids = list(snapshot.histories)
+    exported = [snapshot.histories[asset_id].export() for asset_id in asset_ids]
+    blobs = {
+        "rows": np.stack([rows for rows, _, _ in exported]) if exported
+                else np.empty((0, snapshot.capacity, FIELDS)),
+    }
+
+    index, offset = {}, 0
+    for name, array in blobs.items():
+        index[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({
+        "created": snapshot.created,
+        "capacity": snapshot.capacity,
+        "assets": [
+            {"asset_id": asset_id, "head": head, "size": size,
+             "currency": snapshot.histories[asset_id].currency}
+            for asset_id, (_, head, size) in zip(asset_ids, exported)
+        ],
+        "weights": snapshot.weights,
+        "schedule": snapshot.schedule,
+        "blobs": index,
+    }).encode()
+    data_start = _align(len(MAGIC) + _LENGTH.size + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_LENGTH.pack(len(header)))
+        f.write(header)
+        for name, array in blobs.items():
+            f.seek(data_start + index[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return data_start + offset
+
+
+def read_snapshot(path: str) -> Optional[Snapshot]:
+    """Load a snapshot; returns None if there is none. Raises ValueError if it is not one."""
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an orchestrator snapshot")
+        (header_length,) = _LENGTH.unpack_from(mm, len(MAGIC))
+        header_start = len(MAGIC) + _LENGTH.size
+        header = json.loads(mm[header_start:header_start + header_length])
+        data_start = _align(header_start + header_length)
+
+        blob = header["blobs"]["rows"]
+        # View the blob in place; each history copies its own slice out
+        rows = np.frombuffer(
+            mm, dtype=np.dtype(blob["dtype"]), count=int(np.prod(blob["shape"])),
+            offset=data_start + blob["offset"]
+        ).reshape(blob["shape"])
+        histories = {
+            asset["asset_id"]: AssetHistory.restore(
+                rows[i], asset["head"], asset["size"], asset["currency"]
+            )
+            for i, asset in enumerate(header["assets"])
+        }
+        del rows  # Release the view before the map closes
+
+    return Snapshot(
+        created=header["created"],
+        capacity=header["capacity"],
+        histories=histories,
+        weights={name: float(weight) for name, weight in header["weights"].items()},
+        schedule={asset_id: float(due) for asset_id, due in header["schedule"].items()},
+    )
+
+
+def take_snapshot(buffers, weights: Dict[str, float], schedule: Dict[str, float],
+                  asset_ids=None) -> Snapshot:
+    """Copy the current state (optionally just `asset_ids`) so it can be written off the event loop"""
+    histories = {
+        asset_id: history.copy()
+        for asset_id, history in buffers.items()
+        if asset_ids is None or asset_id in asset_ids
+    }
+    return Snapshot(time.time(), buffers.capacity, histories, dict(weights), dict(schedule))
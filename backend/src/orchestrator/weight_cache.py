@@ -0,0 +1,82 @@
+"""
+In-process cache of strategy weights, kept current through Postgres LISTEN/NOTIFY
+"""
+
+import asyncio
+import json
+from typing import Dict, Optional
+
+import psycopg
+
+from src.orchestrator.db import get_conninfo
+from src.orchestrator.metrics import metrics
+
+# Channel the strategy_weights trigger publishes every changed row on
+WEIGHTS_CHANNEL = "strategy_weights_changed"
+
+
+class StrategyWeightCache:
+    """Strategy weights held in memory so decisions need no database read.
+
+    Every committed change arrives as a notification, the orchestrator's own
+    as well as those made elsewhere (the REST API, other meta agent
+    instances), in commit order. Whenever the listening session is
+    (re)established the whole table is reloaded, so notifications missed
+    while disconnected do not leave stale weights behind.
+    """
+
+    def __init__(self, reconnect_delay: float = 5.0):
+        self.reconnect_delay = reconnect_delay
+        self._weights: Dict[str, float] = {}
+        self._loaded = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def get(self, strategy_name: str, default: float = 1.0) -> float:
+        return self._weights.get(strategy_name, default)
+
+    def snapshot(self) -> Dict[str, float]:
+        return dict(self._weights)
+
+    def seed(self, weights: Dict[str, float]):
+        """Weights to use until the table is loaded (e.g. from a snapshot); ignored after that"""
+        if self._loaded.is_set():
+            return
+        self._weights.update({name: float(weight) for name, weight in weights.items()})
+
+    def _apply(self, payload: str):
+        change = json.loads(payload)
+        if change.get("weight") is None:
+            self._weights.pop(change["strategy_name"], None)
+        else:
+            self._weights[change["strategy_name"]] = float(change["weight"])
+        metrics.incr("weight_cache_notifications")
+
+    async def _reload(self, conn: psycopg.AsyncConnection):
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT strategy_name, weight FROM strategy_weights")
+            self._weights = {name: float(weight) for name, weight in await cur.fetchall()}
+        metrics.incr("weight_cache_reloads")
+        self._loaded.set()
+
+    async def wait_loaded(self, timeout: Optional[float] = None):
+        await asyncio.wait_for(self._loaded.wait(), timeout)
+
+    async def listen(self, logger=None):
+        """Follow weight changes until cancelled, reconnecting after errors"""
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(get_conninfo(), autocommit=True) as conn:
+                    # Listen before reloading so no change falls between the two
+                    await conn.execute(f"LISTEN {WEIGHTS_CHANNEL}")
+                    await self._reload(conn)
+                    async for notify in conn.notifies():
+                        self._apply(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.incr("weight_cache_errors")
+                if logger:
+                    logger.error(f"Strategy weight listener failed, reconnecting: {str(e)}")
+                await asyncio.sleep(self.reconnect_delay)
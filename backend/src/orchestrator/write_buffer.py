@@ -0,0 +1,234 @@
+"""
+Write-behind batching of the orchestrator's inserts
+"""
+
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import psycopg
+from psycopg.types.json import Jsonb
+
+from src.orchestrator.metrics import metrics
+
+_MARKET_DATA_COLUMNS = ("price", "volume", "currency", "sentiment_score", "sentiment_magnitude")
+
+_UPSERT_MARKET_DATA = """
+    INSERT INTO market_data
+    (asset_id, timestamp, price, volume, currency,
+     sentiment_score, sentiment_magnitude)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (asset_id, timestamp) DO UPDATE SET
+        price = COALESCE(EXCLUDED.price, market_data.price),
+        volume = COALESCE(EXCLUDED.volume, market_data.volume),
+        currency = COALESCE(EXCLUDED.currency, market_data.currency),
+        sentiment_score = COALESCE(EXCLUDED.sentiment_score, market_data.sentiment_score),
+        sentiment_magnitude = COALESCE(EXCLUDED.sentiment_magnitude, market_data.sentiment_magnitude)
+"""
+
+_INSERT_PREDICTIONS = """
+    INSERT INTO predictions
+    (asset_id, strategy_name, timestamp, prediction, confidence, reasoning)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (asset_id, strategy_name, timestamp) DO NOTHING
+"""
+
+_INSERT_DECISIONS = """
+    INSERT INTO decisions (asset_id, timestamp, action, confidence_score, reasoning)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def _row_key(table: str, row: tuple) -> Tuple[str, tuple]:
+    """Identity of a pending row across flush attempts"""
+    if table == "market_data":
+        return table, row[:2]
+    if table == "predictions":
+        return table, row[:3]
+    return table, row
+
+
+async def _write_table(cur, table: str, rows: List[tuple]):
+    if table == "market_data":
+        await cur.executemany(_UPSERT_MARKET_DATA, rows)
+    elif table == "predictions":
+        await cur.executemany(_INSERT_PREDICTIONS, rows)
+    elif len(rows) == 1:
+        await cur.execute(_INSERT_DECISIONS, rows[0])
+    else:
+        # decisions has no unique key, so it can be streamed with COPY
+        async with cur.copy("""
+            COPY decisions (asset_id, timestamp, action, confidence_score, reasoning)
+            FROM STDIN
+        """) as copy:
+            for decision in rows:
+                await copy.write_row(decision)
+
+
+class WriteBehindBuffer:
+    """Collects market_data, predictions and decisions rows and writes them in one transaction.
+
+    A flush is due once `max_rows` rows are pending or the oldest pending row
+    is `max_delay` seconds old. Writes to the same market_data row are merged
+    before they reach the database.
+
+    A row the database rejects (for instance one whose asset was deleted while
+    it was buffered) does not hold up the others: the batch is retried table by
+    table and the failing table row by row, and rejected rows go to
+    `dead_letters`. Rows of a flush that fails for any other reason are put
+    back, and dropped to `dead_letters` after `max_retries` failed flushes.
+    """
+
+    def __init__(self, pool, max_rows: int = 1000, max_delay: float = 5.0,
+                 max_retries: int = 5, dead_letter_size: int = 1000):
+        self._pool = pool
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self._market_data: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+        self._predictions: List[tuple] = []
+        self._decisions: List[tuple] = []
+        self._attempts: Dict[Tuple[str, tuple], int] = {}  # Failed flushes per requeued row
+        self._oldest: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.dead_letters: Deque[Tuple[str, tuple, str]] = deque(maxlen=dead_letter_size)
+        self.dead_lettered = 0
+
+    def __len__(self) -> int:
+        return len(self._market_data) + len(self._predictions) + len(self._decisions)
+
+    def _touch(self):
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        metrics.set_gauge("write_buffer_pending_rows", len(self))
+
+    def add_market_data(self, asset_id: str, timestamp: datetime, **values):
+        """Queue an upsert of a market_data row; None values leave existing columns untouched"""
+        row = self._market_data.setdefault((asset_id, timestamp), dict.fromkeys(_MARKET_DATA_COLUMNS))
+        for column, value in values.items():
+            if value is not None:
+                row[column] = value
+        self._touch()
+
+    def add_prediction(self, asset_id: str, strategy_name: str, timestamp: datetime,
+                       prediction: Dict[str, Any], confidence: float, reasoning: str):
+        self._predictions.append((asset_id, strategy_name, timestamp, Jsonb(prediction), confidence, reasoning))
+        self._touch()
+
+    def add_decision(self, asset_id: str, timestamp: datetime, action: str,
+                     confidence: float, reasoning: str):
+        self._decisions.append((asset_id, timestamp, action, confidence, reasoning))
+        self._touch()
+
+    def flush_due(self) -> bool:
+        if not len(self):
+            return False
+        return len(self) >= self.max_rows or time.monotonic() - self._oldest >= self.max_delay
+
+    async def maybe_flush(self) -> int:
+        """Flush if the size or time policy says so; returns rows written"""
+        if self.flush_due():
+            return await self.flush()
+        return 0
+
+    async def flush(self) -> int:
+        """Write everything pending in a single transaction; returns rows written"""
+        async with self._lock:
+            batch = {
+                "market_data": [
+                    (asset_id, timestamp, *(values[column] for column in _MARKET_DATA_COLUMNS))
+                    for (asset_id, timestamp), values in self._market_data.items()
+                ],
+                "predictions": self._predictions,
+                "decisions": self._decisions,
+            }
+            self._market_data, self._predictions, self._decisions = {}, [], []
+            self._oldest = None
+            if not any(batch.values()):
+                return 0
+
+            start = time.perf_counter()
+            try:
+                rows = await self._write(batch)
+            except Exception:
+                # Put the rows back so the next flush retries them
+                self._requeue(batch)
+                metrics.incr("write_flush_errors")
+                raise
+
+            for table, table_rows in batch.items():
+                for row in table_rows:
+                    self._attempts.pop(_row_key(table, row), None)
+            metrics.incr("write_flushes")
+            metrics.incr("write_rows", rows)
+            metrics.observe("write_flush_seconds", time.perf_counter() - start)
+            metrics.set_gauge("write_buffer_pending_rows", len(self))
+            return rows
+
+    async def _write(self, batch: Dict[str, List[tuple]]) -> int:
+        async with self._pool.connection() as conn:
+            async with conn.cursor() as cur:
+                try:
+                    async with conn.transaction():
+                        for table, rows in batch.items():
+                            if rows:
+                                await _write_table(cur, table, rows)
+                    return sum(len(rows) for rows in batch.values())
+                except psycopg.IntegrityError:
+                    metrics.incr("write_integrity_errors")
+
+                # Some row was rejected: write each table in its own savepoint,
+                # and the rows of a table that fails one at a time
+                written = 0
+                async with conn.transaction():
+                    for table, rows in batch.items():
+                        if not rows:
+                            continue
+                        try:
+                            async with conn.transaction():
+                                await _write_table(cur, table, rows)
+                            written += len(rows)
+                            continue
+                        except psycopg.IntegrityError:
+                            pass
+                        for row in rows:
+                            try:
+                                async with conn.transaction():
+                                    await _write_table(cur, table, [row])
+                                written += 1
+                            except psycopg.IntegrityError as e:
+                                self._dead_letter(table, row, e)
+                return written
+
+    def _dead_letter(self, table: str, row: tuple, error: Exception):
+        self._attempts.pop(_row_key(table, row), None)
+        self.dead_letters.append((table, row, str(error)))
+        self.dead_lettered += 1
+        metrics.incr("write_rows_dead_lettered")
+
+    def _requeue(self, batch: Dict[str, List[tuple]]):
+        requeued = {}
+        for table, rows in batch.items():
+            kept = []
+            for row in rows:
+                key = _row_key(table, row)
+                self._attempts[key] = self._attempts.get(key, 0) + 1
+                if self._attempts[key] > self.max_retries:
+                    self._dead_letter(table, row, RuntimeError(f"gave up after {self.max_retries} retries"))
+                else:
+                    kept.append(row)
+            requeued[table] = kept
+
+        for row in requeued["market_data"]:
+            key = row[:2]
+            values = dict(zip(_MARKET_DATA_COLUMNS, row[2:]))
+            newer = self._market_data.get(key)
+            if newer:
+                values.update({column: value for column, value in newer.items() if value is not None})
+            self._market_data[key] = values
+        self._predictions[:0] = requeued["predictions"]
+        self._decisions[:0] = requeued["decisions"]
+        if len(self):
+            self._touch()
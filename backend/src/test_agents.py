@@ -7,8 +7,11 @@ import os
 import sys
 import asyncio
 import argparse
+import json
 from datetime import datetime, timedelta
 import random
+import time
+import logging
 from pprint import pprint
 from typing import Dict, List, Any, Optional
 from uagents import Agent, Context, Model, Bureau
@@ -381,10 +384,1487 @@ async def test_integration():
         except asyncio.CancelledError:
             pass
 
+def test_scoring_engine(rows: int = 300_000):
+    """Check the vectorized scoring engine against the per-row updates"""
+    print("\n===== TESTING VECTORIZED SCORING ENGINE =====")
+    from src.orchestrator.scoring import (
+        apply_weight_update,
+        calculate_performance_score,
+        evaluate_predictions,
+    )
+    
+    strategies = ["momentum", "mean_reversion", "sentiment_momentum"]
+    actions = [random.choice(["buy", "sell", "hold"]) for _ in range(rows)]
+    before_prices = [random.choice([0.0, random.uniform(50.0, 500.0)]) for _ in range(rows)]
+    current_prices = [price * random.uniform(0.7, 1.3) for price in before_prices]
+    strategy_names = [random.choice(strategies) for _ in range(rows)]
+    initial_weights = {"momentum": 1.0, "mean_reversion": 3.9, "sentiment_momentum": 0.02}
+    
+    # Reference: one call per prediction, applied in order
+    start = time.perf_counter()
+    expected_scores = [
+        calculate_performance_score(action, None, before, current)
+        for action, before, current in zip(actions, before_prices, current_prices)
+    ]
+    expected_weights = dict(initial_weights)
+    for strategy_name, score in zip(strategy_names, expected_scores):
+        expected_weights[strategy_name] = apply_weight_update(expected_weights[strategy_name], score)
+    per_row_ms = (time.perf_counter() - start) * 1000
+    
+    start = time.perf_counter()
+    scores, _, new_weights = evaluate_predictions(
+        actions, before_prices, current_prices, strategy_names, initial_weights
+    )
+    vectorized_ms = (time.perf_counter() - start) * 1000
+    
+    scores_match = scores.tolist() == expected_scores
+    weights_match = all(new_weights[name][0] == expected_weights[name] for name in strategies)
+    
+    print(f"Per-row updates: {per_row_ms:.1f} ms, vectorized engine: {vectorized_ms:.1f} ms for {rows} predictions")
+    print(f"Scores identical: {scores_match}, weights identical: {weights_match}")
+    pprint({name: new_weights[name][0] for name in strategies})
+
+def _reference_decision(predictions: List[Dict[str, Any]], weights: Dict[str, float]):
+    """(action, confidence) by the original per-asset weighted vote"""
+    weighted = [
+        (pred["prediction"]["action"],
+         pred["confidence"] * (weights[pred["strategy"]] if pred.get("responded", True) else 0.0))
+        for pred in predictions
+    ]
+    buy = sum(value for action, value in weighted if action == "buy")
+    sell = sum(value for action, value in weighted if action == "sell")
+    hold = sum(value for action, value in weighted if action == "hold")
+    total = buy + sell + hold
+    if total == 0:
+        return "hold", 0.5
+    buy, sell, hold = buy / total, sell / total, hold / total
+    if buy > 0.4 and buy > sell and buy > hold:
+        return "buy", buy
+    if sell > 0.4 and sell > buy and sell > hold:
+        return "sell", sell
+    return "hold", max(hold, 0.5)
+
+def test_decision_kernel(assets: int = 20_000):
+    """Check the batch decision kernel against the per-asset weighted vote"""
+    print("\n===== TESTING BATCH DECISION KERNEL =====")
+    import numpy as np
+    from src.orchestrator.decision import ACTION_NAMES, PredictionMatrix, decide
+    
+    strategies = ["momentum", "mean_reversion", "sentiment_momentum"]
+    weights = {"momentum": 1.0, "mean_reversion": 3.9, "sentiment_momentum": 0.02}
+    rng = random.Random(3)
+    predictions = {}
+    for i in range(assets):
+        predictions[f"A{i:05d}"] = [
+            {
+                "strategy": name,
+                # Unknown actions take part in no vote
+                "prediction": {"action": rng.choice(["buy", "sell", "hold", "hold", "short"])},
+                "confidence": rng.choice([0.0, 0.4, rng.random()]),
+                "responded": rng.random() > 0.1
+            }
+            for name in strategies
+            if rng.random() > 0.1  # Some strategies did not answer at all
+        ]
+    
+    start = time.perf_counter()
+    expected = [_reference_decision(asset_predictions, weights) for asset_predictions in predictions.values()]
+    per_asset_ms = (time.perf_counter() - start) * 1000
+    
+    matrix = PredictionMatrix.from_predictions(predictions, strategies)
+    start = time.perf_counter()
+    _, _, actions, confidences = decide(
+        matrix.actions, matrix.confidences, np.array([weights[name] for name in strategies]), matrix.responded
+    )
+    kernel_ms = (time.perf_counter() - start) * 1000
+    
+    decided = [(ACTION_NAMES[int(action)], float(confidence)) for action, confidence in zip(actions, confidences)]
+    mismatches = sum(1 for got, want in zip(decided, expected) if got != want)
+    counts = {name: sum(1 for action, _ in decided if action == name) for name in ("buy", "sell", "hold")}
+    print(f"Per-asset vote: {per_asset_ms:.1f} ms, kernel: {kernel_ms:.1f} ms for {assets} assets {counts}")
+    print(f"{'PASS' if mismatches == 0 else 'FAIL'}: {mismatches} decisions differ from the per-asset vote")
+
+def test_scheduler():
+    """Check the scheduler's intervals around exchange hours and under changing volatility"""
+    print("\n===== TESTING ADAPTIVE SCHEDULER =====")
+    from zoneinfo import ZoneInfo
+    from src.orchestrator.scheduler import AssetScheduler, TradingCalendar
+    
+    scheduler = AssetScheduler(TradingCalendar(), base_interval=18.0, closed_interval=3600.0,
+                               min_interval=4.5, max_interval=72.0, reference_volatility=0.002)
+    new_york = ZoneInfo("America/New_York")
+    
+    def at(*moment) -> float:
+        return datetime(*moment, tzinfo=new_york).timestamp()
+    
+    scheduler.sync({"AAPL": "stock", "BTC-USD": "crypto"}, at(2024, 1, 5, 12, 0))
+    closed = {
+        "Saturday": scheduler.next_interval("AAPL", at(2024, 1, 6, 12, 0)),
+        "Friday after the close": scheduler.next_interval("AAPL", at(2024, 1, 5, 16, 30)),
+        "Martin Luther King Jr. Day": scheduler.next_interval("AAPL", at(2024, 1, 15, 11, 0)),
+        "30 minutes before the open": scheduler.next_interval("AAPL", at(2024, 1, 8, 9, 0)),
+    }
+    print(f"Closed-market intervals: {closed}")
+    print(f"{'PASS' if list(closed.values()) == [3600.0, 3600.0, 3600.0, 1800.0] else 'FAIL'}: "
+          f"closed markets are polled hourly and due again at the open")
+    crypto = scheduler.next_interval("BTC-USD", at(2024, 1, 6, 12, 0))
+    print(f"{'PASS' if crypto == 18.0 else 'FAIL'}: crypto ignores exchange hours ({crypto}s)")
+    
+    # While open, the interval shrinks as volatility grows, within the bounds
+    open_at = at(2024, 1, 5, 12, 0)
+    intervals = {volatility: scheduler.next_interval("AAPL", open_at, volatility)
+                 for volatility in (None, 0.0005, 0.002, 0.004, 0.02)}
+    print(f"Open-market intervals by volatility: {intervals}")
+    print(f"{'PASS' if list(intervals.values()) == [18.0, 72.0, 18.0, 9.0, 4.5] else 'FAIL'}: "
+          f"volatile assets tighten their interval and quiet ones widen it")
+    
+    # A volatile asset comes due before a quiet one queued at the same time
+    scheduler.pop_due(open_at)
+    scheduler.reschedule("AAPL", open_at, 0.0005)
+    scheduler.reschedule("BTC-USD", open_at, 0.004)
+    due = [asset_id for asset_id, _ in scheduler.pop_due(open_at + 10)]
+    expedited = scheduler.expedite("AAPL", open_at + 1)
+    print(f"{'PASS' if due == ['BTC-USD'] and expedited == open_at + 4.5 else 'FAIL'}: "
+          f"the volatile asset is due first, and expediting waits min_interval after the last run")
+
+def test_change_gate(window: int = 90):
+    """Check that the change gate only reuses a decision while the strategies' inputs stand still"""
+    print("\n===== TESTING CHANGE GATE =====")
+    from src.orchestrator.change_gate import ChangeGate
+    from src.orchestrator.market_buffer import AssetHistory
+    
+    gate = ChangeGate(price_epsilon=1e-4, sentiment_epsilon=1e-3)
+    history = AssetHistory(capacity=window)
+    start = datetime(2024, 1, 2, 14, 30)
+    for minute in range(window):
+        history.append(start + timedelta(minutes=minute), 100.0, 1000)
+    
+    def analyze() -> bool:
+        """Whether an analysis would run now; records it as the strategies' decision if so"""
+        fingerprint = gate.fingerprint(history.latest(), history.last_timestamp)
+        if gate.unchanged("AAPL", fingerprint):
+            return False
+        gate.record("AAPL", fingerprint, "decision")
+        return True
+    
+    first = analyze()
+    # The same quote recorded again (same timestamp) leaves the inputs as they were
+    history.append(start + timedelta(minutes=window - 1), 100.0, 1000)
+    repeated = analyze()
+    # A new row within epsilon: the window is full, so its size stays the same while it slides
+    history.append(start + timedelta(minutes=window), 100.000001, 1000)
+    slid = analyze()
+    # A price update in place on the newest row beyond epsilon
+    history.append(start + timedelta(minutes=window), 101.0, 1000)
+    moved = analyze()
+    
+    print(f"{'PASS' if first and not repeated else 'FAIL'}: an unchanged quote reuses the decision")
+    print(f"{'PASS' if slid and len(history) == window else 'FAIL'}: a slide of the full window is analyzed again")
+    print(f"{'PASS' if moved else 'FAIL'}: a price move beyond epsilon is analyzed again")
+
+async def test_live_change_gate():
+    """Check that a live quote fetched again unchanged is recorded once and not analyzed again.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING CHANGE GATE ON LIVE QUOTES =====")
+    import pandas as pd
+    from src.agents.base_agent import AgentResponse
+    from src.agents.data import quotes
+    from src.agents.data.price_agent import to_response
+    from src.agents.data.quote_cache import QuoteCache
+    from src.orchestrator import meta_agent
+    
+    ticker = "ZZGATE"
+    trade = {"time": int(time.time()) - 3600, "price": 100.0}
+    
+    def chart(symbol, period, interval):
+        # Today's bar and the time of its last trade, as a yfinance chart returns them
+        frame = pd.DataFrame({"Close": [trade["price"]], "Volume": [1000]},
+                             index=pd.DatetimeIndex([pd.Timestamp.now().normalize()]))
+        return frame, {"currency": "USD", "regularMarketTime": trade["time"]}
+    
+    analyzed = []
+    
+    async def request_strategy_predictions(ctx, asset_id, current_data, historical_data):
+        analyzed.append(current_data["price"])
+        return {
+            name: AgentResponse(asset_id=asset_id, timestamp=current_data["timestamp"],
+                                prediction={"action": "hold"}, confidence=0.5,
+                                reasoning="test", strategy_name=name)
+            for name in meta_agent.STRATEGY_AGENTS
+        }
+    
+    ctx = _LoggingContext()
+    cache = QuoteCache(lambda batch: asyncio.to_thread(quotes.fetch_quotes, batch), ttl=0.0)
+    
+    async def cycle():
+        """Fetch a fresh quote, record it as the price agent's answer and analyze it"""
+        cached = (await cache.get_many([ticker], max_age=0.0))[ticker]
+        meta_agent.record_price(ctx, to_response(ticker, cached))
+        await meta_agent.perform_analysis(ctx, ticker, cached.timestamp)
+    
+    previous = quotes._chart, quotes.QUOTE_SOURCE_URL, meta_agent.request_strategy_predictions
+    quotes._chart, quotes.QUOTE_SOURCE_URL = chart, ""
+    meta_agent.request_strategy_predictions = request_strategy_predictions
+    await meta_agent.db_pool.open()
+    try:
+        async with meta_agent.db_pool.connection() as conn:
+            await conn.execute("""
+                INSERT INTO assets (ticker, name, asset_type) VALUES (%s, 'Change gate test asset', 'test')
+                ON CONFLICT (ticker) DO NOTHING
+            """, (ticker,))
+        await meta_agent.shards.rebalance([ticker])
+        
+        await cycle()
+        await asyncio.sleep(1.1)  # Long enough for a fetch time to move on
+        await cycle()
+        repeated = len(analyzed)
+        trade.update(time=trade["time"] + 60, price=100.5)
+        await cycle()
+        
+        await meta_agent.write_buffer.flush()
+        async with meta_agent.db_pool.connection() as conn:
+            cur = await conn.execute("SELECT COUNT(*) FROM market_data WHERE asset_id = %s", (ticker,))
+            rows = (await cur.fetchone())[0]
+        
+        print(f"{'PASS' if repeated == 1 else 'FAIL'}: an unchanged quote fetched twice was analyzed "
+              f"{repeated} time(s)")
+        print(f"{'PASS' if len(analyzed) == 2 and rows == 2 else 'FAIL'}: a new trade is analyzed again "
+              f"({rows} market data rows for 2 trades)")
+    finally:
+        quotes._chart, quotes.QUOTE_SOURCE_URL, meta_agent.request_strategy_predictions = previous
+        await meta_agent.shards.close()
+        meta_agent.market_buffers.discard(ticker)
+        meta_agent.change_gate.forget(ticker)
+        await meta_agent.write_buffer.flush()
+        async with meta_agent.db_pool.connection() as conn:
+            for table in ("predictions", "decisions", "market_data"):
+                await conn.execute(f"DELETE FROM {table} WHERE asset_id = %s", (ticker,))
+            await conn.execute("DELETE FROM assets WHERE ticker = %s", (ticker,))
+        await meta_agent.db_pool.close()
+
+async def test_db_pool(queries: int = 20, delay: float = 0.05, max_size: int = 4):
+    """Check that the shared pool runs queries side by side and commits or rolls back each borrow.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING DATABASE POOL =====")
+    from src.orchestrator.db import DatabasePool, get_db_connection
+    from src.orchestrator.meta_agent import init_db
+    init_db()
+    
+    committed, rolled_back = "ZZPOOLOK", "ZZPOOLERR"
+    pool = DatabasePool(min_size=1, max_size=max_size)
+    await pool.open()
+    try:
+        async def query():
+            async with pool.connection() as conn:
+                await conn.execute("SELECT pg_sleep(%s)", (delay,))
+                cur = await conn.execute("SELECT 1.5::numeric")
+                return (await cur.fetchone())[0]
+        
+        start = time.perf_counter()
+        values = await asyncio.gather(*(query() for _ in range(queries)))
+        elapsed = time.perf_counter() - start
+        stats = pool.stats()
+        
+        async with pool.connection() as conn:
+            await conn.execute(
+                "INSERT INTO assets (ticker, name, asset_type) VALUES (%s, 'Pool test asset', 'test')",
+                (committed,)
+            )
+        try:
+            async with pool.connection() as conn:
+                await conn.execute(
+                    "INSERT INTO assets (ticker, name, asset_type) VALUES (%s, 'Pool test asset', 'test')",
+                    (rolled_back,)
+                )
+                raise RuntimeError("injected handler failure")
+        except RuntimeError:
+            pass
+        
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT ticker FROM assets WHERE ticker = ANY(%s)", ([committed, rolled_back],))
+            stored = [row[0] for row in cur.fetchall()]
+        conn.close()
+        
+        print(f"{queries} queries of {delay}s on at most {max_size} connections took {elapsed:.2f}s "
+              f"(one connection: {queries * delay:.2f}s)")
+        pprint(stats)
+        print(f"{'PASS' if elapsed < queries * delay / 2 and stats['pool_size'] <= max_size else 'FAIL'}: "
+              f"queries ran side by side within the pool limit")
+        print(f"{'PASS' if stats['connections_in_use'] == 0 else 'FAIL'}: every connection was returned")
+        print(f"{'PASS' if stored == [committed] else 'FAIL'}: a borrow commits on success and rolls back on error")
+        print(f"{'PASS' if all(isinstance(value, float) for value in values) else 'FAIL'}: DECIMAL columns load as floats")
+    finally:
+        async with pool.connection() as conn:
+            await conn.execute("DELETE FROM assets WHERE ticker = ANY(%s)", ([committed, rolled_back],))
+        await pool.close()
+
+def test_pipeline():
+    """Check that a cycle is released for analysis exactly once, joined or at its deadline"""
+    print("\n===== TESTING PRICE/SENTIMENT PIPELINE =====")
+    from src.orchestrator.pipeline import AssetPipeline
+    
+    pipeline = AssetPipeline()
+    
+    # Price and sentiment both arrive: released once, by whichever comes second
+    cycle = pipeline.start("AAPL", datetime.now().isoformat())
+    first = pipeline.add_price("AAPL", cycle.cycle_id, "price")
+    joined = pipeline.add_sentiment("AAPL", cycle.cycle_id, "sentiment")
+    repeated = [pipeline.add_sentiment("AAPL", cycle.cycle_id, "again"),
+                pipeline.expire("AAPL", cycle.cycle_id)]
+    pipeline.finish("AAPL", cycle.cycle_id)
+    print(f"{'PASS' if first is None and joined is cycle and repeated == [None, None] else 'FAIL'}: "
+          f"a joined cycle is released exactly once")
+    
+    # Only the price arrives: the deadline releases what is there, and late sentiment is not joined
+    cycle = pipeline.start("MSFT", datetime.now().isoformat())
+    pipeline.add_price("MSFT", cycle.cycle_id, "price")
+    expired = pipeline.expire("MSFT", cycle.cycle_id)
+    late = pipeline.add_sentiment("MSFT", cycle.cycle_id, "sentiment")
+    ok = expired is cycle and cycle.sentiment is None and late is None and not pipeline.waiting("MSFT", cycle.cycle_id)
+    print(f"{'PASS' if ok else 'FAIL'}: a partial cycle is released at its deadline and late results are not joined")
+    pipeline.finish("MSFT", cycle.cycle_id)
+    
+    # Results of an earlier cycle do not complete the current one
+    old = pipeline.start("TSLA", datetime.now().isoformat())
+    current = pipeline.start("TSLA", datetime.now().isoformat())
+    stale = [pipeline.add_price("TSLA", old.cycle_id, "old price"),
+             pipeline.add_sentiment("TSLA", old.cycle_id, "old sentiment")]
+    ok = stale == [None, None] and current.price is None and pipeline.waiting("TSLA", current.cycle_id)
+    print(f"{'PASS' if ok else 'FAIL'}: results for a replaced cycle are ignored")
+    pipeline.finish("TSLA", old.cycle_id)
+    print(f"{'PASS' if len(pipeline) == 1 and 'TSLA' in pipeline else 'FAIL'}: finishing a replaced cycle keeps the current one")
+
+class _LoggingContext:
+    """Minimal stand-in for a uAgents Context when calling orchestrator code directly"""
+    logger = logging.getLogger("test_agents")
+
+class _RecordingContext(_LoggingContext):
+    """Context stand-in that records sent messages instead of delivering them"""
+    
+    def __init__(self):
+        self.sent = []
+    
+    async def send(self, destination: str, message: Model):
+        self.sent.append((destination, message))
+
+async def test_analysis_cycle(assets: int = 64, delay: float = 0.05):
+    """Check that one scheduler tick analyzes its due assets concurrently and requests their data in bulk.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING CONCURRENT ANALYSIS CYCLE =====")
+    from src.agents.data.price_agent import BatchPriceRequest
+    from src.agents.data.sentiment_agent import BatchSentimentRequest
+    from src.orchestrator import meta_agent
+    
+    tickers = [f"ZZAC{i:03d}" for i in range(assets)]
+    evaluated = []
+    
+    async def update_performance(ctx, asset_id):
+        # Stands in for the database round trips of a real evaluation
+        evaluated.append(asset_id)
+        await asyncio.sleep(delay)
+    
+    ctx = _RecordingContext()
+    previous = meta_agent.update_performance, meta_agent.assets_refreshed_at, meta_agent.PIPELINE_DEADLINE
+    meta_agent.update_performance = update_performance
+    # Shorter than the tick itself: deadlines must only start once the data is requested
+    meta_agent.PIPELINE_DEADLINE = delay / 2
+    # Use the test assets instead of reloading the asset list
+    meta_agent.assets_refreshed_at = time.time()
+    meta_agent.scheduler.sync({ticker: "crypto" for ticker in tickers}, time.time())
+    try:
+        start = time.perf_counter()
+        await meta_agent.analyze_investments(ctx)
+        elapsed = time.perf_counter() - start
+        
+        price_requests = [msg for _, msg in ctx.sent if isinstance(msg, BatchPriceRequest)]
+        sentiment_requests = [msg for _, msg in ctx.sent if isinstance(msg, BatchSentimentRequest)]
+        priced = [ticker for msg in price_requests for ticker in msg.tickers]
+        asked = [request.ticker for msg in sentiment_requests for request in msg.requests]
+        cycles_match = all(
+            meta_agent.pipeline.get(ticker) is not None
+            and msg.cycle_ids[ticker] == meta_agent.pipeline.get(ticker).cycle_id
+            for msg in price_requests for ticker in msg.tickers
+        )
+        
+        sequential = assets * delay
+        print(f"{assets} assets analyzed in {elapsed:.2f}s (one at a time: {sequential:.2f}s)")
+        print(f"{len(price_requests)} price and {len(sentiment_requests)} sentiment requests sent")
+        print(f"{'PASS' if sorted(evaluated) == tickers and elapsed < sequential / 2 else 'FAIL'}: "
+              f"every due asset was evaluated, concurrently")
+        print(f"{'PASS' if sorted(priced) == tickers and sorted(asked) == tickers and cycles_match else 'FAIL'}: "
+              f"prices and sentiment were requested in bulk for each started cycle, before its deadline ran")
+        print(f"{'PASS' if all(ticker in meta_agent.scheduler for ticker in tickers) else 'FAIL'}: "
+              f"every asset was queued for its next run")
+    finally:
+        # Drop the cycles before their deadlines would analyze them
+        for task in list(meta_agent._background_tasks):
+            task.cancel()
+        await asyncio.gather(*meta_agent._background_tasks, return_exceptions=True)
+        for ticker in tickers:
+            cycle = meta_agent.pipeline.get(ticker)
+            if cycle is not None:
+                meta_agent.pipeline.finish(ticker, cycle.cycle_id)
+        meta_agent.scheduler.sync({}, time.time())
+        meta_agent.update_performance, meta_agent.assets_refreshed_at, meta_agent.PIPELINE_DEADLINE = previous
+
+def test_admission(due_assets: int = 8, max_in_flight: int = 5):
+    """Check that assets still in flight are skipped and new cycles stop at the in-flight limit.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING IN-FLIGHT GUARD AND BACKPRESSURE =====")
+    from src.orchestrator import meta_agent
+    from src.orchestrator.metrics import metrics
+    
+    tickers = [f"ZZAD{i}" for i in range(due_assets)]
+    now = time.time()
+    # Oldest due first, as the scheduler hands them out
+    due = [(ticker, now - due_assets + i) for i, ticker in enumerate(tickers)]
+    ctx = _LoggingContext()
+    previous = meta_agent.MAX_IN_FLIGHT_ASSETS
+    meta_agent.MAX_IN_FLIGHT_ASSETS = max_in_flight
+    before = metrics.snapshot()["counters"]
+    try:
+        in_flight = [meta_agent.pipeline.start(ticker, datetime.now().isoformat()) for ticker in tickers[:2]]
+        admitted = meta_agent.admit_assets(ctx, due, now)
+        after = metrics.snapshot()["counters"]
+        skipped = {name: after.get(name, 0) - before.get(name, 0)
+                   for name in ("cycles_skipped_in_flight", "cycles_skipped_backpressure")}
+        lag = metrics.snapshot()["gauges"]["analysis_lag_seconds"]
+        
+        # Once the earlier cycles finish, their assets are admitted again
+        for cycle in in_flight:
+            meta_agent.pipeline.finish(cycle.asset_id, cycle.cycle_id)
+        readmitted = meta_agent.admit_assets(ctx, due[:2], now)
+        
+        print(f"Admitted {admitted}, skipped {skipped}, lag {lag:.1f}s")
+        print(f"{'PASS' if admitted == tickers[2:max_in_flight] else 'FAIL'}: "
+              f"assets in flight were skipped and no more than {max_in_flight} cycles are outstanding")
+        expected = {"cycles_skipped_in_flight": 2, "cycles_skipped_backpressure": due_assets - max_in_flight}
+        print(f"{'PASS' if skipped == expected else 'FAIL'}: skips were counted by reason")
+        print(f"{'PASS' if readmitted == tickers[:2] else 'FAIL'}: finished assets are admitted again")
+    finally:
+        for ticker in tickers:
+            cycle = meta_agent.pipeline.get(ticker)
+            if cycle is not None:
+                meta_agent.pipeline.finish(ticker, cycle.cycle_id)
+        meta_agent.MAX_IN_FLIGHT_ASSETS = previous
+
+async def test_strategy_responses(timeout: float = 0.3):
+    """Check that strategy responses reach the request they answer and late ones are left out.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING STRATEGY RESPONSE CORRELATION =====")
+    import uuid
+    from src.orchestrator import meta_agent
+    
+    # Seconds until each strategy answers; None never does
+    delays = {"fast": 0.01, "late": timeout * 2, "silent": None}
+    delivered = []
+    
+    def respond(strategy: str, request: AnalysisRequest, request_id: str, action: str):
+        response = AgentResponse(
+            asset_id=request.asset_id, timestamp=datetime.now().isoformat(),
+            prediction={"action": action}, confidence=0.8, reasoning="test",
+            strategy_name=strategy, request_id=request_id
+        )
+        delivered.append((strategy, request_id == request.request_id,
+                          meta_agent.strategy_responses.resolve(request_id, response)))
+    
+    class StrategyContext(_RecordingContext):
+        async def send(self, destination: str, message: Model):
+            await super().send(destination, message)
+            delay = delays[destination]
+            if delay is None:
+                return
+            loop = asyncio.get_running_loop()
+            # An answer to some earlier request comes first and must not be taken for this one
+            loop.call_soon(respond, destination, message, uuid.uuid4().hex, "sell")
+            loop.call_later(delay, respond, destination, message, message.request_id, "buy")
+    
+    ctx = StrategyContext()
+    assets = ["ZZSR1", "ZZSR2"]
+    previous = meta_agent.STRATEGY_AGENTS, meta_agent.STRATEGY_TIMEOUT
+    meta_agent.STRATEGY_AGENTS = {name: name for name in delays}
+    meta_agent.STRATEGY_TIMEOUT = timeout
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            meta_agent.request_strategy_predictions(ctx, asset, {"price": 100.0}, []) for asset in assets
+        ))
+        elapsed = time.perf_counter() - start
+        # Let the late answers arrive after their deadline
+        await asyncio.sleep(timeout * 2)
+        
+        matched = all(
+            responses["fast"] is not None
+            and responses["fast"].asset_id == asset
+            and responses["fast"].prediction["action"] == "buy"
+            and responses["late"] is None and responses["silent"] is None
+            for asset, responses in zip(assets, results)
+        )
+        accepted = sorted(strategy for strategy, _, ok in delivered if ok)
+        stale_taken = any(ok for _, current, ok in delivered if not current)
+        
+        print(f"{len(ctx.sent)} requests answered or timed out in {elapsed:.2f}s (deadline {timeout}s)")
+        print(f"{'PASS' if matched else 'FAIL'}: each asset got its own strategy's answer, missing ones are None")
+        print(f"{'PASS' if accepted == ['fast'] * len(assets) and not stale_taken else 'FAIL'}: "
+              f"late and unrelated responses were discarded")
+        print(f"{'PASS' if elapsed < timeout * 1.5 else 'FAIL'}: all strategies were waited on in parallel")
+        print(f"{'PASS' if len(meta_agent.strategy_responses) == 0 else 'FAIL'}: no requests left pending")
+    finally:
+        meta_agent.STRATEGY_AGENTS, meta_agent.STRATEGY_TIMEOUT = previous
+
+async def test_performance_update(predictions: int = 40):
+    """Check the set-based evaluation of pending predictions against the per-prediction rules.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING SET-BASED PERFORMANCE EVALUATION =====")
+    from datetime import timezone
+    from src.orchestrator.db import db_pool
+    from src.orchestrator.meta_agent import shards, update_performance
+    from src.orchestrator.scoring import apply_weight_update, calculate_performance_score
+    
+    asset = "ZZPERF"
+    strategies = ["zz_trend", "zz_contrarian"]
+    start = datetime(2024, 1, 2, 15, 0, tzinfo=timezone.utc)
+    prices = [100.0, 101.0, 99.0, 104.0, 108.0, 95.0, 100.0, 102.0]  # One bar a minute
+    rng = random.Random(5)
+    # Inserted out of time order, so evaluation order (by id) differs from prediction time
+    rows = [(rng.choice(strategies), start + timedelta(seconds=12 * i + 1), rng.choice(["buy", "sell", "hold"]))
+            for i in range(predictions)]
+    rng.shuffle(rows)
+    ctx = _LoggingContext()
+    
+    await db_pool.open()
+    try:
+        async with db_pool.connection() as conn:
+            await conn.execute("""
+                INSERT INTO assets (ticker, name, asset_type) VALUES (%s, 'Performance test asset', 'test')
+                ON CONFLICT (ticker) DO NOTHING
+            """, (asset,))
+            async with conn.cursor() as cur:
+                await cur.executemany("""
+                    INSERT INTO strategy_weights (strategy_name, weight) VALUES (%s, 1.0)
+                    ON CONFLICT (strategy_name) DO UPDATE SET weight = 1.0
+                """, [(name,) for name in strategies])
+                await cur.executemany(
+                    "INSERT INTO market_data (asset_id, timestamp, price, volume) VALUES (%s, %s, %s, 0)",
+                    [(asset, start + timedelta(minutes=i), price) for i, price in enumerate(prices)]
+                )
+                ids = []
+                for strategy_name, timestamp, action in rows:
+                    await cur.execute("""
+                        INSERT INTO predictions (asset_id, strategy_name, timestamp, prediction, confidence)
+                        VALUES (%s, %s, %s, %s, 0.5) RETURNING id
+                    """, (asset, strategy_name, timestamp, json.dumps({"action": action})))
+                    ids.append((await cur.fetchone())[0])
+        
+        # Reference: each prediction scored on its own against the first price after it
+        expected_scores, expected_weights = {}, dict.fromkeys(strategies, 1.0)
+        for pred_id, (strategy_name, timestamp, action) in sorted(zip(ids, rows)):
+            later = [price for i, price in enumerate(prices) if start + timedelta(minutes=i) > timestamp]
+            score = calculate_performance_score(action, None, later[0] if later else 0, prices[-1])
+            expected_scores[pred_id] = score
+            expected_weights[strategy_name] = apply_weight_update(expected_weights[strategy_name], score)
+        
+        # Two evaluations at once, as an old and a new owner of the asset might run them
+        await shards.rebalance([asset])
+        await asyncio.gather(update_performance(ctx, asset), update_performance(ctx, asset))
+        
+        async with db_pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT prediction_id, performance_score FROM performance_history WHERE asset_id = %s", (asset,)
+                )
+                stored = await cur.fetchall()
+                await cur.execute(
+                    "SELECT strategy_name, weight FROM strategy_weights WHERE strategy_name = ANY(%s)", (strategies,)
+                )
+                weights = dict(await cur.fetchall())
+        
+        # Once the lease is gone, new predictions are left to the new owner
+        await shards.close()
+        async with db_pool.connection() as conn:
+            await conn.execute("""
+                INSERT INTO predictions (asset_id, strategy_name, timestamp, prediction, confidence)
+                VALUES (%s, %s, %s, '{"action": "buy"}', 0.5)
+            """, (asset, strategies[0], start))
+        await update_performance(ctx, asset)
+        async with db_pool.connection() as conn:
+            cur = await conn.execute("SELECT COUNT(*) FROM performance_history WHERE asset_id = %s", (asset,))
+            released = (await cur.fetchone())[0] == len(stored)
+        
+        scores_match = (len(stored) == predictions
+                        and all(abs(score - expected_scores[pred_id]) < 1e-4 for pred_id, score in stored))
+        weights_match = all(abs(weights[name] - expected_weights[name]) < 1e-4 for name in strategies)
+        print(f"Stored weights: {weights}, expected: {expected_weights}")
+        print(f"{'PASS' if scores_match else 'FAIL'}: {len(stored)} of {predictions} predictions "
+              f"evaluated once each, with the per-prediction scores")
+        print(f"{'PASS' if weights_match else 'FAIL'}: weights match the per-prediction updates applied in order")
+        print(f"{'PASS' if released else 'FAIL'}: a released asset is not evaluated")
+    finally:
+        await shards.close()
+        async with db_pool.connection() as conn:
+            await conn.execute("DELETE FROM performance_history WHERE asset_id = %s", (asset,))
+            await conn.execute("DELETE FROM evaluation_watermarks WHERE asset_id = %s", (asset,))
+            await conn.execute("DELETE FROM predictions WHERE asset_id = %s", (asset,))
+            await conn.execute("DELETE FROM market_data WHERE asset_id = %s", (asset,))
+            await conn.execute("DELETE FROM assets WHERE ticker = %s", (asset,))
+            await conn.execute("DELETE FROM strategy_weights WHERE strategy_name = ANY(%s)", (strategies,))
+        await db_pool.close()
+
+async def test_evaluation_cost():
+    """Check that a performance evaluation cycle costs the same as predictions grows.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING INCREMENTAL PERFORMANCE EVALUATION =====")
+    from src.orchestrator.meta_agent import shards, update_performance
+    from src.orchestrator.db import db_pool
+    
+    asset = "ZZEVAL"
+    new_per_cycle = 50
+    history_sizes = [10_000, 100_000, 1_000_000]
+    ctx = _LoggingContext()
+    
+    await db_pool.open()
+    try:
+        async with db_pool.connection() as conn:
+            await conn.execute("""
+                INSERT INTO assets (ticker, name, asset_type)
+                VALUES (%s, 'Evaluation test asset', 'test')
+                ON CONFLICT (ticker) DO NOTHING
+            """, (asset,))
+            await conn.execute("""
+                INSERT INTO market_data (asset_id, timestamp, price, volume)
+                VALUES (%s, now() + interval '1 day', 100, 0)
+                ON CONFLICT (asset_id, timestamp) DO NOTHING
+            """, (asset,))
+        
+        await shards.rebalance([asset])
+        results = []
+        size = 0
+        for target in history_sizes:
+            async with db_pool.connection() as conn:
+                # Grow the already-evaluated history to the target size
+                await conn.execute("""
+                    INSERT INTO predictions (asset_id, strategy_name, timestamp, prediction, confidence)
+                    SELECT %s, 'momentum', now() - make_interval(secs => g),
+                           '{"action": "hold"}', 0.5
+                    FROM generate_series(%s::int, %s::int) g
+                """, (asset, size + 1, target))
+                await conn.execute("""
+                    INSERT INTO evaluation_watermarks (asset_id, last_prediction_id)
+                    SELECT %s, MAX(id) FROM predictions WHERE asset_id = %s
+                    ON CONFLICT (asset_id) DO UPDATE SET last_prediction_id = EXCLUDED.last_prediction_id
+                """, (asset, asset))
+                # New predictions for this cycle, stamped just after the history
+                await conn.execute("""
+                    INSERT INTO predictions (asset_id, strategy_name, timestamp, prediction, confidence)
+                    SELECT %s, 'momentum', now() + make_interval(secs => %s + g),
+                           '{"action": "buy"}', 0.7
+                    FROM generate_series(1, %s::int) g
+                """, (asset, target, new_per_cycle))
+                await conn.execute("ANALYZE predictions")
+            size = target
+            
+            start = time.perf_counter()
+            await update_performance(ctx, asset)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            results.append({"predictions": size, "cycle_ms": round(elapsed_ms, 2)})
+            print(f"{size:>9} predictions: evaluation cycle took {elapsed_ms:.2f} ms")
+        
+        print("\nIncremental Evaluation Results:")
+        pprint(results)
+        fastest = min(r["cycle_ms"] for r in results)
+        slowest = max(r["cycle_ms"] for r in results)
+        verdict = "PASS" if slowest <= 3 * max(fastest, 1.0) else "FAIL"
+        print(f"{verdict}: slowest cycle is {slowest / max(fastest, 1e-9):.1f}x the fastest")
+    
+    finally:
+        await shards.close()
+        # Remove the test asset and everything written for it
+        async with db_pool.connection() as conn:
+            await conn.execute("DELETE FROM performance_history WHERE asset_id = %s", (asset,))
+            await conn.execute("DELETE FROM evaluation_watermarks WHERE asset_id = %s", (asset,))
+            await conn.execute("DELETE FROM predictions WHERE asset_id = %s", (asset,))
+            await conn.execute("DELETE FROM market_data WHERE asset_id = %s", (asset,))
+            await conn.execute("DELETE FROM assets WHERE ticker = %s", (asset,))
+        await db_pool.close()
+
+async def test_weight_cache(reconnect_delay: float = 1.0):
+    """Check that cached strategy weights follow changes made elsewhere, including while disconnected.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING STRATEGY WEIGHT CACHE =====")
+    from src.orchestrator.db import get_db_connection
+    from src.orchestrator.meta_agent import init_db
+    from src.orchestrator.metrics import metrics
+    from src.orchestrator.weight_cache import StrategyWeightCache
+    init_db()
+    
+    strategy = "zz_cached_strategy"
+    conn = get_db_connection()
+    conn.autocommit = True
+    cache = StrategyWeightCache(reconnect_delay=reconnect_delay)
+    listener = asyncio.create_task(cache.listen())
+    
+    async def cached(expected: Optional[float], timeout: float = 5.0) -> bool:
+        """Wait until the cache holds `expected` (None: no entry) for the strategy"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if cache.snapshot().get(strategy) == expected:
+                return True
+            await asyncio.sleep(0.02)
+        return False
+    
+    try:
+        await cache.wait_loaded(timeout=5.0)
+        conn.execute("INSERT INTO strategy_weights (strategy_name, weight) VALUES (%s, 1.5)", (strategy,))
+        inserted = await cached(1.5)
+        conn.execute("UPDATE strategy_weights SET weight = 0.75 WHERE strategy_name = %s", (strategy,))
+        updated = await cached(0.75)
+        print(f"{'PASS' if inserted and updated else 'FAIL'}: inserts and updates made elsewhere reach the cache")
+        
+        # A snapshot taken before the last change must not bring the old weight back
+        cache.seed({strategy: 2.0})
+        print(f"{'PASS' if cache.get(strategy) == 0.75 else 'FAIL'}: seeded weights do not override loaded ones")
+        
+        # Drop the listening session (its last statement was the reload) and
+        # change the weight before it reconnects
+        reloads = metrics.snapshot()["counters"].get("weight_cache_reloads", 0)
+        terminated = conn.execute("""
+            SELECT pg_terminate_backend(pid) FROM pg_stat_activity
+            WHERE query = 'SELECT strategy_name, weight FROM strategy_weights' AND pid <> pg_backend_pid()
+        """).fetchall()
+        conn.execute("UPDATE strategy_weights SET weight = 3.0 WHERE strategy_name = %s", (strategy,))
+        recovered = await cached(3.0, timeout=reconnect_delay + 5.0)
+        reloaded = metrics.snapshot()["counters"].get("weight_cache_reloads", 0) > reloads
+        print(f"{'PASS' if terminated and recovered and reloaded else 'FAIL'}: "
+              f"a change missed while disconnected is picked up on reconnect")
+        
+        conn.execute("DELETE FROM strategy_weights WHERE strategy_name = %s", (strategy,))
+        print(f"{'PASS' if await cached(None) else 'FAIL'}: deleted strategies leave the cache")
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        conn.execute("DELETE FROM strategy_weights WHERE strategy_name = %s", (strategy,))
+        conn.close()
+
+async def test_market_buffer(rows: int = 120, capacity: int = 90):
+    """Check that market data buffers load the newest rows per asset and roll forward from messages.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING IN-MEMORY MARKET DATA BUFFERS =====")
+    from datetime import timezone
+    from src.orchestrator.db import DatabasePool, get_db_connection
+    from src.orchestrator.market_buffer import MarketDataBuffers
+    from src.orchestrator.meta_agent import init_db
+    init_db()
+    
+    long, short = "ZZMBLONG", "ZZMBSHORT"
+    start = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.executemany("""
+            INSERT INTO assets (ticker, name, asset_type) VALUES (%s, 'Market buffer test asset', 'test')
+            ON CONFLICT (ticker) DO NOTHING
+        """, [(long,), (short,)])
+        cur.executemany("""
+            INSERT INTO market_data (asset_id, timestamp, price, volume, sentiment_score, currency)
+            VALUES (%s, %s, %s, %s, %s, 'EUR')
+        """, [(asset, start + timedelta(minutes=i), 100.0 + i, 1000 + i, 0.1 if i % 2 else None)
+              for asset, count in ((long, rows), (short, 10)) for i in range(count)])
+    conn.commit()
+    
+    pool = DatabasePool(min_size=1, max_size=2)
+    await pool.open()
+    try:
+        buffers = MarketDataBuffers(capacity=capacity)
+        loaded = await buffers.load(pool, [long, short])
+        history = buffers.get(long)
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT price, sentiment_score FROM market_data WHERE asset_id = %s
+                ORDER BY timestamp DESC LIMIT %s
+            """, (long, capacity))
+            newest = [(float(price), None if score is None else float(score)) for price, score in cur.fetchall()]
+        in_memory = [(row["price"], row["sentiment_score"]) for row in history.history()]
+        
+        print(f"Loaded {loaded} rows; {long} holds {len(history)}, {short} holds {len(buffers.get(short))}")
+        print(f"{'PASS' if loaded == capacity + 10 and in_memory == newest else 'FAIL'}: "
+              f"each asset holds its newest {capacity} rows, newest first")
+        
+        # Messages keep the buffer current: a new quote slides the window,
+        # sentiment joins the row of its price, and older rows are left to the database
+        last = start + timedelta(minutes=rows - 1)
+        history.append(last + timedelta(minutes=1), 500.0, 1, currency="EUR")
+        history.update_sentiment(last + timedelta(minutes=1), -0.5, 0.5)
+        history.append(start, 1.0, 1)
+        latest = history.latest()
+        ok = (len(history) == capacity and latest["price"] == 500.0 and latest["sentiment_score"] == -0.5
+              and latest["currency"] == "EUR" and history.prices()[0] == 100.0 + rows - capacity + 1)
+        print(f"{'PASS' if ok else 'FAIL'}: new quotes and sentiment roll the window forward")
+    finally:
+        await pool.close()
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM market_data WHERE asset_id = ANY(%s)", ([long, short],))
+            cur.execute("DELETE FROM assets WHERE ticker = ANY(%s)", ([long, short],))
+        conn.commit()
+        conn.close()
+
+async def test_snapshot(capacity: int = 30):
+    """Check that a snapshot restores the in-memory state as saved and catch_up adds what came after.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING WARM-RESTART SNAPSHOT =====")
+    import tempfile
+    from datetime import timezone
+    from src.orchestrator.db import DatabasePool, get_db_connection
+    from src.orchestrator.market_buffer import MarketDataBuffers
+    from src.orchestrator.meta_agent import init_db
+    from src.orchestrator.snapshot import read_snapshot, take_snapshot, write_snapshot
+    init_db()
+    
+    asset, other = "ZZSNAP", "ZZSNAPB"
+    start = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+    buffers = MarketDataBuffers(capacity=capacity)
+    # More rows than the capacity, so the saved ring has wrapped around
+    for i in range(capacity + 10):
+        buffers.get_or_create(asset).append(start + timedelta(minutes=i), 100.0 + i, 1000 + i,
+                                            0.01 * (i % 7), 0.5, currency="EUR")
+    for i in range(5):
+        buffers.get_or_create(other).append(start + timedelta(minutes=i), 50.0 + i, 10)
+    weights = {"momentum": 1.25, "mean_reversion": 0.5}
+    schedule = {asset: time.time() + 18, other: time.time() + 3600}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "meta_agent.snapshot")
+        size = write_snapshot(path, take_snapshot(buffers, weights, schedule))
+        restored = read_snapshot(path)
+        with open(path, "wb") as f:
+            f.write(b"not a snapshot")
+        try:
+            read_snapshot(path)
+            rejected = False
+        except ValueError:
+            rejected = True
+    
+    same = all(
+        restored.histories[asset_id].history() == history.history()
+        and restored.histories[asset_id].currency == history.currency
+        for asset_id, history in buffers.items()
+    )
+    print(f"Snapshot of {len(restored.histories)} assets: {size} bytes")
+    print(f"{'PASS' if same and restored.weights == weights and restored.schedule == schedule else 'FAIL'}: "
+          f"buffers, weights and schedule read back as saved")
+    print(f"{'PASS' if rejected else 'FAIL'}: a file that is not a snapshot is rejected")
+    
+    # Written after the snapshot: sentiment for its newest row and three more quotes
+    last = start + timedelta(minutes=capacity + 9)
+    written = [(last, 100.0 + capacity + 9, -0.25)] + [
+        (last + timedelta(minutes=i), 200.0 + i, None) for i in range(1, 4)
+    ]
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO assets (ticker, name, asset_type) VALUES (%s, 'Snapshot test asset', 'test')
+            ON CONFLICT (ticker) DO NOTHING
+        """, (asset,))
+        cur.executemany("""
+            INSERT INTO market_data (asset_id, timestamp, price, volume, sentiment_score, currency)
+            VALUES (%s, %s, %s, 1, %s, 'EUR')
+        """, [(asset, timestamp, price, score) for timestamp, price, score in written])
+    conn.commit()
+    
+    pool = DatabasePool(min_size=1, max_size=2)
+    await pool.open()
+    try:
+        warm = MarketDataBuffers(capacity=capacity)
+        warm.restore(restored.histories)
+        rows = await warm.catch_up(pool, [asset])
+        
+        expected = buffers.get(asset)
+        for timestamp, price, score in written:
+            expected.append(timestamp, price, 1, score, None)
+        caught_up = warm.get(asset).history() == expected.history()
+        print(f"{'PASS' if rows == len(written) and caught_up else 'FAIL'}: "
+              f"catch_up read {rows} rows, and the restored buffer matches one kept running")
+    finally:
+        await pool.close()
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM market_data WHERE asset_id = %s", (asset,))
+            cur.execute("DELETE FROM assets WHERE ticker = %s", (asset,))
+        conn.commit()
+        conn.close()
+
+async def test_write_buffer(rows_per_asset: int = 20):
+    """Check that rows of a deleted asset are dropped without holding up the rest of a flush.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING WRITE-BEHIND BUFFER =====")
+    from src.orchestrator.db import DatabasePool, get_db_connection
+    from src.orchestrator.meta_agent import init_db
+    from src.orchestrator.write_buffer import WriteBehindBuffer
+    init_db()
+    
+    deleted, kept = "ZZWBDEL", "ZZWBKEEP"
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.executemany("""
+            INSERT INTO assets (ticker, name, asset_type) VALUES (%s, 'Write buffer test asset', 'test')
+            ON CONFLICT (ticker) DO NOTHING
+        """, [(deleted,), (kept,)])
+    conn.commit()
+    
+    pool = DatabasePool(min_size=1, max_size=2)
+    await pool.open()
+    try:
+        buffer = WriteBehindBuffer(pool, max_rows=10_000, max_delay=60.0)
+        start = datetime(2020, 1, 1)
+        for asset in (deleted, kept):
+            for i in range(rows_per_asset):
+                timestamp = start + timedelta(minutes=i)
+                buffer.add_market_data(asset, timestamp, price=100.0 + i, volume=1000)
+                buffer.add_prediction(asset, "momentum", timestamp, {"action": "hold"}, 0.5, "test")
+                buffer.add_decision(asset, timestamp, "hold", 0.5, "test")
+        
+        # The asset goes away while its rows are still buffered, as DELETE /assets does
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM assets WHERE ticker = %s", (deleted,))
+        conn.commit()
+        
+        written = await buffer.flush()
+        again = await buffer.flush()
+        with conn.cursor() as cur:
+            counts = {}
+            for table in ("market_data", "predictions", "decisions"):
+                cur.execute(f"SELECT COUNT(*) FROM {table} WHERE asset_id = %s", (kept,))
+                counts[table] = cur.fetchone()[0]
+        dropped = {row[0] for _, row, _ in buffer.dead_letters}
+        
+        print(f"Flush wrote {written} rows, dropped {len(buffer.dead_letters)}, stored for {kept}: {counts}")
+        print(f"{'PASS' if counts == dict.fromkeys(counts, rows_per_asset) else 'FAIL'}: "
+              f"every row of the remaining asset was written")
+        print(f"{'PASS' if dropped == {deleted} and len(buffer.dead_letters) == 3 * rows_per_asset else 'FAIL'}: "
+              f"only the deleted asset's rows were dropped")
+        print(f"{'PASS' if len(buffer) == 0 and again == 0 else 'FAIL'}: nothing left to retry")
+    finally:
+        await pool.close()
+        with conn.cursor() as cur:
+            for table in ("market_data", "predictions", "decisions"):
+                cur.execute(f"DELETE FROM {table} WHERE asset_id = ANY(%s)", ([deleted, kept],))
+            cur.execute("DELETE FROM assets WHERE ticker = ANY(%s)", ([deleted, kept],))
+        conn.commit()
+        conn.close()
+
+async def test_backfill(assets: int = 200, bars: int = 500):
+    """Backfill synthetic history for many assets, then check the job resumes and retries failures.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING HISTORICAL BACKFILL =====")
+    from src.agents.data import providers
+    from src.orchestrator.backfill import run_backfill
+    from src.orchestrator.db import get_db_connection
+    from src.orchestrator.meta_agent import init_db
+    
+    init_db()
+
+    tickers = [f"ZZBF{i:04d}" for i in range(assets)]
+    start = datetime(2020, 1, 1)
+    
+    class SyntheticProvider(providers.MarketDataProvider):
+        def __init__(self):
+            self.fail = set()
+        
+        def fetch_quotes(self, batch):
+            return {}
+        
+        def fetch_news(self, ticker):
+            return []
+        
+        def fetch_history(self, batch, period="2y", interval="1d"):
+            if self.fail & set(batch):
+                raise ConnectionError("injected download failure")
+            return {ticker: [(start + timedelta(days=day), 100.0 + day * 0.01, 1000 + day,
+                              "EUR" if ticker == tickers[-1] else "USD")
+                             for day in range(bars)] for ticker in batch}
+    
+    conn = get_db_connection()
+    with conn.cursor() as cur:
+        cur.executemany("""
+            INSERT INTO assets (ticker, name, asset_type) VALUES (%s, 'Backfill test asset', 'test')
+            ON CONFLICT (ticker) DO NOTHING
+        """, [(ticker,) for ticker in tickers])
+    conn.commit()
+    
+    provider = SyntheticProvider()
+    previous, providers._provider = providers._provider, provider
+    try:
+        # First run: one chunk fails and is left for the next run
+        provider.fail = {tickers[0]}
+        first = await run_backfill(tickers, job_id="test-backfill", restart=True, chunk_size=25)
+        print(f"First run:  {first}")
+        
+        provider.fail = set()
+        second = await run_backfill(tickers, job_id="test-backfill", chunk_size=25)
+        print(f"Second run: {second}")
+        
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM market_data WHERE asset_id = ANY(%s)", (tickers,))
+            stored = cur.fetchone()[0]
+            cur.execute("SELECT DISTINCT currency FROM market_data WHERE asset_id = %s", (tickers[-1],))
+            currencies = [row[0] for row in cur.fetchall()]
+        
+        print(f"{'PASS' if first.failed == 25 and first.rows == (assets - 25) * bars else 'FAIL'}: "
+              f"a failed chunk is left unfinished")
+        print(f"{'PASS' if second.skipped == assets - 25 and second.rows == 25 * bars else 'FAIL'}: "
+              f"the rerun only loads the unfinished assets")
+        print(f"{'PASS' if stored == assets * bars else 'FAIL'}: {stored} of {assets * bars} rows stored")
+        print(f"{'PASS' if currencies == ['EUR'] else 'FAIL'}: bars keep their currency {currencies}")
+    finally:
+        providers._provider = previous
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM backfill_progress WHERE job_id = 'test-backfill'")
+            cur.execute("DELETE FROM market_data WHERE asset_id = ANY(%s)", (tickers,))
+            cur.execute("DELETE FROM assets WHERE ticker = ANY(%s)", (tickers,))
+        conn.commit()
+        conn.close()
+
+def test_batch_prices(tickers: int = 500, latency: float = 0.02):
+    """Compare one bulk quote request with one request per ticker against the local stand-in"""
+    print("\n===== TESTING BATCHED PRICE REQUESTS =====")
+    from src.agents.data import quotes
+    from src.agents.data.quote_stand_in import QuoteStandIn
+    
+    server = QuoteStandIn(port=0, latency=latency).start()
+    quotes.QUOTE_SOURCE_URL = server.url
+    symbols = [f"ZZ{i:04d}" for i in range(tickers)]
+    try:
+        start = time.perf_counter()
+        single = {}
+        for symbol in symbols:
+            single.update(quotes.fetch_quotes([symbol]))
+        single_seconds = time.perf_counter() - start
+        single_requests = server.requests
+        
+        start = time.perf_counter()
+        batched = quotes.fetch_quotes(symbols)
+        batch_seconds = time.perf_counter() - start
+        batch_requests = server.requests - single_requests
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    print(f"Per ticker: {single_requests} requests, {single_seconds:.2f}s "
+          f"({tickers / single_seconds:.0f} tickers/s)")
+    print(f"Batched:    {batch_requests} request, {batch_seconds:.3f}s "
+          f"({tickers / batch_seconds:.0f} tickers/s)")
+    complete = set(single) == set(batched) == set(symbols)
+    print(f"{'PASS' if complete else 'FAIL'}: both returned a quote for every ticker")
+
+def test_http_client(requests_count: int = 60, rate: float = 40.0, burst: int = 10):
+    """Check the shared data client's rate limit, retries and circuit breaker against the stand-in"""
+    print("\n===== TESTING SHARED DATA CLIENT =====")
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from src.agents.data.http_client import CircuitOpenError, DataClient
+    from src.agents.data.quote_stand_in import QuoteStandIn
+    
+    server = QuoteStandIn(port=0, latency=0.01, throttle=0.3).start()
+    try:
+        client = DataClient(rate=rate, burst=burst, max_retries=6, backoff=0.02,
+                            backoff_max=0.2, failure_threshold=3, reset_timeout=0.5)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(
+                lambda i: client.get(server.url, params={"symbols": f"ZZ{i:04d}"}).status_code,
+                range(requests_count)
+            ))
+        elapsed = time.perf_counter() - start
+        print(f"{requests_count} requests in {elapsed:.2f}s, stand-in saw {server.requests} "
+              f"({server.throttled} throttled), client stats {client.stats}")
+        # Every upstream attempt takes a token, so the bucket bounds the attempt rate
+        limited = server.requests <= burst + rate * elapsed + 1
+        print(f"{'PASS' if all(s == 200 for s in statuses) else 'FAIL'}: every request succeeded despite 429s")
+        print(f"{'PASS' if limited else 'FAIL'}: {server.requests / elapsed:.1f} attempts/s within {rate}/s plus burst")
+        
+        # A source that always throttles opens the circuit, which then stops calling it
+        server.throttle = 1.0
+        for _ in range(3):
+            client.get(server.url, params={"symbols": "ZZ0000"})
+        seen = server.requests
+        try:
+            client.get(server.url, params={"symbols": "ZZ0000"})
+            rejected = False
+        except CircuitOpenError:
+            rejected = server.requests == seen
+        print(f"{'PASS' if rejected else 'FAIL'}: circuit opened after repeated throttling")
+        
+        # After reset_timeout one probe goes through and closes it again
+        server.throttle = 0.0
+        time.sleep(0.6)
+        recovered = client.get(server.url, params={"symbols": "ZZ0000"}).status_code == 200
+        print(f"{'PASS' if recovered and client.breaker.state == 'closed' else 'FAIL'}: circuit closed after a successful probe")
+        
+        # More threads than pool slots: no more than pool_size requests reach upstream at once
+        in_flight = {"now": 0, "peak": 0}
+        lock = threading.Lock()
+        
+        def upstream():
+            with lock:
+                in_flight["now"] += 1
+                in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            time.sleep(0.02)
+            with lock:
+                in_flight["now"] -= 1
+        
+        client = DataClient(rate=0, pool_size=3)
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            list(pool.map(lambda _: client.call(upstream), range(24)))
+        print(f"{'PASS' if in_flight['peak'] == 3 else 'FAIL'}: "
+              f"{in_flight['peak']} requests in flight at once with a pool of 3")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+async def test_quote_cache(ttl: float = 0.1, latency: float = 0.05):
+    """Check that concurrent quote requests share one fetch and stale quotes are served while refreshing"""
+    print("\n===== TESTING QUOTE CACHE =====")
+    from src.agents.data.quote_cache import QuoteCache
+    
+    fetches = []
+    price = {"value": 100.0}
+    
+    async def fetch(batch):
+        fetches.append(sorted(batch))
+        await asyncio.sleep(latency)
+        return {ticker: {"price": price["value"], "currency": "USD", "volume": 0} for ticker in batch}
+    
+    cache = QuoteCache(fetch, ttl=ttl, max_stale=ttl * 10)
+    
+    # Requests arriving together for overlapping tickers share the upstream fetch
+    results = await asyncio.gather(
+        *(cache.get_many(["AAPL", "MSFT"]) for _ in range(10)), cache.get("AAPL")
+    )
+    shared = all(result["AAPL"] is results[-1] for result in results[:-1])
+    print(f"{'PASS' if fetches == [['AAPL', 'MSFT']] and shared else 'FAIL'}: "
+          f"11 concurrent requests made {len(fetches)} fetch(es), {cache.stats['merged']} merged")
+    
+    # Past the TTL the old quote is served at once and refreshed once in the background
+    await asyncio.sleep(ttl * 1.5)
+    price["value"] = 101.0
+    start = time.perf_counter()
+    stale = await asyncio.gather(*(cache.get("AAPL") for _ in range(5)))
+    stale_seconds = time.perf_counter() - start
+    ok = all(entry.quote["price"] == 100.0 for entry in stale) and stale_seconds < latency / 2
+    print(f"{'PASS' if ok else 'FAIL'}: stale quotes were served without waiting ({stale_seconds * 1000:.1f} ms)")
+    await asyncio.sleep(latency * 2)
+    fresh = await cache.get("AAPL")
+    ok = fresh.quote["price"] == 101.0 and len(fetches) == 2 and cache.stats["refreshes"] == 1
+    print(f"{'PASS' if ok else 'FAIL'}: one background refresh replaced them "
+          f"({cache.stats['refreshes']} refresh started)")
+    
+    # Callers that need a recent quote wait for it instead
+    price["value"] = 102.0
+    forced = await cache.get_many(["AAPL"], max_age=0.0)
+    print(f"{'PASS' if forced['AAPL'].quote['price'] == 102.0 else 'FAIL'}: max_age fetches before returning")
+    
+    # A failed fetch leaves the waiting callers without a quote instead of hanging
+    async def failing(batch):
+        await asyncio.sleep(latency)
+        raise ConnectionError("injected upstream failure")
+    
+    cache = QuoteCache(failing, ttl=ttl)
+    outcomes = await asyncio.wait_for(
+        asyncio.gather(cache.get_many(["AAPL"]), cache.get_many(["AAPL"]), return_exceptions=True), timeout=5.0
+    )
+    ok = isinstance(outcomes[0], ConnectionError) and outcomes[1] == {} and cache._inflight == {}
+    print(f"{'PASS' if ok else 'FAIL'}: a failed fetch raises for its caller and releases the merged waiters")
+
+async def test_subscriptions(tickers: int = 500, ticks: int = 20, change_rate: float = 0.1):
+    """Compare quotes sent by per-cycle polling and by change-only subscription pushes"""
+    print("\n===== TESTING QUOTE SUBSCRIPTIONS =====")
+    from src.agents.data.quote_cache import QuoteCache
+    from src.agents.data.subscriptions import QuoteSubscriptions
+    
+    symbols = [f"ZZ{i:04d}" for i in range(tickers)]
+    prices = {symbol: 100.0 for symbol in symbols}
+    fetches = []
+    
+    async def fetch(batch):
+        fetches.append(len(batch))
+        return {symbol: {"price": prices[symbol], "currency": "USD", "volume": 0} for symbol in batch}
+    
+    cache = QuoteCache(fetch, ttl=0.0, max_stale=60.0)
+    subscriptions = QuoteSubscriptions(lease=60.0)
+    subscriptions.subscribe("meta-1", symbols, 0.0)
+    subscriptions.subscribe("meta-2", symbols[:tickers // 2], 0.0)
+    subscriptions.seed({s: q.quote for s, q in (await cache.get_many(symbols, max_age=0.0)).items()})
+    
+    polled = pushed = messages = 0
+    rng = random.Random(7)
+    for _ in range(ticks):
+        moved = rng.sample(symbols, int(tickers * change_rate))
+        for symbol in moved:
+            prices[symbol] *= 1.001
+        # Polling: every subscriber asks for all of its tickers and gets them all back
+        polled += tickers + tickers // 2
+        
+        quotes = await cache.get_many(subscriptions.tickers(), max_age=0.0)
+        changes = subscriptions.changes({s: q.quote for s, q in quotes.items()})
+        messages += len(changes)
+        pushed += sum(len(changed) for changed in changes.values())
+        expected = {"meta-1": sorted(moved), "meta-2": sorted(set(moved) & set(symbols[:tickers // 2]))}
+        assert changes == {k: v for k, v in expected.items() if v}, "pushed the wrong tickers"
+    
+    print(f"Polling: {polled} quotes in {ticks * 4} messages")
+    print(f"Pushing: {pushed} quotes in {messages} messages, {len(fetches) - 1} bulk fetches")
+    ok = pushed < polled * change_rate * 1.01 and len(fetches) == ticks + 1
+    print(f"{'PASS' if ok else 'FAIL'}: only changed quotes pushed, one upstream fetch per tick for both subscribers")
+
+async def test_finbert_batching(tickers: int = 20, headlines: int = 30):
+    """Compare one-headline-at-a-time FinBERT scoring with cross-ticker batches"""
+    print("\n===== TESTING BATCHED FINBERT INFERENCE =====")
+    try:
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    except ImportError:
+        print("SKIP: transformers and torch are not installed")
+        return
+    import numpy as np
+    from src.agents.data.sentiment_batcher import SentimentBatcher, score_texts
+    
+    tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
+    model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+    rng = random.Random(11)
+    words = ["shares", "rally", "slump", "earnings", "beat", "miss", "guidance", "record", "revenue",
+             "analysts", "downgrade", "upgrade", "lawsuit", "merger", "quarter", "growth", "losses"]
+    news = {f"T{t:02d}": [" ".join(rng.choice(words) for _ in range(rng.randint(6, 60)))
+                          for _ in range(headlines)] for t in range(tickers)}
+    texts = [text for ticker_texts in news.values() for text in ticker_texts]
+    
+    start = time.perf_counter()
+    single = score_texts(tokenizer, model, texts, batch_size=1)
+    single_seconds = time.perf_counter() - start
+    
+    # Every ticker asks separately and at once, as concurrent requests do
+    batcher = SentimentBatcher(tokenizer, model, batch_size=16, max_texts=len(texts))
+    start = time.perf_counter()
+    per_ticker = await asyncio.gather(*(batcher.score(ticker_texts) for ticker_texts in news.values()))
+    batch_seconds = time.perf_counter() - start
+    batched = np.concatenate(per_ticker)
+    
+    print(f"One at a time: {len(texts) / single_seconds:.1f} headlines/s")
+    print(f"Batched:       {len(texts) / batch_seconds:.1f} headlines/s in {batcher.stats['flushes']} flush(es) "
+          f"({single_seconds / batch_seconds:.1f}x)")
+    same = float(np.max(np.abs(single - batched)))
+    print(f"{'PASS' if same < 1e-4 else 'FAIL'}: batched scores match per-headline scores (max diff {same:.2e})")
+
+def test_sentiment_cache(entries: int = 1000, capacity: int = 600):
+    """Check that cached headline scores survive a restart and the least recently used are evicted"""
+    print("\n===== TESTING HEADLINE SENTIMENT CACHE =====")
+    import tempfile
+    import numpy as np
+    from src.agents.data.sentiment_cache import SentimentCache, text_key
+    
+    keys = [text_key("test-model", f"Headline {i}") for i in range(entries)]
+    probs = {key: np.array([i / entries, 1 - i / entries, 0.0]) for i, key in enumerate(keys)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sentiment_cache.sqlite3")
+        cache = SentimentCache(path, max_entries=capacity)
+        cache.put_many({key: probs[key] for key in keys[:capacity]})
+        time.sleep(0.01)
+        cache.get_many(keys[:100])  # Used again, so the next insert evicts others first
+        time.sleep(0.01)
+        cache.put_many({key: probs[key] for key in keys[capacity:]})
+        cache.close()
+        
+        cache = SentimentCache(path, max_entries=capacity)
+        found = cache.get_many(keys)
+        size = len(cache)
+        cache.close()
+    
+    kept_recent = all(key in found for key in keys[:100]) and all(key in found for key in keys[capacity:])
+    exact = all(np.array_equal(found[key], probs[key]) for key in found)
+    print(f"{'PASS' if size == capacity else 'FAIL'}: {size} of {entries} entries kept (capacity {capacity})")
+    print(f"{'PASS' if kept_recent else 'FAIL'}: recently used and newest entries survived eviction and a restart")
+    print(f"{'PASS' if exact else 'FAIL'}: cached probabilities read back unchanged")
+
+def test_replay(minutes: int = 60, speed: float = 600.0):
+    """Play a recorded hour of quotes and news back at `speed` times real time"""
+    print("\n===== TESTING REPLAY PROVIDER =====")
+    import tempfile
+    from src.agents.data.providers import MarketDataProvider, ReplayProvider
+    
+    start = datetime(2024, 1, 2, 14, 30)
+    with tempfile.TemporaryDirectory() as tmp:
+        quotes_path = os.path.join(tmp, "quotes.csv")
+        news_path = os.path.join(tmp, "news.csv")
+        with open(quotes_path, "w") as f:
+            f.write("timestamp,ticker,price,volume\n")
+            for minute in range(minutes):
+                for i, ticker in enumerate(TEST_ASSETS):
+                    stamp = (start + timedelta(minutes=minute)).isoformat()
+                    f.write(f"{stamp}Z,{ticker},{100 + i * 10 + minute * 0.1:.2f},{1000 * minute}\n")
+        with open(news_path, "w") as f:
+            f.write("timestamp,ticker,title,summary\n")
+            for minute in range(0, minutes, 10):
+                stamp = (start + timedelta(minutes=minute)).isoformat()
+                f.write(f"{stamp}Z,AAPL,Headline {minute},Summary {minute}\n")
+        
+        provider = ReplayProvider(quotes_path, news_path, speed=speed)
+        first = provider.fetch_quotes(TEST_ASSETS)
+        time.sleep(1.0)
+        later = provider.fetch_quotes(TEST_ASSETS)
+        news = provider.fetch_news("AAPL")
+    
+    advanced = (datetime.fromisoformat(later["AAPL"]["timestamp"])
+                - datetime.fromisoformat(first["AAPL"]["timestamp"])).total_seconds()
+    print(f"First tick: {first['AAPL']}")
+    print(f"After 1s:   {later['AAPL']}")
+    print(f"News so far: {[item['content']['title'] for item in news]}")
+    ok = (set(first) == set(TEST_ASSETS) and advanced >= speed * 0.8 - 60
+          and news and news[0]["content"]["title"] == f"Headline {int(advanced // 600) * 10}")
+    print(f"{'PASS' if ok else 'FAIL'}: replay clock advanced {advanced:.0f}s of recorded time in 1s")
+    
+    # A provider missing a required method fails when it is created, not mid-fetch
+    class QuotesOnly(MarketDataProvider):
+        def fetch_quotes(self, tickers):
+            return {}
+    
+    try:
+        QuotesOnly()
+        incomplete = False
+    except TypeError:
+        incomplete = True
+    try:
+        provider.fetch_history(["AAPL"])
+        no_history = False
+    except NotImplementedError as e:
+        no_history = "ReplayProvider" in str(e)
+    print(f"{'PASS' if incomplete and no_history else 'FAIL'}: "
+          f"a provider without news cannot be created, and missing history is a clear error")
+
+def _shard_worker(instance_id: str, assets: List[str], interval: float,
+                  lease_timeout: float, results):
+    """Run one shard coordinator in its own process, reporting what it owns after each heartbeat"""
+    from src.orchestrator.sharding import ShardCoordinator
+    
+    async def run():
+        coordinator = ShardCoordinator(instance_id, lease_timeout=lease_timeout)
+        await coordinator.open()
+        while True:
+            await coordinator.rebalance(assets)
+            results.put((instance_id, sorted(coordinator.owned)))
+            await asyncio.sleep(interval)
+    
+    asyncio.run(run())
+
+def test_sharding(instances: int = 3, asset_count: int = 300):
+    """Check that separate processes split the assets and take over a dead instance's share.
+
+    Requires the local Postgres database configured for the meta agent.
+    """
+    print("\n===== TESTING SHARDED META AGENT INSTANCES =====")
+    import multiprocessing
+    import queue
+    from src.orchestrator.db import get_db_connection
+    from src.orchestrator.meta_agent import init_db
+    init_db()
+    
+    interval, lease_timeout = 0.5, 2.0
+    assets = [f"ZZSHARD{i:04d}" for i in range(asset_count)]
+    mp = multiprocessing.get_context("spawn")
+    results = mp.Queue()
+    processes = {
+        f"shard-test-{i}": mp.Process(
+            target=_shard_worker,
+            args=(f"shard-test-{i}", assets, interval, lease_timeout, results),
+            daemon=True
+        )
+        for i in range(instances)
+    }
+    
+    def ownership(seconds: float) -> Dict[str, List[str]]:
+        """Latest owned assets per instance after letting them run for a while"""
+        owned = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            try:
+                instance_id, assets_owned = results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            owned[instance_id] = assets_owned
+        return owned
+    
+    def check(owned: Dict[str, List[str]], expected: List[str]) -> bool:
+        claimed = [asset for assets_owned in owned.values() for asset in assets_owned]
+        disjoint = len(claimed) == len(set(claimed))
+        covered = set(claimed) == set(assets)
+        shares = {instance_id: len(owned.get(instance_id, [])) for instance_id in expected}
+        print(f"Shares: {shares}, disjoint: {disjoint}, all {len(assets)} assets covered: {covered}")
+        return disjoint and covered
+    
+    try:
+        for process in processes.values():
+            process.start()
+        
+        # Spawned workers re-import this script (and the agents) before their
+        # first heartbeat, so wait for every instance to report before timing
+        started, deadline = set(), time.monotonic() + 120
+        while started != set(processes) and time.monotonic() < deadline:
+            try:
+                started.add(results.get(timeout=0.5)[0])
+            except queue.Empty:
+                continue
+        
+        balanced = check(ownership(lease_timeout + 4 * interval), list(processes))
+        
+        # Kill one instance without a clean shutdown; its session dies with it
+        victim = "shard-test-0"
+        processes[victim].kill()
+        processes[victim].join()
+        ownership(lease_timeout + 2 * interval)  # Let the stale heartbeat expire
+        survivors = [instance_id for instance_id in processes if instance_id != victim]
+        taken_over = check(
+            {k: v for k, v in ownership(4 * interval).items() if k != victim}, survivors
+        )
+        
+        print(f"{'PASS' if balanced and taken_over else 'FAIL'}: "
+              f"{instances} instances split the assets and the survivors took over")
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.kill()
+                process.join()
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM orchestrator_instances WHERE instance_id LIKE 'shard-test-%'")
+            conn.commit()
+        finally:
+            conn.close()
+
 # Main function
 async def main():
     parser = argparse.ArgumentParser(description="Test agents in the multi-agent system")
-    parser.add_argument("--test", choices=["momentum", "mean_reversion", "sentiment", "integration", "all"], 
+    parser.add_argument("--test", choices=["momentum", "mean_reversion", "sentiment", "integration",
+                                           "scoring", "evaluation", "sharding", "batch_prices", "replay", "http_client", "subscriptions", "backfill", "finbert_batching", "sentiment_cache", "write_buffer", "change_gate", "live_change_gate", "analysis_cycle", "strategy_responses", "db_pool", "performance", "market_buffer", "pipeline", "admission", "scheduler", "weight_cache", "decision", "snapshot", "quote_cache", "all"], 
                         default="all", help="Select which test to run")
     args = parser.parse_args()
     
@@ -399,9 +1879,82 @@ async def main():
     
     if args.test == "integration" or args.test == "all":
         await test_integration()
+    
+    if args.test == "scoring" or args.test == "all":
+        test_scoring_engine()
+    
+    if args.test == "pipeline" or args.test == "all":
+        test_pipeline()
+    
+    if args.test == "decision" or args.test == "all":
+        test_decision_kernel()
+    
+    if args.test == "scheduler" or args.test == "all":
+        test_scheduler()
+    
+    if args.test == "change_gate" or args.test == "all":
+        test_change_gate()
+    
+    if args.test == "batch_prices" or args.test == "all":
+        test_batch_prices()
+    
+    if args.test == "replay" or args.test == "all":
+        test_replay()
+    
+    if args.test == "http_client" or args.test == "all":
+        test_http_client()
+    
+    if args.test == "quote_cache" or args.test == "all":
+        await test_quote_cache()
+    
+    if args.test == "subscriptions" or args.test == "all":
+        await test_subscriptions()
+    
+    if args.test == "finbert_batching" or args.test == "all":
+        await test_finbert_batching()
+    
+    if args.test == "sentiment_cache" or args.test == "all":
+        test_sentiment_cache()
+    
+    # Needs Postgres, so it only runs when asked for explicitly
+    if args.test == "analysis_cycle":
+        await test_analysis_cycle()
+    
+    if args.test == "live_change_gate":
+        await test_live_change_gate()
+    
+    if args.test == "admission":
+        test_admission()
+    
+    if args.test == "strategy_responses":
+        await test_strategy_responses()
+    
+    if args.test == "db_pool":
+        await test_db_pool()
+    
+    if args.test == "performance":
+        await test_performance_update()
+    
+    if args.test == "evaluation":
+        await test_evaluation_cost()
+    
+    if args.test == "weight_cache":
+        await test_weight_cache()
+    
+    if args.test == "market_buffer":
+        await test_market_buffer()
+    
+    if args.test == "snapshot":
+        await test_snapshot()
+    
+    if args.test == "write_buffer":
+        await test_write_buffer()
+    
+    if args.test == "sharding":
+        test_sharding()
+    
+    if args.test == "backfill":
+        await test_backfill()
 
 if __name__ == "__main__":
-    bureau = Bureau(endpoint=["http://localhost:8101/submit"])
-    agent = MomentumAgent(port=8101)
-    bureau.add(agent.get_agent())
-    bureau.run() 
\ No newline at end of file
+    asyncio.run(main()) 
\ No newline at end of file